@@ -8,12 +8,236 @@
 import wx
 import wx.adv
 import os
-import glob
+import re
 import logging
 import datetime
+import time
 import shutil
-from pathlib import Path
-import send2trash  # 用于安全删除到回收站
+import threading
+
+from scan_engine import (
+    parse_extensions, iter_matching_files, is_no_extension_name, is_hidden_file,
+    iter_matching_roots, iter_largest_files, iter_largest_directories, TopSummary,
+    ScanJob, ScanStats, SubtreeTracker, WhitelistMatcher, DEFAULT_WHITELIST_DIRS
+)
+from scan_results import ScanResults, format_size
+from result_view import ResultView, COLUMN_SIZE, COLUMN_MTIME
+from scan_index import ScanIndex
+from file_filters import FilterRules, compile_filter
+from delete_engine import DeletionJob, StreamingDeletionJob, split_subtrees, resume_deletion
+from trash_backend import get_trash_backend
+from delete_journal import (
+    create_journal, open_journal, unfinished_journals, latest_restorable, prune_journals,
+    restore_trashed, default_journal_dir, STATUS_ABANDONED, STATUS_CANCELLED
+)
+from log_pipeline import setup_queue_logging, LogBuffer, LEVEL_PREFIXES
+from perf_metrics import PerfMetrics, RateMeter, ProfileSession, write_report, reports_dir
+from progress_estimate import (
+    ScanTotalsCache, ScanEstimate, ProgressTracker, estimate_scan_total, format_eta
+)
+from duplicate_finder import (
+    DuplicateJob, select_redundant, missing_keepers, drop_changed, KEEP_NEWEST, KEEP_OLDEST,
+    KEEP_SHORTEST_PATH, STAGE_SCAN, STAGE_IDENTITY, STAGE_PARTIAL, STAGE_FULL
+)
+from retention_policy import RetentionPolicy, RetentionPlanner, RetentionJob, REASON_NAMES
+from fs_watch import WatchJob, MODE_POLL, POLL_INTERVAL
+
+# 扫描规模估计来源的显示名称
+ESTIMATE_SOURCES = {
+    'previous_run': "上次扫描",
+    'index': "扫描索引",
+}
+
+# 重复文件选项卡：保留规则下拉框的选项，以及各阶段的显示名称
+KEEP_RULE_CHOICES = [
+    (KEEP_NEWEST, "保留最新的副本"),
+    (KEEP_OLDEST, "保留最旧的副本"),
+    (KEEP_SHORTEST_PATH, "保留路径最短的副本"),
+]
+DUPLICATE_STAGES = {
+    STAGE_SCAN: "扫描并按大小分组",
+    STAGE_IDENTITY: "合并硬链接",
+    STAGE_PARTIAL: "比较首尾字节",
+    STAGE_FULL: "计算全文哈希",
+}
+
+# 按删除日志继续中断的删除任务时使用的操作类型（不对应任何选项卡）
+RESUMED_OPERATION = "继续删除"
+
+# 流式清理的确认阈值：超过任一阈值时暂停并再次请求确认
+STREAM_CONFIRM_FILES = 10000
+STREAM_CONFIRM_BYTES = 1024 * 1024 * 1024
+
+class FileListCtrl(wx.ListCtrl):
+    """虚拟文件列表控件：只保存数据引用，按需格式化当前可见的行
+    
+    点击列标题按该列排序（再次点击切换升降序），set_query() 按文件名或路径即时筛选；
+    排序和筛选只改变 ResultView 中的行号映射，结果表本身和已有的行都不重建。
+    换成新的结果表时沿用当前的排序列和查询。
+    """
+    
+    # 可排序的列：文件名、大小、修改时间、路径
+    SORTABLE_COLUMNS = 4
+    
+    def __init__(self, parent):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.BORDER_SUNKEN)
+        self.files = ScanResults()
+        self.view = ResultView(self.files)
+        self.count_label = None
+        self.Bind(wx.EVT_LIST_COL_CLICK, self.on_col_click)
+    
+    def set_files(self, files):
+        """绑定扫描结果表并刷新行数；同一结果表增长或被重排时只同步视图"""
+        if files is self.files:
+            self.view.sync()
+        else:
+            self.files = files
+            self.view = ResultView(files, self.view.sort_column, self.view.ascending, self.view.query)
+        self.refresh_count()
+    
+    def refresh_count(self):
+        """结果表增长或被替换后，同步行数并重绘"""
+        self.SetItemCount(len(self.view))
+        if self.count_label is not None:
+            self.count_label.SetLabel(f"显示 {len(self.view)}/{len(self.files)} 项" if self.view.query else "")
+        self.Refresh()
+    
+    def finish_updates(self):
+        """结果表不再增长后，把期间追加在末尾的行并入当前排序"""
+        if self.view.unsorted_tail:
+            self.view.resort()
+            self.Refresh()
+    
+    def set_query(self, text):
+        self.view.set_query(text)
+        self.refresh_count()
+    
+    def on_col_click(self, event):
+        column = event.GetColumn()
+        if column < 0 or column >= self.SORTABLE_COLUMNS:
+            return
+        view = self.view
+        if column == view.sort_column:
+            ascending = not view.ascending
+        else:
+            # 大小和修改时间首次点击从大到小、从新到旧
+            ascending = column not in (COLUMN_SIZE, COLUMN_MTIME)
+        wx.BeginBusyCursor()
+        try:
+            view.sort(column, ascending)
+        finally:
+            wx.EndBusyCursor()
+        if hasattr(self, 'ShowSortIndicator'):
+            self.ShowSortIndicator(column, ascending)
+        self.Refresh()
+    
+    def keep_rows(self, rows):
+        """只留下结果表中的指定行（筛选删除后未显示的行），返回新的结果表"""
+        files = self.files.select(rows)
+        self.set_files(files)
+        return files
+    
+    def DeleteAllItems(self):
+        self.files = ScanResults()
+        self.view = ResultView(self.files, self.view.sort_column, self.view.ascending, self.view.query)
+        self.SetItemCount(0)
+        if self.count_label is not None:
+            self.count_label.SetLabel("")
+        return True
+    
+    def OnGetItemText(self, item, column):
+        return self.files.cell_text(self.view.index(item), column)
+
+class RetentionListCtrl(FileListCtrl):
+    """删除计划列表：在文件列之后多一列删除原因"""
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.reasons = ()
+    
+    def set_plan(self, plan, reasons):
+        self.reasons = reasons
+        self.set_files(plan)
+    
+    def keep_rows(self, rows):
+        reasons = self.reasons
+        self.reasons = [reasons[i] for i in rows]
+        return super().keep_rows(rows)
+    
+    def DeleteAllItems(self):
+        self.reasons = ()
+        return super().DeleteAllItems()
+    
+    def OnGetItemText(self, item, column):
+        index = self.view.index(item)
+        if column == 4:
+            return REASON_NAMES.get(self.reasons[index], "")
+        return self.files.cell_text(index, column)
+
+class FilterControls:
+    """附加筛选条件控件：名称通配符、正则、大小范围、修改时间"""
+    
+    def __init__(self, panel):
+        self.sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        self.sizer.Add(wx.StaticText(panel, label="名称通配:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.globs = wx.TextCtrl(panel, size=(110, -1))
+        self.globs.SetHint("*.tmp,~$*")
+        self.sizer.Add(self.globs, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.sizer.Add(wx.StaticText(panel, label="正则:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.regex = wx.TextCtrl(panel, size=(110, -1))
+        self.sizer.Add(self.regex, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.sizer.Add(wx.StaticText(panel, label="大小(KB) ≥"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.min_kb = wx.SpinCtrl(panel, min=0, max=2000000000, initial=0, size=(80, -1))
+        self.sizer.Add(self.min_kb, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.sizer.Add(wx.StaticText(panel, label="≤"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.max_kb = wx.SpinCtrl(panel, min=0, max=2000000000, initial=0, size=(80, -1))
+        self.max_kb.SetToolTip("0 表示不限")
+        self.sizer.Add(self.max_kb, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.sizer.Add(wx.StaticText(panel, label="修改早于(天):"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.older_days = wx.SpinCtrl(panel, min=0, max=36500, initial=0, size=(70, -1))
+        self.older_days.SetToolTip("0 表示不限")
+        self.sizer.Add(self.older_days, 0, wx.ALIGN_CENTER_VERTICAL)
+    
+    def rules_kwargs(self):
+        """返回 FilterRules 的关键字参数"""
+        regex = self.regex.GetValue().strip()
+        return {
+            'name_globs': [g.strip() for g in self.globs.GetValue().split(',') if g.strip()],
+            'regexes': [regex] if regex else [],
+            'min_size': self.min_kb.GetValue() * 1024 or None,
+            'max_size': self.max_kb.GetValue() * 1024 or None,
+            'older_than_days': self.older_days.GetValue() or None,
+        }
+
+class TopKControls:
+    """最大文件/目录模式控件：扫描时只保留最大的若干个文件或目录"""
+    
+    MODES = [('files', "个最大文件"), ('dirs', "个最大目录（含子目录）")]
+    
+    def __init__(self, panel):
+        self.sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        self.enabled = wx.CheckBox(panel, label="只列出前")
+        self.enabled.SetToolTip("扫描过程中只保留最大的若干项，内存占用与匹配文件总数无关")
+        self.sizer.Add(self.enabled, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.count = wx.SpinCtrl(panel, min=1, max=1000000, initial=100, size=(80, -1))
+        self.sizer.Add(self.count, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.mode = wx.Choice(panel, choices=[label for mode, label in self.MODES])
+        self.mode.SetSelection(0)
+        self.sizer.Add(self.mode, 0, wx.ALIGN_CENTER_VERTICAL)
+    
+    def value(self):
+        """未启用时返回 None，否则返回 (模式, 数量)，模式为 files 或 dirs"""
+        if not self.enabled.GetValue():
+            return None
+        return self.MODES[self.mode.GetSelection()][0], self.count.GetValue()
 
 class AdvancedFileCleanerApp(wx.Frame):
     """高级文件清理工具主应用程序窗口"""
@@ -25,13 +249,49 @@ class AdvancedFileCleanerApp(wx.Frame):
         self.setup_logging()
         
         # 初始化变量
-        self.selected_folder = ""
-        self.files_to_delete = []
+        # 按后缀/无后缀选项卡可同时扫描多个目录
+        self.selected_folders = []
+        self.selected_folders_noext = []
+        self.files_to_delete = ScanResults()
         self.whitelist_dirs = self.load_default_whitelist()
         self.whitelist_files = []
+        self.files_to_delete_noext = ScanResults()
+        self.files_to_delete_dupes = ScanResults()
+        self.duplicate_groups = []
+        self.files_to_delete_retention = ScanResults()
+        self.retention_job = None
+        self.scan_job_ext = None
+        self.scan_job_noext = None
+        self.dupe_job = None
+        self.scan_roots_ext = []
+        self.scan_roots_noext = []
+        self.scan_root_retention = None
+        # 删除进行中到达的监视变化：操作类型 -> {目录: 行列表}
+        self.pending_watch_changes = {}
+        # 处于最大文件/目录模式的选项卡：操作类型 -> (模式, TopSummary)
+        self.top_listing = {}
+        # 列表筛选后删除时未显示的行：操作类型 -> 结果表行号，删除结束后留在列表中
+        self.unlisted_rows = {}
+        # 上次完整扫描中整棵命中的子目录：操作类型 -> (SubtreeTracker, 匹配器)
+        self.subtree_plans = {}
+        self.deletion_job = None
+        self.undo_thread = None
+        self.active_metrics = None
+        self.active_label = ""
+        self.active_kind = None
+        self.active_probe = None
+        self.active_total = None
+        self.active_describe = None
+        self.active_estimate = None
+        self.progress_tracker = None
+        self.scan_totals = ScanTotalsCache()
+        self.rate_meter = RateMeter()
+        self.profile_session = None
         
         # 创建界面
         self.create_ui()
+        self.create_menu()
+        self.create_status_bar()
         
         # 居中显示窗口
         self.Centre()
@@ -39,49 +299,374 @@ class AdvancedFileCleanerApp(wx.Frame):
         # 绑定事件
         self.Bind(wx.EVT_CLOSE, self.on_close)
         
+        # 界面日志刷新定时器
+        self.log_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_flush_log, self.log_timer)
+        self.log_timer.Start(200)
+        
+        # 状态栏速率与进度条刷新定时器（固定频率，与文件数无关）
+        self.status_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_update_status, self.status_timer)
+        self.status_timer.Start(250)
+        
         self.log("高级文件清理工具启动")
+        
+        # 上次删除中途退出时询问是否继续
+        wx.CallAfter(self.check_unfinished_deletions)
     
     def setup_logging(self):
-        """设置日志记录"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('advanced_file_cleaner.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """设置日志记录：文件输出经队列在后台线程写入，界面日志由定时器合并刷新"""
+        self.log_metrics = PerfMetrics()
+        self.log_listener = setup_queue_logging('advanced_file_cleaner.log', metrics=self.log_metrics)
         self.logger = logging.getLogger(__name__)
+        self.log_buffer = LogBuffer(max_lines=5000)
+        self.log_lines_shown = 0
     
     def load_default_whitelist(self):
         """加载默认白名单目录"""
-        return [
-            "Windows", "Program Files", "Program Files (x86)",
-            "System32", "SysWOW64", "AppData", "ProgramData",
-            "Users", "Documents and Settings"
-        ]
+        return list(DEFAULT_WHITELIST_DIRS)
     
     def log(self, message, level=logging.INFO):
-        """记录日志并更新界面"""
+        """记录日志，可在任意线程调用；界面显示由 on_flush_log 定时批量完成"""
+        self.logger.log(level, message)
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        
-        if level == logging.INFO:
-            self.logger.info(message)
-            self.log_text.AppendText(log_message + "\n")
-        elif level == logging.WARNING:
-            self.logger.warning(message)
-            self.log_text.AppendText(f"⚠️ {log_message}\\n")
-        elif level == logging.ERROR:
-            self.logger.error(message)
-            self.log_text.AppendText(f"❌ {log_message}\\n")
-        elif level == logging.CRITICAL:
-            self.logger.critical(message)
-            self.log_text.AppendText(f"💥 {log_message}\\n")
+        self.log_buffer.append(f"{LEVEL_PREFIXES.get(level, '')}[{timestamp}] {message}\n")
+    
+    def on_flush_log(self, event=None):
+        """把待显示的日志合并成一次追加；超出行数上限时用环形缓冲重建文本"""
+        lines = self.log_buffer.drain()
+        if not lines:
+            return
+        
+        if self.log_lines_shown + len(lines) > self.log_buffer.max_lines * 3 // 2:
+            self.log_text.SetValue("".join(self.log_buffer.lines))
+            self.log_lines_shown = len(self.log_buffer.lines)
+        else:
+            self.log_text.AppendText("".join(lines))
+            self.log_lines_shown += len(lines)
         
         # 滚动到最新日志
         self.log_text.ShowPosition(self.log_text.GetLastPosition())
     
+    def create_menu(self):
+        """创建菜单栏：诊断菜单提供性能采集"""
+        menu_bar = wx.MenuBar()
+        diag_menu = wx.Menu()
+        self.profile_start_item = diag_menu.Append(wx.ID_ANY, "开始性能采集(&P)",
+                                                   "使用 cProfile 和 tracemalloc 采集后续扫描/删除的性能数据")
+        self.profile_stop_item = diag_menu.Append(wx.ID_ANY, "停止采集并保存(&S)")
+        self.profile_stop_item.Enable(False)
+        diag_menu.AppendSeparator()
+        self.detailed_timing_item = diag_menu.AppendCheckItem(
+            wx.ID_ANY, "记录分阶段扫描耗时(&T)",
+            "在运行报告中分别记录目录枚举、stat、规则求值和白名单检查的耗时（扫描会略慢）")
+        diag_menu.AppendSeparator()
+        reports_item = diag_menu.Append(wx.ID_ANY, "显示报告目录(&R)")
+        journal_menu = wx.Menu()
+        resume_item = journal_menu.Append(wx.ID_ANY, "继续未完成的删除(&R)...",
+                                          "按删除日志继续上次中断或取消的删除，无需重新扫描")
+        undo_item = journal_menu.Append(wx.ID_ANY, "撤销最近一次移到回收站(&U)...",
+                                        "把最近一次移到回收站的文件移回原位置")
+        journal_menu.AppendSeparator()
+        journal_dir_item = journal_menu.Append(wx.ID_ANY, "显示日志目录(&D)")
+        menu_bar.Append(journal_menu, "删除日志(&J)")
+        menu_bar.Append(diag_menu, "诊断(&D)")
+        self.SetMenuBar(menu_bar)
+        
+        self.Bind(wx.EVT_MENU, self.on_resume_deletion, resume_item)
+        self.Bind(wx.EVT_MENU, self.on_undo_trash, undo_item)
+        self.Bind(wx.EVT_MENU, self.on_show_journal_dir, journal_dir_item)
+        
+        self.Bind(wx.EVT_MENU, self.on_start_profile, self.profile_start_item)
+        self.Bind(wx.EVT_MENU, self.on_stop_profile, self.profile_stop_item)
+        self.Bind(wx.EVT_MENU, self.on_show_reports_dir, reports_item)
+    
+    def create_status_bar(self):
+        """创建状态栏：左侧显示实时速率，右侧显示最近一份运行报告"""
+        self.status_bar = self.CreateStatusBar(2)
+        self.status_bar.SetStatusWidths([-1, -2])
+        self.status_bar.SetStatusText("空闲", 0)
+    
+    def on_update_status(self, event=None):
+        """按固定频率刷新状态栏速率和进度条
+
+        只读取扫描/删除本来就维护的几个计数（ScanStats、结果表长度、删除进度），
+        不在扫描或删除的热路径上增加任何逐文件或逐目录的开销。
+        """
+        probe = self.active_probe
+        if probe is None:
+            return
+        done, files, bytes_done = probe()
+        files_rate, bytes_rate = self.rate_meter.sample(files, bytes_done)
+        self.status_bar.SetStatusText(
+            f"{self.active_label}: {files_rate:,.0f} 文件/秒，{format_size(int(bytes_rate))}/秒", 0)
+        
+        if self.active_total is not None:
+            total = self.active_total()
+            if total != self.progress_tracker.total:
+                self.progress_tracker.restart(total)
+        fraction, eta = self.progress_tracker.update(done)
+        if self.active_describe is not None:
+            detail = self.active_describe()
+        elif self.active_kind == 'delete':
+            detail = f"{done}/{self.progress_tracker.total} 个文件，已释放 {format_size(bytes_done)}"
+        elif self.active_kind == 'stream':
+            detail = f"已扫描 {done} 个目录，已处理 {files} 个文件，已释放 {format_size(bytes_done)}"
+        else:
+            detail = f"已扫描 {done} 个目录，匹配 {files} 个文件（{format_size(bytes_done)}）"
+        estimate = self.active_estimate
+        if self.active_kind in ('scan', 'stream') and estimate is not None and estimate.source is not None:
+            detail += f"，估计来源: {ESTIMATE_SOURCES.get(estimate.source, estimate.source)}"
+        
+        if fraction is None:
+            self.progress_gauge.Pulse()
+            self.progress_text.SetLabel(f"{self.active_label}: {detail}")
+        else:
+            self.progress_gauge.SetValue(int(fraction * 1000))
+            self.progress_text.SetLabel(
+                f"{self.active_label}: {fraction * 100:.0f}%，{detail}，剩余 {format_eta(eta)}")
+    
+    def begin_metrics(self, label, estimate=None, total_files=None):
+        """为一次扫描或删除创建计量对象，并让进度条以估计总量（或已知文件数）为准"""
+        metrics = PerfMetrics()
+        metrics.log_io_start = self.log_metrics.snapshot()['timers'].get('log_io')
+        self.active_metrics = metrics
+        self.active_label = label
+        self.active_probe = None
+        self.active_estimate = estimate
+        self.progress_tracker = ProgressTracker(total_files if total_files is not None
+                                                else (estimate.total if estimate else None))
+        self.progress_gauge.SetValue(0)
+        self.rate_meter.reset()
+        return metrics
+    
+    def track_progress(self, kind, probe, total=None, describe=None):
+        """设置进度来源：probe() 返回 (进度量, 文件数, 字节数)，kind 为 scan / stream / delete / dupes
+        
+        总量随阶段变化时由 total() 提供（变化时重新计时），describe() 返回进度说明文字。
+        """
+        self.active_kind = kind
+        self.active_probe = probe
+        self.active_total = total
+        self.active_describe = describe
+    
+    def scan_timing(self, metrics):
+        """勾选了分阶段计时时才把计量对象交给遍历函数（逐目录计时会让热缓存下的扫描变慢）"""
+        return metrics if self.detailed_timing_item.IsChecked() else None
+    
+    def estimate_scan(self, roots, recursive, max_depth, index):
+        """扫描开始前估计目录树规模，返回 (ScanEstimate, 上次扫描记录的键)
+        
+        多个根目录时把各自的估计相加（任一无法估计则不估计）；合计的目录数无法分到各根目录，键为 None。
+        """
+        if len(roots) == 1:
+            key = ScanTotalsCache.key(roots[0], recursive, max_depth)
+            return estimate_scan_total(roots[0], self.scan_totals, key, index), key
+        estimates = [estimate_scan_total(root, self.scan_totals, ScanTotalsCache.key(root, recursive, max_depth),
+                                         index) for root in roots]
+        if all(estimates):
+            return ScanEstimate(sum(e.total for e in estimates), estimates[0].source), None
+        return ScanEstimate(), None
+    
+    def save_scan_totals(self, key, stats):
+        """完整扫描结束后记录目录数，供下次估计进度"""
+        if key is not None and stats is not None and stats.dirs_scanned:
+            self.scan_totals.put(key, stats.dirs_scanned)
+    
+    def finish_metrics(self, kind, operation_type, metrics, extra):
+        """写出运行报告，并在日志中记录耗时最多的阶段"""
+        if metrics is None:
+            return
+        if metrics is self.active_metrics:
+            self.active_metrics = None
+            self.active_probe = None
+            self.status_bar.SetStatusText("空闲", 0)
+            self.progress_gauge.SetValue(0)
+            self.progress_text.SetLabel("就绪")
+        
+        # 日志写入是全局的，报告中记录本次运行期间的增量
+        start = metrics.log_io_start or {'seconds': 0.0, 'calls': 0}
+        end = self.log_metrics.snapshot()['timers'].get('log_io') or start
+        metrics.add_time('log_io', end['seconds'] - start['seconds'], end['calls'] - start['calls'])
+        
+        extra = dict(extra)
+        extra['operation_type'] = operation_type
+        try:
+            path = write_report(kind, metrics, extra)
+        except OSError as e:
+            self.log(f"[{operation_type}] 无法写入运行报告: {str(e)}", logging.WARNING)
+            return
+        self.log(f"[{operation_type}] 耗时 {metrics.elapsed:.2f} 秒（{metrics.summary_line()}），报告: {path}")
+        self.status_bar.SetStatusText(f"最近报告: {path}", 1)
+    
+    def on_start_profile(self, event):
+        """开始 cProfile + tracemalloc 采集"""
+        if self.profile_session is not None:
+            return
+        self.profile_session = ProfileSession()
+        self.profile_session.start()
+        self.profile_start_item.Enable(False)
+        self.profile_stop_item.Enable(True)
+        self.log("[诊断] 已开始性能采集，完成需要分析的扫描或删除后请停止采集")
+    
+    def on_stop_profile(self, event):
+        """停止采集并写出 .prof 和文本摘要"""
+        if self.profile_session is None:
+            return
+        session, self.profile_session = self.profile_session, None
+        self.profile_start_item.Enable(True)
+        self.profile_stop_item.Enable(False)
+        try:
+            prof_path, text_path = session.stop()
+        except OSError as e:
+            self.log(f"[诊断] 保存性能采集结果失败: {str(e)}", logging.ERROR)
+            return
+        if prof_path:
+            self.log(f"[诊断] cProfile 数据: {prof_path}")
+        self.log(f"[诊断] 性能摘要: {text_path}")
+        self.status_bar.SetStatusText(f"最近报告: {text_path}", 1)
+    
+    def on_show_reports_dir(self, event):
+        """显示运行报告所在目录"""
+        wx.MessageBox(f"运行报告和性能采集结果保存在:\n{reports_dir()}", "报告目录",
+                      wx.OK | wx.ICON_INFORMATION)
+    
+    def check_unfinished_deletions(self):
+        """启动时清理过期的删除日志，有中途退出的删除任务时询问是否继续"""
+        try:
+            prune_journals()
+            unfinished = [state for state in unfinished_journals() if state.status is None]
+        except OSError as e:
+            self.log(f"[删除日志] 读取删除日志失败: {str(e)}", logging.WARNING)
+            return
+        if unfinished:
+            self.offer_resume(unfinished[0])
+    
+    def on_resume_deletion(self, event):
+        """继续最近一个未完成的删除任务（包括主动取消的）"""
+        if self.deletion_job is not None or self.undo_thread is not None:
+            wx.MessageBox("请等待当前删除操作完成！", "提示", wx.OK | wx.ICON_INFORMATION)
+            return
+        try:
+            unfinished = unfinished_journals()
+        except OSError as e:
+            self.log(f"[删除日志] 读取删除日志失败: {str(e)}", logging.ERROR)
+            return
+        if not unfinished:
+            wx.MessageBox("没有未完成的删除任务。", "提示", wx.OK | wx.ICON_INFORMATION)
+            return
+        self.offer_resume(unfinished[0])
+    
+    def offer_resume(self, state):
+        """说明中断的删除任务，由用户选择继续、放弃或以后再说"""
+        files, nbytes = state.pending_totals()
+        created = datetime.datetime.fromtimestamp(state.created).strftime("%Y-%m-%d %H:%M:%S")
+        delete_type = "移动到回收站" if state.use_recycle else "永久删除"
+        reason = "已取消" if state.status == STATUS_CANCELLED else "中途退出"
+        message = f"{created} 开始的删除任务{reason}，尚有 {files} 个文件（{format_size(nbytes)}）未处理。\n\n"
+        message += f"删除方式: {delete_type}\n"
+        message += f"已完成: {len(state.done)}/{len(state.entries)} 个分组\n\n"
+        message += "继续删除将直接处理剩余文件，无需重新扫描。"
+        
+        dlg = wx.MessageDialog(self, message, "继续未完成的删除",
+                               wx.YES_NO | wx.CANCEL | wx.NO_DEFAULT | wx.ICON_QUESTION)
+        dlg.SetYesNoCancelLabels("继续删除", "放弃", "以后再说")
+        answer = dlg.ShowModal()
+        dlg.Destroy()
+        if answer == wx.ID_YES:
+            self.resume_journal(state)
+        elif answer == wx.ID_NO:
+            try:
+                open_journal(state.path).finish(STATUS_ABANDONED)
+            except (OSError, ValueError) as e:
+                self.log(f"[删除日志] 无法更新删除日志: {str(e)}", logging.ERROR)
+                return
+            self.log(f"[删除日志] 已放弃未完成的删除任务（{files} 个文件未处理）")
+    
+    def resume_journal(self, state):
+        """按删除日志在后台继续删除"""
+        operation_type = RESUMED_OPERATION
+        files, nbytes = state.pending_totals()
+        metrics = self.begin_metrics(operation_type, total_files=files)
+        try:
+            journal = open_journal(state.path, metrics=metrics)
+        except (OSError, ValueError) as e:
+            # 没有开始删除，不写运行报告，只撤销 begin_metrics 设置的进度来源
+            self.active_metrics = None
+            self.log(f"[{operation_type}] 无法打开删除日志 {state.path}: {str(e)}", logging.ERROR)
+            return
+        use_recycle = journal.state.use_recycle
+        self.log(f"[{operation_type}] 按删除日志继续: 剩余 {files} 个文件（{format_size(nbytes)}）")
+        self.set_busy(True)
+        job = resume_deletion(
+            journal,
+            on_progress=lambda progress: wx.CallAfter(self.on_deletion_progress, operation_type, progress),
+            on_done=lambda progress, cancelled: wx.CallAfter(
+                self.on_deletion_done, operation_type, use_recycle, progress, cancelled, metrics),
+            metrics=metrics,
+            whitelist=WhitelistMatcher(self.whitelist_dirs)
+        )
+        self.deletion_job = job
+        self.track_progress('delete', lambda: (job.progress.processed, job.progress.processed,
+                                               job.progress.bytes_done))
+        job.start()
+    
+    def on_undo_trash(self, event):
+        """把最近一次移到回收站的文件移回原位置"""
+        if self.deletion_job is not None or self.undo_thread is not None:
+            wx.MessageBox("请等待当前删除操作完成！", "提示", wx.OK | wx.ICON_INFORMATION)
+            return
+        try:
+            state = latest_restorable()
+        except OSError as e:
+            self.log(f"[撤销] 读取删除日志失败: {str(e)}", logging.ERROR)
+            return
+        if state is None:
+            wx.MessageBox("没有可以撤销的回收站记录。", "提示", wx.OK | wx.ICON_INFORMATION)
+            return
+        
+        count = len(state.restorable)
+        created = datetime.datetime.fromtimestamp(state.created).strftime("%Y-%m-%d %H:%M:%S")
+        message = f"把 {created} 移到回收站的 {count} 项移回原位置吗？\n\n原位置已有同名文件的项不会覆盖。"
+        dlg = wx.MessageDialog(self, message, "撤销移到回收站", wx.YES_NO | wx.NO_DEFAULT | wx.ICON_QUESTION)
+        answer = dlg.ShowModal()
+        dlg.Destroy()
+        if answer != wx.ID_YES:
+            return
+        try:
+            journal = open_journal(state.path)
+        except (OSError, ValueError) as e:
+            self.log(f"[撤销] 无法打开删除日志 {state.path}: {str(e)}", logging.ERROR)
+            return
+        
+        self.log(f"[撤销] 开始把 {count} 项移回原位置...")
+        self.set_busy(True)
+        
+        def run():
+            try:
+                result = restore_trashed(journal)
+            finally:
+                journal.close()
+            wx.CallAfter(self.on_undo_done, result)
+        
+        self.undo_thread = threading.Thread(target=run, name="UndoTrash", daemon=True)
+        self.undo_thread.start()
+    
+    def on_undo_done(self, result):
+        """撤销结束（主线程）"""
+        self.undo_thread = None
+        self.set_busy(False)
+        restored, failed, errors = result
+        for path, message in errors[:50]:
+            self.log(f"❌ [撤销] {path}: {message}", logging.ERROR)
+        self.log(f"[撤销] 完成 - 已移回: {restored}, 失败: {failed}")
+        wx.MessageBox(f"已移回原位置: {restored} 项\n失败: {failed} 项", "撤销完成",
+                      wx.OK | (wx.ICON_INFORMATION if failed == 0 else wx.ICON_WARNING))
+    
+    def on_show_journal_dir(self, event):
+        """显示删除日志所在目录"""
+        wx.MessageBox(f"删除日志保存在:\n{default_journal_dir()}", "日志目录", wx.OK | wx.ICON_INFORMATION)
+    
     def create_ui(self):
         """创建用户界面"""
         # 创建笔记本控件（选项卡）
@@ -90,9 +675,13 @@ class AdvancedFileCleanerApp(wx.Frame):
         # 创建两个选项卡
         self.tab_ext = wx.Panel(self.notebook)
         self.tab_noext = wx.Panel(self.notebook)
+        self.tab_dupes = wx.Panel(self.notebook)
+        self.tab_retention = wx.Panel(self.notebook)
         
         self.notebook.AddPage(self.tab_ext, "按后缀删除")
         self.notebook.AddPage(self.tab_noext, "无后缀文件清理")
+        self.notebook.AddPage(self.tab_dupes, "重复文件")
+        self.notebook.AddPage(self.tab_retention, "保留策略")
         
         # 创建按后缀删除界面
         self.create_extension_tab()
@@ -100,6 +689,12 @@ class AdvancedFileCleanerApp(wx.Frame):
         # 创建无后缀文件清理界面
         self.create_noextension_tab()
         
+        # 创建重复文件界面
+        self.create_duplicates_tab()
+        
+        # 创建保留策略界面
+        self.create_retention_tab()
+        
         # 创建底部日志区域
         self.create_log_area()
         
@@ -107,10 +702,24 @@ class AdvancedFileCleanerApp(wx.Frame):
         main_sizer = wx.BoxSizer(wx.VERTICAL)
         main_sizer.Add(self.notebook, 1, wx.EXPAND | wx.ALL, 5)
         
+        # 进度区域：由状态栏定时器按固定频率刷新
+        progress_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.progress_gauge = wx.Gauge(self, range=1000, size=(250, -1))
+        progress_sizer.Add(self.progress_gauge, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        self.progress_text = wx.StaticText(self, label="就绪")
+        progress_sizer.Add(self.progress_text, 1, wx.ALIGN_CENTER_VERTICAL)
+        main_sizer.Add(progress_sizer, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        
         # 日志区域
         log_sizer = wx.BoxSizer(wx.VERTICAL)
+        log_header_sizer = wx.BoxSizer(wx.HORIZONTAL)
         log_label = wx.StaticText(self, label="详细操作日志:")
-        log_sizer.Add(log_label, 0, wx.ALL, 5)
+        log_header_sizer.Add(log_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.log_each_file = wx.CheckBox(self, label="逐个文件记录日志")
+        self.log_each_file.SetToolTip("默认只记录汇总信息；大批量删除时逐个记录会明显变慢")
+        log_header_sizer.Add(self.log_each_file, 0, wx.ALIGN_CENTER_VERTICAL)
+        log_sizer.Add(log_header_sizer, 0, wx.ALL, 5)
         log_sizer.Add(self.log_text, 1, wx.EXPAND | wx.ALL, 5)
         
         main_sizer.Add(log_sizer, 1, wx.EXPAND | wx.ALL, 5)
@@ -131,7 +740,11 @@ class AdvancedFileCleanerApp(wx.Frame):
         folder_sizer.Add(self.folder_path_ext, 1, wx.EXPAND | wx.RIGHT, 5)
         
         self.browse_btn_ext = wx.Button(panel, label="浏览...")
-        folder_sizer.Add(self.browse_btn_ext, 0, wx.ALIGN_CENTER_VERTICAL)
+        folder_sizer.Add(self.browse_btn_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.add_folder_btn_ext = wx.Button(panel, label="添加...")
+        self.add_folder_btn_ext.SetToolTip("再添加一个扫描目录；多个目录按所在磁盘并发扫描，重叠部分只扫描一次")
+        folder_sizer.Add(self.add_folder_btn_ext, 0, wx.ALIGN_CENTER_VERTICAL)
         
         main_sizer.Add(folder_sizer, 0, wx.EXPAND | wx.ALL, 10)
         
@@ -148,19 +761,79 @@ class AdvancedFileCleanerApp(wx.Frame):
         
         main_sizer.Add(ext_sizer, 0, wx.EXPAND | wx.ALL, 10)
         
+        # 扫描选项
+        options_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        self.recursive_scan_ext = wx.CheckBox(panel, label="递归扫描子目录")
+        options_sizer.Add(self.recursive_scan_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        depth_label = wx.StaticText(panel, label="最大深度(0=不限):")
+        options_sizer.Add(depth_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.max_depth_ext = wx.SpinCtrl(panel, min=0, max=999, initial=0, size=(70, -1))
+        options_sizer.Add(self.max_depth_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        workers_label = wx.StaticText(panel, label="并行线程数:")
+        options_sizer.Add(workers_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.scan_workers_ext = wx.SpinCtrl(panel, min=1, max=64, initial=1, size=(60, -1))
+        self.scan_workers_ext.SetToolTip("网络共享或慢速磁盘上可调大，以并发列出多个目录")
+        options_sizer.Add(self.scan_workers_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.use_index_ext = wx.CheckBox(panel, label="增量扫描（复用未变化目录）")
+        self.use_index_ext.SetValue(True)
+        options_sizer.Add(self.use_index_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.watch_option_ext = wx.CheckBox(panel, label="扫描后监视目录变化")
+        self.watch_option_ext.SetToolTip("扫描完成后根据文件系统事件更新列表，无需重新扫描")
+        options_sizer.Add(self.watch_option_ext, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(options_sizer, 0, wx.ALL, 10)
+        
+        # 附加筛选条件
+        self.filter_ext = FilterControls(panel)
+        main_sizer.Add(self.filter_ext.sizer, 0, wx.LEFT | wx.RIGHT, 10)
+        
+        # 最大文件/目录模式
+        self.top_ext = TopKControls(panel)
+        main_sizer.Add(self.top_ext.sizer, 0, wx.LEFT | wx.RIGHT | wx.TOP, 10)
+        
         # 按钮区域
         btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
         
         self.scan_btn_ext = wx.Button(panel, label="扫描文件")
         btn_sizer.Add(self.scan_btn_ext, 0, wx.RIGHT, 10)
         
+        self.cancel_btn_ext = wx.Button(panel, label="取消扫描")
+        self.cancel_btn_ext.Disable()
+        btn_sizer.Add(self.cancel_btn_ext, 0, wx.RIGHT, 10)
+        
         self.delete_btn_ext = wx.Button(panel, label="执行删除")
         self.delete_btn_ext.Disable()
         btn_sizer.Add(self.delete_btn_ext, 0, wx.RIGHT, 10)
         
         # 删除选项
         self.recycle_option_ext = wx.CheckBox(panel, label="移动到回收站（可恢复）")
-        btn_sizer.Add(self.recycle_option_ext, 0, wx.ALIGN_CENTER_VERTICAL)
+        self.recycle_option_ext.SetValue(True)  # 批量回收站后端接近永久删除的速度，默认启用
+        btn_sizer.Add(self.recycle_option_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.prune_dirs_ext = wx.CheckBox(panel, label="删除后清理空目录")
+        self.prune_dirs_ext.SetToolTip("只检查删除过文件的目录及其上级，直到扫描目录为止，不进入白名单目录")
+        btn_sizer.Add(self.prune_dirs_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.whole_dirs_ext = wx.CheckBox(panel, label="整体删除完全匹配的目录")
+        self.whole_dirs_ext.SetValue(False)
+        self.whole_dirs_ext.SetToolTip("扫描时发现其中全部是匹配文件的子目录（如缓存目录），"
+                                       "删除时连同目录（包括其中的空子目录）整体删除，确认和日志中只列为一项")
+        btn_sizer.Add(self.whole_dirs_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.stream_option_ext = wx.CheckBox(panel, label="边扫描边删除（不列出文件）")
+        self.stream_option_ext.SetToolTip("适合超大临时目录：扫描结果直接交给删除线程，内存占用不随文件数增长")
+        btn_sizer.Add(self.stream_option_ext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.dry_run_ext = wx.CheckBox(panel, label="仅演练")
+        self.dry_run_ext.SetToolTip("只统计将被删除的文件，不做任何修改")
+        btn_sizer.Add(self.dry_run_ext, 0, wx.ALIGN_CENTER_VERTICAL)
         
         main_sizer.Add(btn_sizer, 0, wx.ALL, 10)
         
@@ -168,11 +841,12 @@ class AdvancedFileCleanerApp(wx.Frame):
         files_label = wx.StaticText(panel, label="待删除文件列表:")
         main_sizer.Add(files_label, 0, wx.ALL, 5)
         
-        self.files_list_ext = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.BORDER_SUNKEN)
+        self.files_list_ext = FileListCtrl(panel)
         self.files_list_ext.InsertColumn(0, "文件名", width=300)
         self.files_list_ext.InsertColumn(1, "大小", width=100)
         self.files_list_ext.InsertColumn(2, "修改时间", width=150)
         self.files_list_ext.InsertColumn(3, "路径", width=300)
+        main_sizer.Add(self.create_search_bar(panel, self.files_list_ext), 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
         main_sizer.Add(self.files_list_ext, 1, wx.EXPAND | wx.ALL, 10)
         
         # 统计信息
@@ -183,7 +857,9 @@ class AdvancedFileCleanerApp(wx.Frame):
         
         # 绑定事件
         self.browse_btn_ext.Bind(wx.EVT_BUTTON, self.on_browse_folder_ext)
+        self.add_folder_btn_ext.Bind(wx.EVT_BUTTON, self.on_add_folder_ext)
         self.scan_btn_ext.Bind(wx.EVT_BUTTON, self.on_scan_files_ext)
+        self.cancel_btn_ext.Bind(wx.EVT_BUTTON, self.on_cancel_scan_ext)
         self.delete_btn_ext.Bind(wx.EVT_BUTTON, self.on_delete_files_ext)
     
     def create_noextension_tab(self):
@@ -200,7 +876,11 @@ class AdvancedFileCleanerApp(wx.Frame):
         folder_sizer.Add(self.folder_path_noext, 1, wx.EXPAND | wx.RIGHT, 5)
         
         self.browse_btn_noext = wx.Button(panel, label="浏览...")
-        folder_sizer.Add(self.browse_btn_noext, 0, wx.ALIGN_CENTER_VERTICAL)
+        folder_sizer.Add(self.browse_btn_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.add_folder_btn_noext = wx.Button(panel, label="添加...")
+        self.add_folder_btn_noext.SetToolTip("再添加一个扫描目录；多个目录按所在磁盘并发扫描，重叠部分只扫描一次")
+        folder_sizer.Add(self.add_folder_btn_noext, 0, wx.ALIGN_CENTER_VERTICAL)
         
         main_sizer.Add(folder_sizer, 0, wx.EXPAND | wx.ALL, 10)
         
@@ -236,16 +916,43 @@ class AdvancedFileCleanerApp(wx.Frame):
         options_sizer.Add(self.recursive_scan, 0, wx.RIGHT, 10)
         
         self.include_hidden = wx.CheckBox(panel, label="包含隐藏文件")
-        options_sizer.Add(self.include_hidden, 0)
+        options_sizer.Add(self.include_hidden, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        workers_label = wx.StaticText(panel, label="并行线程数:")
+        options_sizer.Add(workers_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.scan_workers_noext = wx.SpinCtrl(panel, min=1, max=64, initial=1, size=(60, -1))
+        self.scan_workers_noext.SetToolTip("网络共享或慢速磁盘上可调大，以并发列出多个目录")
+        options_sizer.Add(self.scan_workers_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.use_index_noext = wx.CheckBox(panel, label="增量扫描（复用未变化目录）")
+        self.use_index_noext.SetValue(True)
+        options_sizer.Add(self.use_index_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.watch_option_noext = wx.CheckBox(panel, label="扫描后监视目录变化")
+        self.watch_option_noext.SetToolTip("扫描完成后根据文件系统事件更新列表，无需重新扫描")
+        options_sizer.Add(self.watch_option_noext, 0, wx.ALIGN_CENTER_VERTICAL)
         
         main_sizer.Add(options_sizer, 0, wx.ALL, 10)
         
+        # 附加筛选条件
+        self.filter_noext = FilterControls(panel)
+        main_sizer.Add(self.filter_noext.sizer, 0, wx.LEFT | wx.RIGHT, 10)
+        
+        # 最大文件/目录模式
+        self.top_noext = TopKControls(panel)
+        main_sizer.Add(self.top_noext.sizer, 0, wx.LEFT | wx.RIGHT | wx.TOP, 10)
+        
         # 按钮区域
         btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
         
         self.scan_btn_noext = wx.Button(panel, label="扫描无后缀文件")
         btn_sizer.Add(self.scan_btn_noext, 0, wx.RIGHT, 10)
         
+        self.cancel_btn_noext = wx.Button(panel, label="取消扫描")
+        self.cancel_btn_noext.Disable()
+        btn_sizer.Add(self.cancel_btn_noext, 0, wx.RIGHT, 10)
+        
         self.delete_btn_noext = wx.Button(panel, label="清理文件")
         self.delete_btn_noext.Disable()
         btn_sizer.Add(self.delete_btn_noext, 0, wx.RIGHT, 10)
@@ -253,7 +960,25 @@ class AdvancedFileCleanerApp(wx.Frame):
         # 删除选项
         self.recycle_option_noext = wx.CheckBox(panel, label="移动到回收站（可恢复）")
         self.recycle_option_noext.SetValue(True)  # 默认启用安全删除
-        btn_sizer.Add(self.recycle_option_noext, 0, wx.ALIGN_CENTER_VERTICAL)
+        btn_sizer.Add(self.recycle_option_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.prune_dirs_noext = wx.CheckBox(panel, label="删除后清理空目录")
+        self.prune_dirs_noext.SetToolTip("只检查删除过文件的目录及其上级，直到扫描目录为止，不进入白名单目录")
+        btn_sizer.Add(self.prune_dirs_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.whole_dirs_noext = wx.CheckBox(panel, label="整体删除完全匹配的目录")
+        self.whole_dirs_noext.SetValue(False)
+        self.whole_dirs_noext.SetToolTip("扫描时发现其中全部是匹配文件的子目录（如缓存目录），"
+                                         "删除时连同目录（包括其中的空子目录）整体删除，确认和日志中只列为一项")
+        btn_sizer.Add(self.whole_dirs_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.stream_option_noext = wx.CheckBox(panel, label="边扫描边删除（不列出文件）")
+        self.stream_option_noext.SetToolTip("适合超大临时目录：扫描结果直接交给删除线程，内存占用不随文件数增长")
+        btn_sizer.Add(self.stream_option_noext, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.dry_run_noext = wx.CheckBox(panel, label="仅演练")
+        self.dry_run_noext.SetToolTip("只统计将被删除的文件，不做任何修改")
+        btn_sizer.Add(self.dry_run_noext, 0, wx.ALIGN_CENTER_VERTICAL)
         
         main_sizer.Add(btn_sizer, 0, wx.ALL, 10)
         
@@ -261,11 +986,12 @@ class AdvancedFileCleanerApp(wx.Frame):
         files_label = wx.StaticText(panel, label="无后缀文件列表:")
         main_sizer.Add(files_label, 0, wx.ALL, 5)
         
-        self.files_list_noext = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.BORDER_SUNKEN)
+        self.files_list_noext = FileListCtrl(panel)
         self.files_list_noext.InsertColumn(0, "文件名", width=200)
         self.files_list_noext.InsertColumn(1, "大小", width=80)
         self.files_list_noext.InsertColumn(2, "修改时间", width=120)
         self.files_list_noext.InsertColumn(3, "完整路径", width=400)
+        main_sizer.Add(self.create_search_bar(panel, self.files_list_noext), 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
         main_sizer.Add(self.files_list_noext, 1, wx.EXPAND | wx.ALL, 10)
         
         # 统计信息
@@ -276,39 +1002,284 @@ class AdvancedFileCleanerApp(wx.Frame):
         
         # 绑定事件
         self.browse_btn_noext.Bind(wx.EVT_BUTTON, self.on_browse_folder_noext)
+        self.add_folder_btn_noext.Bind(wx.EVT_BUTTON, self.on_add_folder_noext)
         self.scan_btn_noext.Bind(wx.EVT_BUTTON, self.on_scan_noext_files)
+        self.cancel_btn_noext.Bind(wx.EVT_BUTTON, self.on_cancel_scan_noext)
         self.delete_btn_noext.Bind(wx.EVT_BUTTON, self.on_delete_noext_files)
         self.add_whitelist_btn.Bind(wx.EVT_BUTTON, self.on_add_whitelist)
     
+    def create_duplicates_tab(self):
+        """创建重复文件选项卡"""
+        panel = self.tab_dupes
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        
+        # 文件夹选择区域
+        folder_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        folder_label = wx.StaticText(panel, label="选择扫描目录:")
+        folder_sizer.Add(folder_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.folder_path_dupes = wx.TextCtrl(panel, style=wx.TE_READONLY, size=(400, -1))
+        folder_sizer.Add(self.folder_path_dupes, 1, wx.EXPAND | wx.RIGHT, 5)
+        
+        self.browse_btn_dupes = wx.Button(panel, label="浏览...")
+        folder_sizer.Add(self.browse_btn_dupes, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(folder_sizer, 0, wx.EXPAND | wx.ALL, 10)
+        
+        # 扫描选项
+        options_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        self.recursive_scan_dupes = wx.CheckBox(panel, label="递归扫描子目录")
+        self.recursive_scan_dupes.SetValue(True)
+        options_sizer.Add(self.recursive_scan_dupes, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        workers_label = wx.StaticText(panel, label="读取线程数:")
+        options_sizer.Add(workers_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.hash_workers_dupes = wx.SpinCtrl(panel, min=1, max=64, initial=4, size=(60, -1))
+        self.hash_workers_dupes.SetToolTip("SSD 上可调大；机械硬盘上调小可减少磁头来回寻道")
+        options_sizer.Add(self.hash_workers_dupes, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        keep_label = wx.StaticText(panel, label="每组保留:")
+        options_sizer.Add(keep_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.keep_rule_dupes = wx.Choice(panel, choices=[label for rule, label in KEEP_RULE_CHOICES])
+        self.keep_rule_dupes.SetSelection(0)
+        options_sizer.Add(self.keep_rule_dupes, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(options_sizer, 0, wx.ALL, 10)
+        
+        # 附加筛选条件（只比较满足条件的文件）
+        self.filter_dupes = FilterControls(panel)
+        main_sizer.Add(self.filter_dupes.sizer, 0, wx.LEFT | wx.RIGHT, 10)
+        
+        # 按钮区域
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        self.scan_btn_dupes = wx.Button(panel, label="查找重复文件")
+        btn_sizer.Add(self.scan_btn_dupes, 0, wx.RIGHT, 10)
+        
+        self.cancel_btn_dupes = wx.Button(panel, label="取消查找")
+        self.cancel_btn_dupes.Disable()
+        btn_sizer.Add(self.cancel_btn_dupes, 0, wx.RIGHT, 10)
+        
+        self.delete_btn_dupes = wx.Button(panel, label="删除多余副本")
+        self.delete_btn_dupes.Disable()
+        btn_sizer.Add(self.delete_btn_dupes, 0, wx.RIGHT, 10)
+        
+        self.recycle_option_dupes = wx.CheckBox(panel, label="移动到回收站（可恢复）")
+        self.recycle_option_dupes.SetValue(True)
+        btn_sizer.Add(self.recycle_option_dupes, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(btn_sizer, 0, wx.ALL, 10)
+        
+        # 文件列表区域：只列出将被删除的副本，每组保留的文件不在列表中
+        files_label = wx.StaticText(panel, label="多余副本列表（每组按保留规则留下一个文件）:")
+        main_sizer.Add(files_label, 0, wx.ALL, 5)
+        
+        self.files_list_dupes = FileListCtrl(panel)
+        self.files_list_dupes.InsertColumn(0, "文件名", width=200)
+        self.files_list_dupes.InsertColumn(1, "大小", width=80)
+        self.files_list_dupes.InsertColumn(2, "修改时间", width=120)
+        self.files_list_dupes.InsertColumn(3, "完整路径", width=400)
+        main_sizer.Add(self.create_search_bar(panel, self.files_list_dupes), 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        main_sizer.Add(self.files_list_dupes, 1, wx.EXPAND | wx.ALL, 10)
+        
+        # 统计信息
+        self.stats_text_dupes = wx.StaticText(panel, label="找到 0 组重复文件")
+        main_sizer.Add(self.stats_text_dupes, 0, wx.ALL, 5)
+        
+        panel.SetSizer(main_sizer)
+        
+        # 绑定事件
+        self.browse_btn_dupes.Bind(wx.EVT_BUTTON, self.on_browse_folder_dupes)
+        self.scan_btn_dupes.Bind(wx.EVT_BUTTON, self.on_scan_dupes)
+        self.cancel_btn_dupes.Bind(wx.EVT_BUTTON, self.on_cancel_scan_dupes)
+        self.delete_btn_dupes.Bind(wx.EVT_BUTTON, self.on_delete_dupes)
+        self.keep_rule_dupes.Bind(wx.EVT_CHOICE, self.on_keep_rule_changed)
+    
+    def create_retention_tab(self):
+        """创建保留策略选项卡"""
+        panel = self.tab_retention
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+        
+        # 文件夹选择区域
+        folder_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        folder_label = wx.StaticText(panel, label="选择日志/产物目录:")
+        folder_sizer.Add(folder_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        
+        self.folder_path_retention = wx.TextCtrl(panel, style=wx.TE_READONLY, size=(400, -1))
+        folder_sizer.Add(self.folder_path_retention, 1, wx.EXPAND | wx.RIGHT, 5)
+        
+        self.browse_btn_retention = wx.Button(panel, label="浏览...")
+        folder_sizer.Add(self.browse_btn_retention, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(folder_sizer, 0, wx.EXPAND | wx.ALL, 10)
+        
+        # 策略设置
+        policy_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        policy_sizer.Add(wx.StaticText(panel, label="文件名通配:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.globs_retention = wx.TextCtrl(panel, value="*.log", size=(120, -1))
+        self.globs_retention.SetToolTip("逗号分隔，如 *.log,*.log.gz")
+        policy_sizer.Add(self.globs_retention, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        policy_sizer.Add(wx.StaticText(panel, label="删除早于(天):"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.older_days_retention = wx.SpinCtrl(panel, min=0, max=36500, initial=14, size=(70, -1))
+        self.older_days_retention.SetToolTip("0 表示不按时间删除")
+        policy_sizer.Add(self.older_days_retention, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        policy_sizer.Add(wx.StaticText(panel, label="每个目录保留最新:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.keep_newest_retention = wx.SpinCtrl(panel, min=0, max=100000, initial=5, size=(70, -1))
+        self.keep_newest_retention.SetToolTip("这些文件不受时间和总大小规则影响")
+        policy_sizer.Add(self.keep_newest_retention, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        policy_sizer.Add(wx.StaticText(panel, label="总大小上限(GB):"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.cap_gb_retention = wx.SpinCtrlDouble(panel, min=0, max=1000000, initial=0, inc=0.5,
+                                                  size=(80, -1))
+        self.cap_gb_retention.SetDigits(1)
+        self.cap_gb_retention.SetToolTip("0 表示不限；超出时从最旧的文件开始删除")
+        policy_sizer.Add(self.cap_gb_retention, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(policy_sizer, 0, wx.ALL, 10)
+        
+        # 扫描选项
+        options_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.recursive_scan_retention = wx.CheckBox(panel, label="递归扫描子目录")
+        self.recursive_scan_retention.SetValue(True)
+        options_sizer.Add(self.recursive_scan_retention, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        
+        self.prune_dirs_retention = wx.CheckBox(panel, label="删除后清理空目录")
+        options_sizer.Add(self.prune_dirs_retention, 0, wx.ALIGN_CENTER_VERTICAL)
+        main_sizer.Add(options_sizer, 0, wx.LEFT | wx.RIGHT, 10)
+        
+        # 按钮区域
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        
+        self.scan_btn_retention = wx.Button(panel, label="生成删除计划")
+        btn_sizer.Add(self.scan_btn_retention, 0, wx.RIGHT, 10)
+        
+        self.cancel_btn_retention = wx.Button(panel, label="取消")
+        self.cancel_btn_retention.Disable()
+        btn_sizer.Add(self.cancel_btn_retention, 0, wx.RIGHT, 10)
+        
+        self.delete_btn_retention = wx.Button(panel, label="执行删除计划")
+        self.delete_btn_retention.Disable()
+        btn_sizer.Add(self.delete_btn_retention, 0, wx.RIGHT, 10)
+        
+        self.recycle_option_retention = wx.CheckBox(panel, label="移动到回收站（可恢复）")
+        self.recycle_option_retention.SetValue(True)
+        btn_sizer.Add(self.recycle_option_retention, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        main_sizer.Add(btn_sizer, 0, wx.ALL, 10)
+        
+        # 删除计划列表：只列出将被删除的文件
+        files_label = wx.StaticText(panel, label="删除计划:")
+        main_sizer.Add(files_label, 0, wx.ALL, 5)
+        
+        self.files_list_retention = RetentionListCtrl(panel)
+        self.files_list_retention.InsertColumn(0, "文件名", width=200)
+        self.files_list_retention.InsertColumn(1, "大小", width=80)
+        self.files_list_retention.InsertColumn(2, "修改时间", width=120)
+        self.files_list_retention.InsertColumn(3, "完整路径", width=320)
+        self.files_list_retention.InsertColumn(4, "删除原因", width=100)
+        main_sizer.Add(self.create_search_bar(panel, self.files_list_retention), 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+        main_sizer.Add(self.files_list_retention, 1, wx.EXPAND | wx.ALL, 10)
+        
+        # 统计信息
+        self.stats_text_retention = wx.StaticText(panel, label="删除计划为空")
+        main_sizer.Add(self.stats_text_retention, 0, wx.ALL, 5)
+        
+        panel.SetSizer(main_sizer)
+        
+        # 绑定事件
+        self.browse_btn_retention.Bind(wx.EVT_BUTTON, self.on_browse_folder_retention)
+        self.scan_btn_retention.Bind(wx.EVT_BUTTON, self.on_plan_retention)
+        self.cancel_btn_retention.Bind(wx.EVT_BUTTON, self.on_cancel_plan_retention)
+        self.delete_btn_retention.Bind(wx.EVT_BUTTON, self.on_delete_retention)
+    
+    def create_search_bar(self, panel, files_list):
+        """列表上方的即时筛选框：每次输入只改变列表的视图，不重新填充列表"""
+        sizer = wx.BoxSizer(wx.HORIZONTAL)
+        sizer.Add(wx.StaticText(panel, label="筛选:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        search = wx.SearchCtrl(panel, size=(250, -1))
+        search.SetDescriptiveText("文件名，含路径分隔符时匹配完整路径")
+        search.ShowCancelButton(True)
+        sizer.Add(search, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        files_list.count_label = wx.StaticText(panel, label="")
+        sizer.Add(files_list.count_label, 0, wx.ALIGN_CENTER_VERTICAL)
+        
+        search.Bind(wx.EVT_TEXT, lambda event: files_list.set_query(search.GetValue()))
+        search.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, lambda event: search.SetValue(""))
+        return sizer
+    
     def create_log_area(self):
         """创建日志区域"""
         self.log_text = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_RICH2)
     
     def on_browse_folder_ext(self, event):
-        """浏览文件夹（按后缀删除）"""
+        """浏览文件夹（按后缀删除），替换已选的全部目录"""
         with wx.DirDialog(self, "选择文件夹", style=wx.DD_DEFAULT_STYLE) as dialog:
             if dialog.ShowModal() == wx.ID_OK:
-                self.selected_folder = dialog.GetPath()
-                self.folder_path_ext.SetValue(self.selected_folder)
-                self.log(f"[按后缀] 选择文件夹: {self.selected_folder}")
-                
-                # 清空文件列表
-                self.files_list_ext.DeleteAllItems()
-                self.files_to_delete = []
-                self.delete_btn_ext.Disable()
-                self.update_stats_ext()
+                self.set_folders_ext([dialog.GetPath()])
+                self.log(f"[按后缀] 选择文件夹: {dialog.GetPath()}")
+    
+    def on_add_folder_ext(self, event):
+        """再添加一个扫描目录（按后缀删除）"""
+        with wx.DirDialog(self, "添加文件夹", style=wx.DD_DEFAULT_STYLE) as dialog:
+            if dialog.ShowModal() == wx.ID_OK and dialog.GetPath() not in self.selected_folders:
+                self.set_folders_ext(self.selected_folders + [dialog.GetPath()])
+                self.log(f"[按后缀] 添加文件夹: {dialog.GetPath()}（共 {len(self.selected_folders)} 个）")
+    
+    def set_folders_ext(self, folders):
+        """更新按后缀选项卡的扫描目录，并清空上次的结果"""
+        self.cancel_scan_job(self.scan_job_ext)
+        self.selected_folders = folders
+        self.folder_path_ext.SetValue("; ".join(folders))
+        
+        # 清空文件列表
+        self.top_listing.pop("按后缀", None)
+        self.files_list_ext.DeleteAllItems()
+        self.files_to_delete = ScanResults()
+        self.delete_btn_ext.Disable()
+        self.update_stats_ext()
     
     def on_browse_folder_noext(self, event):
-        """浏览文件夹（无后缀文件清理）"""
+        """浏览文件夹（无后缀文件清理），替换已选的全部目录"""
         with wx.DirDialog(self, "选择扫描目录", style=wx.DD_DEFAULT_STYLE) as dialog:
             if dialog.ShowModal() == wx.ID_OK:
                 selected_path = dialog.GetPath()
+                self.selected_folders_noext = [selected_path]
                 self.folder_path_noext.SetValue(selected_path)
                 self.log(f"[无后缀] 选择扫描目录: {selected_path}")
     
+    def on_add_folder_noext(self, event):
+        """再添加一个扫描目录（无后缀文件清理）"""
+        with wx.DirDialog(self, "添加扫描目录", style=wx.DD_DEFAULT_STYLE) as dialog:
+            if dialog.ShowModal() == wx.ID_OK and dialog.GetPath() not in self.selected_folders_noext:
+                self.selected_folders_noext.append(dialog.GetPath())
+                self.folder_path_noext.SetValue("; ".join(self.selected_folders_noext))
+                self.log(f"[无后缀] 添加扫描目录: {dialog.GetPath()}（共 {len(self.selected_folders_noext)} 个）")
+    
+    def on_browse_folder_dupes(self, event):
+        """浏览文件夹（重复文件）"""
+        with wx.DirDialog(self, "选择扫描目录", style=wx.DD_DEFAULT_STYLE) as dialog:
+            if dialog.ShowModal() == wx.ID_OK:
+                selected_path = dialog.GetPath()
+                self.folder_path_dupes.SetValue(selected_path)
+                self.log(f"[重复文件] 选择扫描目录: {selected_path}")
+    
+    def on_browse_folder_retention(self, event):
+        """浏览文件夹（保留策略）"""
+        with wx.DirDialog(self, "选择扫描目录", style=wx.DD_DEFAULT_STYLE) as dialog:
+            if dialog.ShowModal() == wx.ID_OK:
+                selected_path = dialog.GetPath()
+                self.folder_path_retention.SetValue(selected_path)
+                self.log(f"[保留策略] 选择扫描目录: {selected_path}")
+    
     def on_scan_files_ext(self, event):
-        """扫描文件（按后缀删除）"""
-        if not self.selected_folder:
+        """扫描文件（按后缀删除），在后台线程中执行"""
+        if not self.selected_folders:
             wx.MessageBox("请先选择文件夹！", "提示", wx.OK | wx.ICON_WARNING)
             return
         
@@ -317,47 +1288,163 @@ class AdvancedFileCleanerApp(wx.Frame):
             wx.MessageBox("请输入文件后缀！", "提示", wx.OK | wx.ICON_WARNING)
             return
         
-        # 解析后缀
-        ext_list = [ext.strip() for ext in extensions.split(',') if ext.strip()]
+        # 解析后缀并把全部筛选规则预编译为一个匹配器
+        ext_list = parse_extensions(extensions)
+        try:
+            match_name = compile_filter(FilterRules(extensions=ext_list, **self.filter_ext.rules_kwargs()))
+        except re.error as e:
+            wx.MessageBox(f"正则表达式无效: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
+            return
+        recursive = self.recursive_scan_ext.GetValue()
+        max_depth = self.max_depth_ext.GetValue() or None
+        workers = self.scan_workers_ext.GetValue()
+        folders = list(self.selected_folders)
+        streaming = self.stream_option_ext.GetValue()
+        top = self.top_ext.value()
+        watch = self.watch_option_ext.GetValue()
+        if not self.check_multi_root(folders, top, watch):
+            return
+        if top and streaming:
+            wx.MessageBox("“只列出前 N 个”不能与“边扫描边删除”同时使用！", "提示", wx.OK | wx.ICON_WARNING)
+            return
+        if watch and (top or streaming):
+            wx.MessageBox("监视目录变化不能与“只列出前 N 个”或“边扫描边删除”同时使用！", "提示",
+                          wx.OK | wx.ICON_WARNING)
+            return
+        if streaming and not self.confirm_stream_deletion(
+                "; ".join(folders), "按后缀", self.recycle_option_ext.GetValue(), self.dry_run_ext.GetValue()):
+            return
+        index = self.open_scan_index() if self.use_index_ext.GetValue() and not watch else None
+        stats = ScanStats()
+        subtrees = None if streaming or top or watch else SubtreeTracker()
         
-        self.log(f"[按后缀] 开始扫描文件夹: {self.selected_folder}")
+        self.log(f"[按后缀] 开始扫描文件夹: {'; '.join(folders)}")
         self.log(f"[按后缀] 目标后缀: {', '.join(ext_list)}")
         
         # 清空文件列表
+        self.cancel_scan_job(self.scan_job_ext)
+        self.top_listing.pop("按后缀", None)
+        self.subtree_plans.pop("按后缀", None)
         self.files_list_ext.DeleteAllItems()
-        self.files_to_delete = []
+        self.files_to_delete = ScanResults()
+        self.delete_btn_ext.Disable()
+        self.update_stats_ext()
+        
+        estimate, totals_key = self.estimate_scan(folders, recursive, max_depth, index)
+        metrics = self.begin_metrics("按后缀流式清理" if streaming else "按后缀扫描", estimate)
+        timing = self.scan_timing(metrics)
+        
+        def scan(cancel_event):
+            return iter_matching_roots(folders, match_name, recursive, max_depth, cancel_event,
+                                       stats=stats, workers=workers, index=index, metrics=timing,
+                                       subtrees=subtrees)
+        
+        prune_root = folders if self.prune_dirs_ext.GetValue() else None
+        if streaming:
+            self.start_stream_deletion(scan, "按后缀", self.recycle_option_ext.GetValue(),
+                                       self.dry_run_ext.GetValue(), stats, index, metrics, totals_key,
+                                       prune_root)
+            return
+        summary = None
+        if top:
+            summary = TopSummary()
+            scan = self.limit_to_top(scan, "按后缀", folders[0] if index is None else os.path.abspath(folders[0]),
+                                     top, summary)
+        self.scan_roots_ext = folders
+        if watch:
+            self.scan_job_ext = self.start_watch_job(folders[0], match_name, "按后缀", recursive, max_depth, None,
+                                                     stats, metrics, totals_key)
+            return
+        if subtrees is not None:
+            self.subtree_plans["按后缀"] = (subtrees, match_name)
+        self.scan_job_ext = self.start_scan_job(scan, "按后缀", stats, index, metrics, totals_key, summary)
+    
+    def on_scan_noext_files(self, event):
+        """扫描无后缀文件，在后台线程中执行"""
+        folders = list(self.selected_folders_noext)
+        if not folders:
+            wx.MessageBox("请先选择扫描目录！", "提示", wx.OK | wx.ICON_WARNING)
+            return
         
+        missing = [folder for folder in folders if not os.path.exists(folder)]
+        if missing:
+            wx.MessageBox(f"选择的目录不存在: {'; '.join(missing)}", "错误", wx.OK | wx.ICON_ERROR)
+            return
+        
+        include_hidden = self.include_hidden.GetValue()
         try:
-            # 扫描文件
-            total_size = 0
-            for ext in ext_list:
-                pattern = os.path.join(self.selected_folder, f"*{ext}")
-                files = glob.glob(pattern, recursive=True)
-                
-                for file_path in files:
-                    if os.path.isfile(file_path):
-                        file_info = self.get_file_info(file_path)
-                        self.files_to_delete.append(file_info)
-                        total_size += file_info['size']
-            
-            # 更新文件列表
-            self.update_files_list_ext()
-            self.update_stats_ext()
-            
-            if self.files_to_delete:
-                self.delete_btn_ext.Enable()
-                self.log(f"[按后缀] 扫描完成，找到 {len(self.files_to_delete)} 个文件")
-            else:
-                self.delete_btn_ext.Disable()
-                self.log("[按后缀] 未找到匹配的文件")
-                
-        except Exception as e:
-            self.log(f"[按后缀] 扫描文件时出错: {str(e)}", logging.ERROR)
-            wx.MessageBox(f"扫描文件时出错: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
+            match_name = compile_filter(FilterRules(no_extension=True, include_hidden=include_hidden,
+                                                    **self.filter_noext.rules_kwargs()))
+        except re.error as e:
+            wx.MessageBox(f"正则表达式无效: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
+            return
+        recursive = self.recursive_scan.GetValue()
+        workers = self.scan_workers_noext.GetValue()
+        streaming = self.stream_option_noext.GetValue()
+        top = self.top_noext.value()
+        watch = self.watch_option_noext.GetValue()
+        if not self.check_multi_root(folders, top, watch):
+            return
+        if top and streaming:
+            wx.MessageBox("“只列出前 N 个”不能与“边扫描边删除”同时使用！", "提示", wx.OK | wx.ICON_WARNING)
+            return
+        if watch and (top or streaming):
+            wx.MessageBox("监视目录变化不能与“只列出前 N 个”或“边扫描边删除”同时使用！", "提示",
+                          wx.OK | wx.ICON_WARNING)
+            return
+        if streaming and not self.confirm_stream_deletion(
+                "; ".join(folders), "无后缀", self.recycle_option_noext.GetValue(), self.dry_run_noext.GetValue()):
+            return
+        index = self.open_scan_index() if self.use_index_noext.GetValue() and not watch else None
+        # 白名单在扫描开始时编译一次，扫描过程中的修改不影响本次扫描
+        whitelist = WhitelistMatcher(self.whitelist_dirs)
+        stats = ScanStats()
+        subtrees = None if streaming or top or watch else SubtreeTracker()
+        
+        self.log(f"[无后缀] 开始扫描无后缀文件: {'; '.join(folders)}")
+        
+        # 清空文件列表
+        self.cancel_scan_job(self.scan_job_noext)
+        self.top_listing.pop("无后缀", None)
+        self.subtree_plans.pop("无后缀", None)
+        self.files_list_noext.DeleteAllItems()
+        self.files_to_delete_noext = ScanResults()
+        self.delete_btn_noext.Disable()
+        self.update_stats_noext()
+        
+        estimate, totals_key = self.estimate_scan(folders, recursive, None, index)
+        metrics = self.begin_metrics("无后缀流式清理" if streaming else "无后缀扫描", estimate)
+        timing = self.scan_timing(metrics)
+        
+        def scan(cancel_event):
+            return self.scan_no_extension_files(
+                folders, include_hidden, cancel_event, whitelist, recursive, stats, workers, index,
+                match_name, timing, subtrees)
+        
+        prune_root = folders if self.prune_dirs_noext.GetValue() else None
+        if streaming:
+            self.start_stream_deletion(scan, "无后缀", self.recycle_option_noext.GetValue(),
+                                       self.dry_run_noext.GetValue(), stats, index, metrics, totals_key,
+                                       prune_root)
+            return
+        summary = None
+        if top:
+            summary = TopSummary()
+            scan = self.limit_to_top(
+                scan, "无后缀", folders[0] if index is None else os.path.abspath(folders[0]),
+                top, summary)
+        self.scan_roots_noext = folders
+        if watch:
+            self.scan_job_noext = self.start_watch_job(folders[0], match_name, "无后缀", recursive, None,
+                                                       whitelist, stats, metrics, totals_key)
+            return
+        if subtrees is not None:
+            self.subtree_plans["无后缀"] = (subtrees, match_name)
+        self.scan_job_noext = self.start_scan_job(scan, "无后缀", stats, index, metrics, totals_key, summary)
     
-    def on_scan_noext_files(self, event):
-        """扫描无后缀文件"""
-        selected_folder = self.folder_path_noext.GetValue().strip()
+    def on_scan_dupes(self, event):
+        """查找重复文件：扫描与逐阶段比较都在后台线程中执行"""
+        selected_folder = self.folder_path_dupes.GetValue().strip()
         if not selected_folder:
             wx.MessageBox("请先选择扫描目录！", "提示", wx.OK | wx.ICON_WARNING)
             return
@@ -366,159 +1453,568 @@ class AdvancedFileCleanerApp(wx.Frame):
             wx.MessageBox("选择的目录不存在！", "错误", wx.OK | wx.ICON_ERROR)
             return
         
-        self.log(f"[无后缀] 开始扫描无后缀文件: {selected_folder}")
+        try:
+            match_name = compile_filter(FilterRules(**self.filter_dupes.rules_kwargs()))
+        except re.error as e:
+            wx.MessageBox(f"正则表达式无效: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
+            return
+        recursive = self.recursive_scan_dupes.GetValue()
+        workers = self.hash_workers_dupes.GetValue()
+        whitelist = WhitelistMatcher(self.whitelist_dirs)
+        stats = ScanStats()
+        
+        self.log(f"[重复文件] 开始查找重复文件: {selected_folder}")
+        
+        self.cancel_scan_job(self.dupe_job)
+        self.files_list_dupes.DeleteAllItems()
+        self.files_to_delete_dupes = ScanResults()
+        self.duplicate_groups = []
+        self.delete_btn_dupes.Disable()
+        self.update_stats_dupes()
+        
+        metrics = self.begin_metrics("查找重复文件")
+        timing = self.scan_timing(metrics)
+        
+        def scan(cancel_event):
+            return iter_matching_files(selected_folder, match_name, recursive, cancel_event=cancel_event,
+                                       whitelist=whitelist, stats=stats, metrics=timing)
+        
+        job = DuplicateJob(
+            scan,
+            on_done=lambda groups, cancelled, error: wx.CallAfter(
+                self.on_dupes_done, job, stats, groups, cancelled, error),
+            workers=workers,
+            metrics=metrics
+        )
+        self.dupe_job = job
+        progress = job.progress
+        
+        def describe():
+            stage = DUPLICATE_STAGES.get(progress.stage, progress.stage)
+            if progress.stage == STAGE_SCAN:
+                return f"{stage}，已扫描 {progress.files_scanned} 个文件"
+            if progress.stage == STAGE_IDENTITY:
+                return f"{stage}，{progress.candidates} 个大小相同的文件"
+            return (f"{stage}，已读取 {format_size(progress.stage_bytes_read)}"
+                    f"/{format_size(progress.stage_bytes_total)}")
+        
+        self.track_progress(
+            'dupes',
+            lambda: (progress.stage_bytes_read, progress.files_scanned, progress.bytes_read),
+            total=lambda: progress.stage_bytes_total or None,
+            describe=describe)
+        self.scan_btn_dupes.Disable()
+        self.cancel_btn_dupes.Enable()
+        job.start()
+    
+    def on_cancel_scan_dupes(self, event):
+        """取消查找重复文件"""
+        if self.cancel_scan_job(self.dupe_job):
+            self.log("[重复文件] 正在取消查找...")
+    
+    def on_dupes_done(self, job, stats, groups, cancelled, error):
+        """重复文件查找结束（主线程）"""
+        if job is not self.dupe_job:
+            return
+        self.scan_btn_dupes.Enable()
+        self.cancel_btn_dupes.Disable()
+        progress = job.progress
+        
+        if error is not None:
+            self.log(f"[重复文件] 查找重复文件时出错: {str(error)}", logging.ERROR)
+            wx.MessageBox(f"查找重复文件时出错: {str(error)}", "错误", wx.OK | wx.ICON_ERROR)
+        if stats.dirs_skipped:
+            self.log(f"[重复文件] 已跳过 {stats.dirs_skipped} 个白名单目录")
+        if progress.hardlinks:
+            self.log(f"[重复文件] {progress.hardlinks} 个硬链接与已有文件指向同一数据，已合并计算")
+        if progress.errors:
+            self.log(f"[重复文件] {progress.errors} 个文件无法读取或在比较期间被修改，已忽略", logging.WARNING)
+        
+        self.duplicate_groups = groups
+        self.update_dupes_selection()
+        if cancelled:
+            self.log("[重复文件] 查找已取消")
+        elif error is None:
+            self.log(f"[重复文件] 查找完成：扫描 {progress.files_scanned} 个文件，"
+                     f"找到 {len(groups)} 组重复文件，共读取 {format_size(progress.bytes_read)}")
+        
+        self.finish_metrics('duplicates', "重复文件", job.metrics, {
+            'cancelled': cancelled, 'error': str(error) if error is not None else None,
+            'files_scanned': progress.files_scanned, 'size_candidates': progress.candidates,
+            'hardlinks': progress.hardlinks, 'read_errors': progress.errors,
+            'bytes_read': progress.bytes_read, 'groups': len(groups),
+            'redundant_files': len(self.files_to_delete_dupes),
+            'reclaimable_bytes': self.files_to_delete_dupes.total_size,
+            'dirs_scanned': stats.dirs_scanned, 'dirs_skipped': stats.dirs_skipped})
+    
+    def on_keep_rule_changed(self, event):
+        """切换保留规则只需重新选择，不必重新比较文件内容"""
+        if self.duplicate_groups:
+            self.update_dupes_selection()
+    
+    def update_dupes_selection(self):
+        """按当前保留规则生成待删除的副本列表"""
+        rule = KEEP_RULE_CHOICES[self.keep_rule_dupes.GetSelection()][0]
+        self.files_to_delete_dupes = select_redundant(self.duplicate_groups, rule)
+        self.files_list_dupes.set_files(self.files_to_delete_dupes)
+        self.delete_btn_dupes.Enable(bool(self.files_to_delete_dupes))
+        self.update_stats_dupes()
+    
+    def build_retention_policy(self):
+        """按界面设置创建一条保留策略"""
+        globs = [g.strip() for g in self.globs_retention.GetValue().split(',') if g.strip()]
+        cap_gb = self.cap_gb_retention.GetValue()
+        return RetentionPolicy(
+            FilterRules(name_globs=globs),
+            older_than_days=self.older_days_retention.GetValue() or None,
+            keep_newest=self.keep_newest_retention.GetValue(),
+            max_total_bytes=int(cap_gb * 1024 ** 3) if cap_gb > 0 else None)
+    
+    def on_plan_retention(self, event):
+        """按保留策略生成删除计划：一次流式遍历，不保存未被删除的文件"""
+        selected_folder = self.folder_path_retention.GetValue().strip()
+        if not selected_folder:
+            wx.MessageBox("请先选择扫描目录！", "提示", wx.OK | wx.ICON_WARNING)
+            return
         
-        # 清空文件列表
-        self.files_list_noext.DeleteAllItems()
-        self.files_to_delete_noext = []
+        if not os.path.exists(selected_folder):
+            wx.MessageBox("选择的目录不存在！", "错误", wx.OK | wx.ICON_ERROR)
+            return
         
+        policy = self.build_retention_policy()
+        if policy.older_than_days is None and policy.max_total_bytes is None:
+            wx.MessageBox("请设置保留天数或总大小上限！", "提示", wx.OK | wx.ICON_WARNING)
+            return
+        recursive = self.recursive_scan_retention.GetValue()
+        whitelist = WhitelistMatcher(self.whitelist_dirs)
+        stats = ScanStats()
+        planner = RetentionPlanner([policy])
+        
+        self.log(f"[保留策略] 开始生成删除计划: {selected_folder}（{policy.describe()}）")
+        
+        self.cancel_scan_job(self.retention_job)
+        self.files_list_retention.DeleteAllItems()
+        self.files_to_delete_retention = ScanResults()
+        self.delete_btn_retention.Disable()
+        self.update_stats_retention()
+        
+        estimate, totals_key = self.estimate_scan([selected_folder], recursive, None, None)
+        metrics = self.begin_metrics("生成删除计划", estimate)
+        timing = self.scan_timing(metrics)
+        
+        def scan(match_name, cancel_event):
+            return iter_matching_files(selected_folder, match_name, recursive, cancel_event=cancel_event,
+                                       whitelist=whitelist, stats=stats, metrics=timing)
+        
+        job = RetentionJob(
+            planner, scan,
+            on_done=lambda planner, cancelled, error: wx.CallAfter(
+                self.on_retention_done, job, stats, selected_folder, totals_key, cancelled, error),
+            metrics=metrics
+        )
+        self.retention_job = job
+        
+        def describe():
+            return (f"已扫描 {stats.dirs_scanned} 个目录，匹配 {planner.matched_files} 个文件，"
+                    f"计划删除 {planner.planned_files} 个")
+        
+        self.track_progress(
+            'scan',
+            lambda: (stats.dirs_scanned, planner.matched_files, planner.matched_bytes),
+            describe=describe)
+        self.scan_btn_retention.Disable()
+        self.cancel_btn_retention.Enable()
+        job.start()
+    
+    def on_cancel_plan_retention(self, event):
+        """取消生成删除计划"""
+        if self.cancel_scan_job(self.retention_job):
+            self.log("[保留策略] 正在取消...")
+    
+    def on_retention_done(self, job, stats, root, totals_key, cancelled, error):
+        """删除计划生成结束（主线程）；取消或出错时不提供部分计划，避免按不完整的预算删除"""
+        if job is not self.retention_job:
+            return
+        self.scan_btn_retention.Enable()
+        self.cancel_btn_retention.Disable()
+        planner = job.planner
+        
+        if error is not None:
+            self.log(f"[保留策略] 生成删除计划时出错: {str(error)}", logging.ERROR)
+            wx.MessageBox(f"生成删除计划时出错: {str(error)}", "错误", wx.OK | wx.ICON_ERROR)
+        if stats.dirs_skipped:
+            self.log(f"[保留策略] 已跳过 {stats.dirs_skipped} 个白名单目录")
+        
+        if cancelled:
+            self.log("[保留策略] 已取消，删除计划未生成")
+        elif error is None:
+            self.save_scan_totals(totals_key, stats)
+            self.scan_root_retention = root
+            self.files_to_delete_retention = planner.plan
+            self.files_list_retention.set_plan(planner.plan, planner.reasons)
+            self.delete_btn_retention.Enable(bool(planner.plan))
+            for name, (files, nbytes) in planner.reason_counts().items():
+                self.log(f"[保留策略] {name}: {files} 个文件，{format_size(nbytes)}")
+            self.log(f"[保留策略] 删除计划已生成：匹配 {planner.matched_files} 个文件"
+                     f"（{format_size(planner.matched_bytes)}），计划删除 {len(planner.plan)} 个")
+            self.update_stats_retention(planner)
+        
+        self.finish_metrics('retention', "保留策略", job.metrics, {
+            'cancelled': cancelled, 'error': str(error) if error is not None else None,
+            'matched_files': planner.matched_files, 'matched_bytes': planner.matched_bytes,
+            'planned_files': len(planner.plan), 'planned_bytes': planner.plan.total_size,
+            'policies': planner.summary(),
+            'dirs_scanned': stats.dirs_scanned, 'dirs_skipped': stats.dirs_skipped})
+    
+    def on_cancel_scan_ext(self, event):
+        """取消按后缀扫描（或流式清理、停止监视）"""
+        watching = self.watching("按后缀")
+        if self.cancel_scan_job(self.scan_job_ext) or self.cancel_stream_job("按后缀"):
+            self.log("[按后缀] 正在停止监视..." if watching else "[按后缀] 正在取消扫描...")
+    
+    def on_cancel_scan_noext(self, event):
+        """取消无后缀扫描（或流式清理、停止监视）"""
+        watching = self.watching("无后缀")
+        if self.cancel_scan_job(self.scan_job_noext) or self.cancel_stream_job("无后缀"):
+            self.log("[无后缀] 正在停止监视..." if watching else "[无后缀] 正在取消扫描...")
+    
+    def check_multi_root(self, folders, top, watch):
+        """多个扫描目录时不支持监视模式和按目录列出前 N 个，返回是否可以开始扫描"""
+        if len(folders) < 2:
+            return True
+        if watch:
+            wx.MessageBox("监视目录变化只支持单个扫描目录！", "提示", wx.OK | wx.ICON_WARNING)
+            return False
+        if top and top[0] == 'dirs':
+            wx.MessageBox("按目录列出前 N 个只支持单个扫描目录！", "提示", wx.OK | wx.ICON_WARNING)
+            return False
+        return True
+    
+    def limit_to_top(self, scan_func, operation_type, root, top, summary):
+        """把扫描函数包装为只产出最大的若干个文件或目录（遍历结束后一次性产出）"""
+        mode, count = top
+        self.top_listing[operation_type] = (mode, summary)
+        self.log(f"[{operation_type}] 只保留最大的 {count} 个{'目录' if mode == 'dirs' else '文件'}")
+        
+        def scan(cancel_event):
+            hits = scan_func(cancel_event)
+            if mode == 'dirs':
+                return iter_largest_directories(hits, root, count, summary)
+            return iter_largest_files(hits, count, summary)
+        return scan
+    
+    def deletable(self, operation_type, files):
+        """列表中有文件且不是目录列表时才允许删除"""
+        listing = self.top_listing.get(operation_type)
+        return bool(files) and (listing is None or listing[0] != 'dirs')
+    
+    def top_stats_label(self, listing, files):
+        """最大文件/目录模式的统计文字"""
+        mode, summary = listing
+        matched = f"全部匹配 {summary.files} 个文件，{format_size(summary.bytes)}"
+        if mode == 'dirs':
+            return f"最大的 {len(files)} 个目录（{matched}）"
+        return f"最大的 {len(files)} 个文件，总大小 {format_size(files.total_size)}（{matched}）"
+    
+    def open_scan_index(self):
+        """打开持久化扫描索引；失败时记录警告并退回完整扫描"""
         try:
-            # 扫描无后缀文件
-            files_found = self.scan_no_extension_files(selected_folder)
-            
-            # 更新文件列表
+            return ScanIndex()
+        except Exception as e:
+            self.log(f"无法打开扫描索引，将进行完整扫描: {str(e)}", logging.WARNING)
+            return None
+    
+    def start_scan_job(self, scan_func, operation_type, stats=None, index=None, metrics=None, totals_key=None,
+                       summary=None):
+        """启动后台扫描任务，结果通过 wx.CallAfter 分批回到主线程
+        
+        summary 为 TopSummary 时（最大文件/目录模式）进度取其匹配计数，结果在遍历结束后一次性到达。
+        """
+        job = ScanJob(
+            scan_func,
+            on_batch=lambda batch: wx.CallAfter(self.on_scan_batch, job, operation_type, batch),
+            on_done=lambda cancelled, error: wx.CallAfter(
+                self.on_scan_done, job, operation_type, cancelled, error),
+            stats=stats,
+            index=index,
+            metrics=metrics
+        )
+        job.totals_key = totals_key
+        self.begin_scan_job(job, operation_type, stats, summary)
+        return job
+    
+    def begin_scan_job(self, job, operation_type, stats, summary=None):
+        """设置扫描进度来源、切换按钮状态并启动任务"""
+        if summary is not None:
+            self.track_progress('scan', lambda: (stats.dirs_scanned, summary.files, summary.bytes))
+        elif operation_type == "按后缀":
+            self.track_progress('scan', lambda: (stats.dirs_scanned, len(self.files_to_delete),
+                                                 self.files_to_delete.total_size))
+        else:
+            self.track_progress('scan', lambda: (stats.dirs_scanned, len(self.files_to_delete_noext),
+                                                 self.files_to_delete_noext.total_size))
+        if operation_type == "按后缀":
+            self.scan_btn_ext.Disable()
+            self.cancel_btn_ext.Enable()
+        else:
+            self.scan_btn_noext.Disable()
+            self.cancel_btn_noext.Enable()
+        job.start()
+    
+    def start_watch_job(self, root, match_name, operation_type, recursive, max_depth, whitelist, stats,
+                        metrics, totals_key):
+        """启动监视模式：初始扫描的结果与普通扫描一样分批回到主线程，之后按目录增量更新列表"""
+        job = WatchJob(
+            root, match_name,
+            on_batch=lambda batch: wx.CallAfter(self.on_scan_batch, job, operation_type, batch),
+            on_done=lambda cancelled, error: wx.CallAfter(
+                self.on_watch_ready, job, operation_type, cancelled, error),
+            on_change=lambda changes: wx.CallAfter(self.on_watch_change, job, operation_type, changes),
+            on_stopped=lambda error: wx.CallAfter(self.on_watch_stopped, job, operation_type, error),
+            on_fallback=lambda reason: wx.CallAfter(
+                self.log, f"[{operation_type}] {reason}，改为每 {POLL_INTERVAL:g} 秒增量重扫一次", logging.WARNING),
+            recursive=recursive,
+            max_depth=max_depth,
+            whitelist=whitelist,
+            stats=stats,
+            metrics=metrics,
+            scan_metrics=self.scan_timing(metrics)
+        )
+        job.totals_key = totals_key
+        self.pending_watch_changes.pop(operation_type, None)
+        self.begin_scan_job(job, operation_type, stats)
+        return job
+    
+    def watching(self, operation_type):
+        """返回该选项卡正处于监视阶段的 WatchJob，没有时返回 None"""
+        job = self.scan_job_ext if operation_type == "按后缀" else self.scan_job_noext
+        if isinstance(job, WatchJob) and job.ready and job.is_running() and not job.cancelled:
+            return job
+        return None
+    
+    def on_watch_ready(self, job, operation_type, cancelled, error):
+        """监视模式的初始扫描结束（主线程）：与普通扫描相同地收尾，之后取消按钮用于停止监视"""
+        self.on_scan_done(job, operation_type, cancelled, error)
+        current = self.scan_job_ext if operation_type == "按后缀" else self.scan_job_noext
+        if job is not current or cancelled or error is not None:
+            return
+        cancel_btn = self.cancel_btn_ext if operation_type == "按后缀" else self.cancel_btn_noext
+        cancel_btn.SetLabel("停止监视")
+        cancel_btn.Enable()
+        if job.mode == MODE_POLL:
+            self.log(f"[{operation_type}] 开始监视目录变化（每 {POLL_INTERVAL:g} 秒增量重扫一次）")
+        else:
+            self.log(f"[{operation_type}] 开始监视 {job.watched_dirs} 个目录的变化")
+    
+    def on_watch_change(self, job, operation_type, changes):
+        """按目录替换列表中的行（主线程）；删除进行中时先暂存，删除结束后再合并"""
+        current = self.scan_job_ext if operation_type == "按后缀" else self.scan_job_noext
+        if job is not current:
+            return
+        if self.deletion_job is not None:
+            self.pending_watch_changes.setdefault(operation_type, {}).update(changes)
+            return
+        self.apply_watch_changes(operation_type, changes)
+    
+    def apply_watch_changes(self, operation_type, changes):
+        if operation_type == "按后缀":
+            self.files_to_delete.replace_directories(changes)
+            self.update_files_list_ext()
+            self.files_list_ext.finish_updates()
+            self.update_stats_ext()
+            self.delete_btn_ext.Enable(self.deletable(operation_type, self.files_to_delete))
+        else:
+            self.files_to_delete_noext.replace_directories(changes)
             self.update_files_list_noext()
+            self.files_list_noext.finish_updates()
             self.update_stats_noext()
-            
-            if files_found:
-                self.delete_btn_noext.Enable()
-                self.log(f"[无后缀] 扫描完成，找到 {len(files_found)} 个无后缀文件")
-            else:
-                self.delete_btn_noext.Disable()
-                self.log("[无后缀] 未找到无后缀文件")
-                
-        except Exception as e:
-            self.log(f"[无后缀] 扫描文件时出错: {str(e)}", logging.ERROR)
-            wx.MessageBox(f"扫描文件时出错: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
+            self.delete_btn_noext.Enable(self.deletable(operation_type, self.files_to_delete_noext))
     
-    def scan_no_extension_files(self, directory):
-        """扫描指定目录中的无后缀文件"""
-        noext_files = []
+    def on_watch_stopped(self, job, operation_type, error):
+        """监视结束（主线程）"""
+        if error is not None:
+            self.log(f"[{operation_type}] 监视已停止: {str(error)}", logging.WARNING)
+        if job.updates or job.dirs_relisted:
+            self.log(f"[{operation_type}] 监视结束：共更新 {job.updates} 次，重新列出 {job.dirs_relisted} 个目录")
+        current = self.scan_job_ext if operation_type == "按后缀" else self.scan_job_noext
+        cancel_btn = self.cancel_btn_ext if operation_type == "按后缀" else self.cancel_btn_noext
+        cancel_btn.SetLabel("取消扫描")
+        if job is current:
+            cancel_btn.Disable()
+            self.pending_watch_changes.pop(operation_type, None)
+    
+    def cancel_scan_job(self, job):
+        """取消仍在运行的扫描任务，返回是否确实发出了取消请求"""
+        if job is not None and job.is_running() and not job.cancelled:
+            job.cancel()
+            return True
+        return False
+    
+    def on_scan_batch(self, job, operation_type, batch):
+        """把一批扫描结果追加到列表和统计信息（主线程）"""
+        # 已被取代的扫描任务迟到的结果直接丢弃
+        if operation_type == "按后缀":
+            if job is not self.scan_job_ext:
+                return
+            files = self.files_to_delete
+        else:
+            if job is not self.scan_job_noext:
+                return
+            files = self.files_to_delete_noext
         
-        try:
-            for root, dirs, files in os.walk(directory):
-                # 检查是否在白名单中
-                if self.is_whitelisted(root):
-                    self.log(f"[无后缀] 跳过白名单目录: {root}", logging.INFO)
-                    continue
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    
-                    # 检查是否为无后缀文件
-                    if self.is_no_extension_file(file):
-                        # 检查文件属性
-                        if not self.include_hidden.GetValue() and self.is_hidden_file(file_path):
-                            continue
-                        
-                        file_info = self.get_file_info(file_path)
-                        noext_files.append(file_info)
-            
-            self.files_to_delete_noext = noext_files
-            return noext_files
-            
-        except Exception as e:
-            self.log(f"[无后缀] 扫描目录时出错: {str(e)}", logging.ERROR)
-            raise e
+        started = time.perf_counter()
+        files.extend(batch)
+        
+        if operation_type == "按后缀":
+            self.update_files_list_ext()
+            self.update_stats_ext()
+        else:
+            self.update_files_list_noext()
+            self.update_stats_noext()
+        if job.metrics is not None:
+            job.metrics.add_time('gui_population', time.perf_counter() - started)
+    
+    def on_scan_done(self, job, operation_type, cancelled, error):
+        """扫描任务结束（主线程）"""
+        if operation_type == "按后缀":
+            if job is not self.scan_job_ext:
+                return
+            files = self.files_to_delete
+            self.scan_btn_ext.Enable()
+            self.cancel_btn_ext.Disable()
+            delete_btn = self.delete_btn_ext
+        else:
+            if job is not self.scan_job_noext:
+                return
+            files = self.files_to_delete_noext
+            self.scan_btn_noext.Enable()
+            self.cancel_btn_noext.Disable()
+            delete_btn = self.delete_btn_noext
+        
+        if error is not None:
+            self.log(f"[{operation_type}] 扫描文件时出错: {str(error)}", logging.ERROR)
+            wx.MessageBox(f"扫描文件时出错: {str(error)}", "错误", wx.OK | wx.ICON_ERROR)
+        
+        delete_btn.Enable(self.deletable(operation_type, files))
+        (self.files_list_ext if operation_type == "按后缀" else self.files_list_noext).finish_updates()
+        
+        if job.index is not None:
+            self.log(f"[{operation_type}] 增量扫描: 复用 {job.index.reused} 个未变化目录，"
+                     f"重新列出 {job.index.relisted} 个目录")
+        self.log_scan_stats(operation_type, job.stats)
+        
+        if cancelled:
+            self.log(f"[{operation_type}] 扫描已取消，已找到 {len(files)} 个文件")
+        elif error is None:
+            listing = self.top_listing.get(operation_type)
+            if listing is not None:
+                self.log(f"[{operation_type}] 扫描完成，{self.top_stats_label(listing, files)}")
+            elif files:
+                self.log(f"[{operation_type}] 扫描完成，找到 {len(files)} 个文件")
+                plan = self.subtree_plans.get(operation_type)
+                if plan is not None and plan[0].subtrees:
+                    self.log(f"[{operation_type}] 其中 {len(plan[0].subtrees)} 个子目录全部由匹配文件组成，"
+                             f"可整体删除")
+            else:
+                self.log(f"[{operation_type}] 未找到匹配的文件")
+        
+        extra = {'cancelled': cancelled, 'error': str(error) if error is not None else None,
+                 'matched_files': len(files), 'matched_bytes': files.total_size}
+        listing = self.top_listing.get(operation_type)
+        if listing is not None:
+            extra.update({'top_mode': listing[0], 'top_rows': len(files),
+                          'matched_files': listing[1].files, 'matched_bytes': listing[1].bytes})
+        if job.stats is not None:
+            extra.update({'dirs_scanned': job.stats.dirs_scanned, 'dirs_skipped': job.stats.dirs_skipped,
+                          'dirs_duplicate': job.stats.dirs_duplicate, 'scan_errors': job.stats.errors})
+        if job.index is not None:
+            extra.update({'index_reused': job.index.reused, 'index_relisted': job.index.relisted})
+        if not cancelled and error is None:
+            self.save_scan_totals(job.totals_key, job.stats)
+        self.finish_metrics('scan', operation_type, job.metrics, extra)
+    
+    def log_scan_stats(self, operation_type, stats):
+        """记录扫描中跳过的白名单目录、重复目录和无法访问的扫描目录"""
+        if stats is None:
+            return
+        if stats.dirs_skipped:
+            self.log(f"[{operation_type}] 已跳过 {stats.dirs_skipped} 个白名单目录")
+        if stats.dirs_duplicate:
+            self.log(f"[{operation_type}] 已跳过 {stats.dirs_duplicate} 个重复目录（嵌套、重复或绑定挂载的扫描目录）")
+        for root, message in stats.failed_roots:
+            self.log(f"[{operation_type}] 无法扫描目录 {root}: {message}", logging.WARNING)
+    
+    def scan_no_extension_files(self, directories, include_hidden=False, cancel_event=None,
+                                whitelist=None, recursive=True, stats=None, workers=1, index=None,
+                                match_name=None, metrics=None, subtrees=None):
+        """扫描一个或多个目录中的无后缀文件，返回 (目录, 文件名, 大小, 修改时间) 迭代器
+        
+        在后台线程中运行，不能直接访问界面控件。白名单子树在遍历时整体剪除；
+        隐藏属性直接取自目录枚举的 stat 数据，不再对每个文件额外 stat。
+        多个目录时按所在设备并发扫描，重叠的部分只扫描一次。
+        """
+        if whitelist is None:
+            whitelist = WhitelistMatcher(self.whitelist_dirs)
+        if match_name is None:
+            match_name = compile_filter(FilterRules(no_extension=True, include_hidden=include_hidden))
+        
+        return iter_matching_roots(directories, match_name, recursive,
+                                   cancel_event=cancel_event, whitelist=whitelist, stats=stats,
+                                   workers=workers, index=index, metrics=metrics, subtrees=subtrees)
     
     def is_no_extension_file(self, filename):
         """判断是否为无后缀文件"""
-        # 排除有后缀的文件和系统文件
-        if '.' in filename:
-            return False
-        
-        # 排除常见的系统无后缀文件
-        system_files = ['Thumbs', 'desktop', 'DS_Store', 'localized']
-        if filename in system_files:
-            return False
-            
-        return True
+        return is_no_extension_name(filename)
     
     def is_whitelisted(self, path):
         """检查路径是否在白名单中"""
-        path_parts = Path(path).parts
-        for part in path_parts:
-            if part in self.whitelist_dirs:
-                return True
-        return False
+        return WhitelistMatcher(self.whitelist_dirs).matches_path(path)
     
     def is_hidden_file(self, filepath):
         """检查文件是否为隐藏文件"""
-        try:
-            return bool(os.stat(filepath).st_file_attributes & 2)  # FILE_ATTRIBUTE_HIDDEN
-        except:
-            return False
-    
-    def get_file_info(self, file_path):
-        """获取文件信息"""
-        stat = os.stat(file_path)
-        return {
-            'path': file_path,
-            'name': os.path.basename(file_path),
-            'size': stat.st_size,
-            'modified': datetime.datetime.fromtimestamp(stat.st_mtime)
-        }
+        return is_hidden_file(filepath)
     
     def update_files_list_ext(self):
         """更新按后缀删除的文件列表显示"""
-        self.files_list_ext.DeleteAllItems()
-        
-        for i, file_info in enumerate(self.files_to_delete):
-            index = self.files_list_ext.InsertItem(i, file_info['name'])
-            
-            # 格式化文件大小
-            size_kb = file_info['size'] / 1024
-            if size_kb < 1024:
-                size_str = f"{size_kb:.1f} KB"
-            else:
-                size_str = f"{size_kb/1024:.1f} MB"
-            
-            self.files_list_ext.SetItem(index, 1, size_str)
-            self.files_list_ext.SetItem(index, 2, file_info['modified'].strftime("%Y-%m-%d %H:%M:%S"))
-            self.files_list_ext.SetItem(index, 3, file_info['path'])
+        self.files_list_ext.set_files(self.files_to_delete)
     
     def update_files_list_noext(self):
         """更新无后缀文件列表显示"""
-        self.files_list_noext.DeleteAllItems()
-        
-        for i, file_info in enumerate(self.files_to_delete_noext):
-            index = self.files_list_noext.InsertItem(i, file_info['name'])
-            
-            # 格式化文件大小
-            size_kb = file_info['size'] / 1024
-            if size_kb < 1024:
-                size_str = f"{size_kb:.1f} KB"
-            else:
-                size_str = f"{size_kb/1024:.1f} MB"
-            
-            self.files_list_noext.SetItem(index, 1, size_str)
-            self.files_list_noext.SetItem(index, 2, file_info['modified'].strftime("%Y-%m-%d %H:%M:%S"))
-            self.files_list_noext.SetItem(index, 3, file_info['path'])
+        self.files_list_noext.set_files(self.files_to_delete_noext)
     
     def update_stats_ext(self):
         """更新按后缀删除的统计信息"""
-        total_size = sum(f['size'] for f in self.files_to_delete)
-        size_kb = total_size / 1024
-        
-        if size_kb < 1024:
-            size_str = f"{size_kb:.1f} KB"
-        else:
-            size_str = f"{size_kb/1024:.1f} MB"
-        
+        listing = self.top_listing.get("按后缀")
+        if listing is not None:
+            self.stats_text_ext.SetLabel(self.top_stats_label(listing, self.files_to_delete))
+            return
+        size_str = format_size(self.files_to_delete.total_size)
         self.stats_text_ext.SetLabel(f"找到 {len(self.files_to_delete)} 个文件，总大小 {size_str}")
     
     def update_stats_noext(self):
         """更新无后缀文件统计信息"""
-        total_size = sum(f['size'] for f in self.files_to_delete_noext)
-        size_kb = total_size / 1024
-        
-        if size_kb < 1024:
-            size_str = f"{size_kb:.1f} KB"
-        else:
-            size_str = f"{size_kb/1024:.1f} MB"
-        
+        listing = self.top_listing.get("无后缀")
+        if listing is not None:
+            self.stats_text_noext.SetLabel(self.top_stats_label(listing, self.files_to_delete_noext))
+            return
+        size_str = format_size(self.files_to_delete_noext.total_size)
         self.stats_text_noext.SetLabel(f"找到 {len(self.files_to_delete_noext)} 个无后缀文件，总大小 {size_str}")
     
+    def update_stats_dupes(self):
+        """更新重复文件统计信息"""
+        size_str = format_size(self.files_to_delete_dupes.total_size)
+        self.stats_text_dupes.SetLabel(f"找到 {len(self.duplicate_groups)} 组重复文件，"
+                                       f"{len(self.files_to_delete_dupes)} 个多余副本，可释放 {size_str}")
+    
+    def update_stats_retention(self, planner=None):
+        """更新保留策略统计信息"""
+        size_str = format_size(self.files_to_delete_retention.total_size)
+        label = f"计划删除 {len(self.files_to_delete_retention)} 个文件，可释放 {size_str}"
+        if planner is not None:
+            kept = planner.matched_files - len(planner.plan)
+            label += f"；保留 {kept} 个匹配文件（{format_size(planner.matched_bytes - planner.plan.total_size)}）"
+        self.stats_text_retention.SetLabel(label)
+    
     def on_delete_files_ext(self, event):
         """执行删除操作（按后缀删除）"""
         if not self.files_to_delete:
@@ -526,100 +2022,453 @@ class AdvancedFileCleanerApp(wx.Frame):
             return
         
         use_recycle = self.recycle_option_ext.GetValue()
-        self.perform_deletion(self.files_to_delete, "按后缀", use_recycle)
+        prune_root = self.scan_roots_ext if self.prune_dirs_ext.GetValue() else None
+        subtree_plan = self.subtree_plans.get("按后缀") if self.whole_dirs_ext.GetValue() else None
+        self.perform_deletion(self.files_to_delete, "按后缀", use_recycle, prune_root, subtree_plan)
     
     def on_delete_noext_files(self, event):
         """执行无后缀文件清理"""
-        if not hasattr(self, 'files_to_delete_noext') or not self.files_to_delete_noext:
+        if not self.files_to_delete_noext:
             wx.MessageBox("没有无后缀文件可清理！", "提示", wx.OK | wx.ICON_INFORMATION)
             return
         
         use_recycle = self.recycle_option_noext.GetValue()
-        self.perform_deletion(self.files_to_delete_noext, "无后缀", use_recycle)
+        prune_root = self.scan_roots_noext if self.prune_dirs_noext.GetValue() else None
+        subtree_plan = self.subtree_plans.get("无后缀") if self.whole_dirs_noext.GetValue() else None
+        self.perform_deletion(self.files_to_delete_noext, "无后缀", use_recycle, prune_root, subtree_plan)
+    
+    def on_delete_dupes(self, event):
+        """删除多余副本：先确认每组保留的文件仍然存在"""
+        if not self.files_to_delete_dupes:
+            wx.MessageBox("没有多余副本可删除！", "提示", wx.OK | wx.ICON_INFORMATION)
+            return
+        
+        missing = missing_keepers(self.duplicate_groups)
+        if missing:
+            self.log(f"[重复文件] {len(missing)} 组的保留文件已不存在，例如: {missing[0].kept_path()}",
+                     logging.WARNING)
+            wx.MessageBox(f"有 {len(missing)} 组重复文件的保留文件已被移动或删除，"
+                          f"为避免删除最后一份副本，请重新查找后再删除。", "提示", wx.OK | wx.ICON_WARNING)
+            return
+        
+        use_recycle = self.recycle_option_dupes.GetValue()
+        self.perform_deletion(self.files_to_delete_dupes, "重复文件", use_recycle,
+                              recheck=self.drop_changed_dupes)
+    
+    def drop_changed_dupes(self, files_to_delete):
+        """哈希之后被修改过的副本不再一定是重复文件，跳过"""
+        files_to_delete, changed = drop_changed(files_to_delete)
+        if changed:
+            self.log(f"[重复文件] 跳过 {len(changed)} 个查找后已被修改或删除的副本，例如: {changed[0]}",
+                     logging.WARNING)
+        if not files_to_delete:
+            wx.MessageBox("要删除的多余副本在查找后都已被修改或删除，请重新查找。", "提示",
+                          wx.OK | wx.ICON_INFORMATION)
+        return files_to_delete
     
-    def perform_deletion(self, files_to_delete, operation_type, use_recycle=True):
-        """执行实际的删除操作"""
+    def on_delete_retention(self, event):
+        """执行保留策略生成的删除计划"""
+        if not self.files_to_delete_retention:
+            wx.MessageBox("删除计划为空！", "提示", wx.OK | wx.ICON_INFORMATION)
+            return
+        
+        use_recycle = self.recycle_option_retention.GetValue()
+        prune_root = self.scan_root_retention if self.prune_dirs_retention.GetValue() else None
+        self.perform_deletion(self.files_to_delete_retention, "保留策略", use_recycle, prune_root)
+    
+    def perform_deletion(self, files_to_delete, operation_type, use_recycle=True, prune_root=None,
+                         subtree_plan=None, recheck=None):
+        """执行实际的删除操作；prune_root 不为 None 时删除后清理该目录下变空的目录
+        
+        subtree_plan 为扫描时记录的 (SubtreeTracker, 匹配器) 时，整棵命中的子目录在确认框和日志中
+        各列为一项，并作为一个整体删除。
+        列表有筛选时只删除筛选出的行，其余行删除后留在列表中；整体删除的目录可能含有未显示的文件，
+        此时不整体删除。recheck(files) 在筛选之后、确认之前调用，返回实际要删除的结果表。
+        """
+        files_list = {"按后缀": self.files_list_ext, "无后缀": self.files_list_noext,
+                      "重复文件": self.files_list_dupes,
+                      "保留策略": self.files_list_retention}.get(operation_type)
+        unlisted = None
+        if files_list is not None and files_list.view.query and files_to_delete is files_list.files:
+            listed = files_list.view.filtered_rows()
+            if not listed:
+                wx.MessageBox("筛选后的列表为空，没有要删除的文件！", "提示", wx.OK | wx.ICON_INFORMATION)
+                return
+            selected = bytearray(len(files_to_delete))
+            for i in listed:
+                selected[i] = 1
+            unlisted = [i for i in range(len(files_to_delete)) if not selected[i]]
+            files_to_delete = files_to_delete.select(listed)
+            subtree_plan = None
+        if recheck is not None:
+            files_to_delete = recheck(files_to_delete)
+            if not files_to_delete:
+                return
+        
+        subtrees = []
+        match_name = None
+        if subtree_plan is not None and subtree_plan[0].done:
+            files_to_delete, subtrees = split_subtrees(files_to_delete, subtree_plan[0].subtrees)
+            match_name = subtree_plan[1]
+        subtree_files = sum(subtree[1] for subtree in subtrees)
+        
         # 显示确认对话框
-        total_size = sum(f['size'] for f in files_to_delete)
-        size_kb = total_size / 1024
-        size_str = f"{size_kb:.1f} KB" if size_kb < 1024 else f"{size_kb/1024:.1f} MB"
+        size_str = format_size(files_to_delete.total_size + sum(subtree[2] for subtree in subtrees))
         
         delete_type = "移动到回收站" if use_recycle else "永久删除"
         
-        file_list = "\n".join([f"• {f['name']}" for f in files_to_delete[:10]])  # 只显示前10个
-        if len(files_to_delete) > 10:
-            file_list += f"\n• ... 还有 {len(files_to_delete) - 10} 个文件"
+        # 只显示前10项，整体删除的目录排在前面
+        entries = [f"• {path}{os.sep}（整个目录，{files} 个文件，{format_size(nbytes)}）"
+                   for path, files, nbytes in subtrees[:10]]
+        entries += [f"• {files_to_delete.name(i)}"
+                    for i in range(min(10 - len(entries), len(files_to_delete)))]
+        file_list = "\n".join(entries)
+        if len(subtrees) + len(files_to_delete) > 10:
+            file_list += f"\n• ... 还有 {len(subtrees) + len(files_to_delete) - 10} 项"
         
-        message = f"确定要{delete_type}以下 {len(files_to_delete)} 个文件吗？\n\n"
+        message = f"确定要{delete_type}以下 {len(files_to_delete) + subtree_files} 个文件吗？\n\n"
         message += f"操作类型: {operation_type}清理\n"
         message += f"删除方式: {delete_type}\n"
-        message += f"总大小: {size_str}\n\n"
-        message += file_list
+        message += f"总大小: {size_str}\n"
+        if subtrees:
+            message += f"整体删除的目录: {len(subtrees)} 个（共 {subtree_files} 个文件）\n"
+        if unlisted is not None:
+            message += f"注意: 列表已筛选，只删除筛选出的文件，其余 {len(unlisted)} 项保留在列表中\n"
+        if use_recycle and not get_trash_backend().restorable:
+            message += "注意: 当前平台的回收站不记录文件位置，本次删除不能撤销\n"
+        if prune_root is not None:
+            roots = prune_root if isinstance(prune_root, list) else [prune_root]
+            message += f"删除后清理空目录: {'; '.join(roots)} 以下\n"
+        message += "\n" + file_list
         
         dlg = wx.MessageDialog(self, message, "确认删除", 
                               wx.YES_NO | wx.NO_DEFAULT | wx.ICON_WARNING)
         
         if dlg.ShowModal() == wx.ID_YES:
-            self.execute_deletion(files_to_delete, operation_type, use_recycle)
+            if unlisted is not None:
+                self.unlisted_rows[operation_type] = unlisted
+            self.execute_deletion(files_to_delete, operation_type, use_recycle, prune_root, subtrees, match_name)
         
         dlg.Destroy()
     
-    def execute_deletion(self, files_to_delete, operation_type, use_recycle):
-        """执行删除操作"""
+    def execute_deletion(self, files_to_delete, operation_type, use_recycle, prune_root=None,
+                         subtrees=None, match_name=None):
+        """在后台线程中执行删除操作，进度和结果汇总后回到主线程"""
+        subtree_files = sum(subtree[1] for subtree in subtrees or ())
         self.log(f"[{operation_type}] 开始删除操作...")
+        if subtrees:
+            self.log(f"[{operation_type}] {len(subtrees)} 个目录整体删除，共 {subtree_files} 个文件")
+        self.set_busy(True)
         
-        success_count = 0
-        error_count = 0
+        operation_desc = "移动到回收站" if use_recycle else "永久删除"
         
-        for file_info in files_to_delete:
-            try:
-                if use_recycle:
-                    # 使用send2trash移动到回收站
-                    send2trash.send2trash(file_info['path'])
-                    operation_desc = "移动到回收站"
-                else:
-                    # 直接删除
-                    os.remove(file_info['path'])
-                    operation_desc = "永久删除"
-                
-                self.log(f"✓ [{operation_type}] {operation_desc}成功: {file_info['name']}")
-                success_count += 1
-                
-            except PermissionError:
-                self.log(f"❌ [{operation_type}] 权限不足，无法删除: {file_info['name']}", logging.ERROR)
-                error_count += 1
-                
-            except FileNotFoundError:
-                self.log(f"❌ [{operation_type}] 文件不存在: {file_info['name']}", logging.WARNING)
-                error_count += 1
-                
-            except Exception as e:
-                self.log(f"❌ [{operation_type}] 删除失败 {file_info['name']}: {str(e)}", logging.ERROR)
-                error_count += 1
+        def log_file(path, error):
+            if error is None:
+                self.log(f"✓ [{operation_type}] {operation_desc}成功: {path}")
+            else:
+                self.log(f"[{operation_type}] 删除失败 {path}: {error}", logging.ERROR)
         
-        # 显示结果
-        delete_type = "移动到回收站" if use_recycle else "永久删除"
-        message = f"{operation_type}清理操作完成！\\n\\n"
-        message += f"操作方式: {delete_type}\\n"
-        message += f"成功处理: {success_count} 个文件\\n"
-        message += f"处理失败: {error_count} 个文件"
+        def log_subtree(path, files, nbytes, failed):
+            if failed:
+                self.log(f"[{operation_type}] 目录未能完整删除 {path}{os.sep}: {failed} 个文件失败",
+                         logging.ERROR)
+            else:
+                self.log(f"✓ [{operation_type}] {operation_desc}成功: {path}{os.sep}"
+                         f"（整个目录，{files} 个文件，{format_size(nbytes)}）")
         
-        wx.MessageBox(message, "清理完成", wx.OK | 
-                     (wx.ICON_INFORMATION if error_count == 0 else wx.ICON_WARNING))
+        log_each = self.log_each_file.GetValue()
+        on_file = log_file if log_each else None
+        on_subtree = log_subtree if log_each else None
         
-        # 清空文件列表
+        metrics = self.begin_metrics(f"{operation_type}删除", total_files=len(files_to_delete) + subtree_files)
+        try:
+            journal = create_journal(use_recycle, prune_root, match_name, metrics=metrics)
+        except OSError as e:
+            journal = None
+            self.log(f"[{operation_type}] 无法创建删除日志，中断后需要重新扫描: {str(e)}", logging.WARNING)
+        job = DeletionJob(
+            files_to_delete, use_recycle,
+            on_progress=lambda progress: wx.CallAfter(self.on_deletion_progress, operation_type, progress),
+            on_done=lambda progress, cancelled: wx.CallAfter(
+                self.on_deletion_done, operation_type, use_recycle, progress, cancelled, metrics),
+            on_file=on_file,
+            metrics=metrics,
+            prune_root=prune_root,
+            whitelist=WhitelistMatcher(self.whitelist_dirs),
+            subtrees=subtrees,
+            match_name=match_name,
+            on_subtree=on_subtree,
+            journal=journal
+        )
+        self.deletion_job = job
+        self.track_progress('delete', lambda: (job.progress.processed, job.progress.processed,
+                                               job.progress.bytes_done))
+        job.start()
+    
+    def confirm_stream_deletion(self, folder, operation_type, use_recycle, dry_run):
+        """流式清理无法预先列出文件，开始前说明删除方式和确认阈值"""
+        delete_type = "仅演练（不删除）" if dry_run else ("移动到回收站" if use_recycle else "永久删除")
+        message = "将在扫描的同时直接处理匹配的文件，不会预先列出文件清单。\n\n"
+        message += f"扫描目录: {folder}\n"
+        message += f"操作类型: {operation_type}清理\n"
+        message += f"删除方式: {delete_type}\n\n"
+        if not dry_run:
+            message += "注意: 流式清理不写删除日志，中断后无法继续，也不能撤销。\n\n"
+        message += (f"匹配文件超过 {STREAM_CONFIRM_FILES} 个或总大小超过 "
+                    f"{format_size(STREAM_CONFIRM_BYTES)} 时将暂停并再次确认。\n\n是否开始？")
+        
+        dlg = wx.MessageDialog(self, message, "确认流式清理",
+                              wx.YES_NO | wx.NO_DEFAULT | wx.ICON_WARNING)
+        confirmed = dlg.ShowModal() == wx.ID_YES
+        dlg.Destroy()
+        return confirmed
+    
+    def start_stream_deletion(self, scan_func, operation_type, use_recycle, dry_run, stats=None, index=None,
+                              metrics=None, totals_key=None, prune_root=None):
+        """启动流式扫描删除任务：扫描结果经有界队列直接交给删除线程"""
+        self.log(f"[{operation_type}] 开始流式清理{'（演练）' if dry_run else ''}...")
+        self.top_listing.pop(operation_type, None)
         if operation_type == "按后缀":
+            self.cancel_scan_job(self.scan_job_ext)
+            self.scan_job_ext = None
             self.files_list_ext.DeleteAllItems()
-            self.files_to_delete = []
-            self.delete_btn_ext.Disable()
-            self.update_stats_ext()
+            self.files_to_delete = ScanResults()
+            self.cancel_btn_ext.Enable()
         else:
+            self.cancel_scan_job(self.scan_job_noext)
+            self.scan_job_noext = None
             self.files_list_noext.DeleteAllItems()
-            self.files_to_delete_noext = []
-            self.delete_btn_noext.Disable()
+            self.files_to_delete_noext = ScanResults()
+            self.cancel_btn_noext.Enable()
+        self.set_busy(True)
+        
+        operation_desc = "将删除" if dry_run else ("移动到回收站" if use_recycle else "永久删除")
+        
+        def log_file(path, error):
+            if error is None:
+                self.log(f"✓ [{operation_type}] {operation_desc}: {path}")
+            else:
+                self.log(f"[{operation_type}] 删除失败 {path}: {error}", logging.ERROR)
+        
+        on_file = log_file if self.log_each_file.GetValue() else None
+        
+        job = StreamingDeletionJob(
+            scan_func, use_recycle,
+            on_progress=lambda progress: wx.CallAfter(self.on_stream_progress, operation_type, progress),
+            on_done=lambda progress, cancelled: wx.CallAfter(
+                self.on_stream_done, job, operation_type, use_recycle, stats, progress, cancelled),
+            dry_run=dry_run,
+            max_files=STREAM_CONFIRM_FILES,
+            max_bytes=STREAM_CONFIRM_BYTES,
+            on_threshold=lambda progress, resume: wx.CallAfter(
+                self.on_stream_threshold, operation_type, progress, resume),
+            on_file=on_file,
+            index=index,
+            metrics=metrics,
+            prune_root=prune_root,
+            whitelist=WhitelistMatcher(self.whitelist_dirs)
+        )
+        job.operation_type = operation_type
+        job.totals_key = totals_key
+        self.deletion_job = job
+        self.track_progress('stream', lambda: (stats.dirs_scanned, job.progress.processed,
+                                               job.progress.bytes_done))
+        job.start()
+    
+    def cancel_stream_job(self, operation_type):
+        """取消指定选项卡上运行中的流式清理，返回是否确实发出了取消请求"""
+        job = self.deletion_job
+        if (isinstance(job, StreamingDeletionJob) and job.operation_type == operation_type
+                and not job.cancel_event.is_set()):
+            job.cancel()
+            return True
+        return False
+    
+    def on_stream_threshold(self, operation_type, progress, resume):
+        """流式清理到达确认阈值（主线程）"""
+        message = f"[{operation_type}] 已匹配 {progress.total_files} 个文件，"
+        message += f"总大小 {format_size(progress.total_bytes)}，达到确认阈值。\n\n"
+        message += "是否继续处理剩余的所有匹配文件？"
+        dlg = wx.MessageDialog(self, message, "确认继续",
+                              wx.YES_NO | wx.NO_DEFAULT | wx.ICON_WARNING)
+        proceed = dlg.ShowModal() == wx.ID_YES
+        dlg.Destroy()
+        self.log(f"[{operation_type}] 达到确认阈值，{'继续处理' if proceed else '停止处理'}")
+        resume(proceed)
+    
+    def on_stream_progress(self, operation_type, progress):
+        """显示流式清理进度（主线程）"""
+        stats_text = self.stats_text_ext if operation_type == "按后缀" else self.stats_text_noext
+        stats_text.SetLabel(f"扫描并删除中: 已匹配 {progress.total_files} 个文件，"
+                            f"已处理 {progress.processed} 个，已释放 {format_size(progress.bytes_done)}，"
+                            f"失败 {progress.failed}")
+    
+    def on_stream_done(self, job, operation_type, use_recycle, stats, progress, cancelled):
+        """流式清理结束（主线程）"""
+        self.deletion_job = None
+        self.set_busy(False)
+        cancel_btn = self.cancel_btn_ext if operation_type == "按后缀" else self.cancel_btn_noext
+        cancel_btn.Disable()
+        
+        if job.scan_error is not None:
+            self.log(f"[{operation_type}] 扫描文件时出错: {str(job.scan_error)}", logging.ERROR)
+        for kind, count in progress.error_counts.items():
+            self.log(f"❌ [{operation_type}] {kind}: {count} 个文件", logging.ERROR)
+        for path, kind, message in progress.errors[:50]:
+            self.log(f"❌ [{operation_type}] {kind} {path}: {message}", logging.ERROR)
+        self.log_scan_stats(operation_type, stats)
+        
+        if job.dry_run:
+            delete_type = "仅演练（未删除任何文件）"
+            done_label = "可释放空间"
+        else:
+            delete_type = "移动到回收站" if use_recycle else "永久删除"
+            done_label = "释放空间"
+        if cancelled:
+            status = "已取消"
+        elif job.limit_reached:
+            status = "在确认阈值处停止"
+        else:
+            status = "完成"
+        message = f"{operation_type}流式清理{status}！\n\n"
+        message += f"操作方式: {delete_type}\n"
+        message += f"匹配文件: {progress.total_files} 个\n"
+        message += f"成功处理: {progress.success} 个文件\n"
+        message += f"处理失败: {progress.failed} 个文件\n"
+        message += f"{done_label}: {format_size(progress.bytes_done)}"
+        if progress.dirs_removed or progress.dirs_failed:
+            message += f"\n清理空目录: {progress.dirs_removed} 个"
+        if job.scan_error is not None:
+            message += f"\n\n扫描出错: {str(job.scan_error)}"
+        
+        failed = progress.failed or job.scan_error is not None
+        wx.MessageBox(message, "清理完成", wx.OK | (wx.ICON_WARNING if failed else wx.ICON_INFORMATION))
+        
+        if operation_type == "按后缀":
+            self.update_stats_ext()
+        else:
+            self.update_stats_noext()
+        self.log(f"[{operation_type}] 流式清理{status} - 匹配: {progress.total_files}, "
+                 f"成功: {progress.success}, 失败: {progress.failed}")
+        self.log_pruned_dirs(operation_type, progress)
+        
+        extra = {'cancelled': cancelled, 'dry_run': job.dry_run, 'use_recycle': use_recycle,
+                 'limit_reached': job.limit_reached, 'matched_files': progress.total_files,
+                 'matched_bytes': progress.total_bytes, 'deleted': progress.success,
+                 'failed': progress.failed, 'bytes_freed': progress.bytes_done,
+                 'dirs_removed': progress.dirs_removed, 'error_counts': progress.error_counts}
+        if stats is not None:
+            extra.update({'dirs_scanned': stats.dirs_scanned, 'dirs_skipped': stats.dirs_skipped})
+        if not cancelled and not job.limit_reached and job.scan_error is None:
+            self.save_scan_totals(job.totals_key, stats)
+        self.finish_metrics('stream', operation_type, job.metrics, extra)
+    
+    def on_deletion_progress(self, operation_type, progress):
+        """显示删除进度（主线程）"""
+        stats_text = {"按后缀": self.stats_text_ext, "无后缀": self.stats_text_noext,
+                      "重复文件": self.stats_text_dupes,
+                      "保留策略": self.stats_text_retention}.get(operation_type)
+        if stats_text is None:
+            # 继续中断的删除不对应任何选项卡，进度只显示在状态栏
+            return
+        stats_text.SetLabel(f"正在删除: {progress.processed}/{progress.total_files} 个文件，"
+                            f"已释放 {format_size(progress.bytes_done)}，失败 {progress.failed}")
+    
+    def on_deletion_done(self, operation_type, use_recycle, progress, cancelled, metrics=None):
+        """删除任务结束（主线程）"""
+        job = self.deletion_job
+        self.deletion_job = None
+        self.set_busy(False)
+        
+        # 汇总错误：按类别计数，并列出部分明细
+        for kind, count in progress.error_counts.items():
+            self.log(f"❌ [{operation_type}] {kind}: {count} 个文件", logging.ERROR)
+        for path, kind, message in progress.errors[:50]:
+            self.log(f"❌ [{operation_type}] {kind} {path}: {message}", logging.ERROR)
+        if progress.failed > 50:
+            self.log(f"[{operation_type}] ... 其余 {progress.failed - 50} 个失败文件未逐条列出")
+        
+        # 显示结果
+        delete_type = "移动到回收站" if use_recycle else "永久删除"
+        message = f"{operation_type}清理操作{'已取消' if cancelled else '完成'}！\n\n"
+        message += f"操作方式: {delete_type}\n"
+        message += f"成功处理: {progress.success} 个文件\n"
+        message += f"处理失败: {progress.failed} 个文件\n"
+        message += f"释放空间: {format_size(progress.bytes_done)}"
+        if progress.dirs_removed or progress.dirs_failed:
+            message += f"\n清理空目录: {progress.dirs_removed} 个"
+        
+        wx.MessageBox(message, "清理完成", wx.OK | 
+                     (wx.ICON_INFORMATION if progress.failed == 0 else wx.ICON_WARNING))
+        
+        # 清空文件列表（筛选删除时只留下未显示的行）；监视中的选项卡改为合并删除期间的变化，
+        # 已删除的文件会随目录事件移出列表
+        self.top_listing.pop(operation_type, None)
+        self.subtree_plans.pop(operation_type, None)
+        unlisted = self.unlisted_rows.pop(operation_type, None)
+        if self.watching(operation_type) is not None:
+            self.apply_watch_changes(operation_type, self.pending_watch_changes.pop(operation_type, {}))
+        elif operation_type == "按后缀":
+            self.files_to_delete = self.keep_unlisted(self.files_list_ext, unlisted)
+            self.delete_btn_ext.Enable(bool(self.files_to_delete))
+            self.update_stats_ext()
+        elif operation_type == "重复文件":
+            self.files_to_delete_dupes = self.keep_unlisted(self.files_list_dupes, unlisted)
+            if unlisted is None:
+                self.duplicate_groups = []
+            self.delete_btn_dupes.Enable(bool(self.files_to_delete_dupes))
+            self.update_stats_dupes()
+        elif operation_type == "保留策略":
+            self.files_to_delete_retention = self.keep_unlisted(self.files_list_retention, unlisted)
+            self.delete_btn_retention.Enable(bool(self.files_to_delete_retention))
+            self.update_stats_retention()
+        elif operation_type == RESUMED_OPERATION:
+            # 继续中断的删除不对应任何选项卡的列表
+            pass
+        else:
+            self.files_to_delete_noext = self.keep_unlisted(self.files_list_noext, unlisted)
+            self.delete_btn_noext.Enable(bool(self.files_to_delete_noext))
             self.update_stats_noext()
         
-        self.log(f"[{operation_type}] 删除操作完成 - 成功: {success_count}, 失败: {error_count}")
+        self.log(f"[{operation_type}] 删除操作完成 - 成功: {progress.success}, 失败: {progress.failed}")
+        self.log_pruned_dirs(operation_type, progress)
+        if job is not None and job.journal_error is not None:
+            self.log(f"[{operation_type}] 删除日志写入失败，本次删除中断后需要重新扫描: {job.journal_error}",
+                     logging.WARNING)
+        elif use_recycle and progress.success:
+            self.log(f"[{operation_type}] 可通过\"删除日志 > 撤销最近一次移到回收站\"把文件移回原位置")
+        
+        self.finish_metrics('delete', operation_type, metrics, {
+            'cancelled': cancelled, 'use_recycle': use_recycle, 'total_files': progress.total_files,
+            'total_bytes': progress.total_bytes, 'deleted': progress.success, 'failed': progress.failed,
+            'bytes_freed': progress.bytes_done, 'dirs_removed': progress.dirs_removed,
+            'error_counts': progress.error_counts})
+    
+    def keep_unlisted(self, files_list, unlisted):
+        """删除结束后更新列表：unlisted 为 None 时清空，否则只留下这些行；返回列表新的结果表"""
+        if unlisted is None:
+            files_list.DeleteAllItems()
+            return files_list.files
+        return files_list.keep_rows(unlisted)
+    
+    def log_pruned_dirs(self, operation_type, progress):
+        """记录删除后清理空目录的结果"""
+        if progress.dirs_removed:
+            self.log(f"[{operation_type}] 已清理 {progress.dirs_removed} 个空目录")
+        if progress.dirs_failed:
+            self.log(f"[{operation_type}] {progress.dirs_failed} 个空目录无法删除", logging.WARNING)
+    
+    def set_busy(self, busy):
+        """删除期间禁用扫描和删除按钮，避免结果表被并发修改"""
+        for button in (self.scan_btn_ext, self.scan_btn_noext, self.scan_btn_dupes, self.scan_btn_retention,
+                       self.delete_btn_ext, self.delete_btn_noext, self.delete_btn_dupes,
+                       self.delete_btn_retention):
+            button.Enable(not busy)
+        if not busy:
+            self.delete_btn_ext.Enable(self.deletable("按后缀", self.files_to_delete))
+            self.delete_btn_noext.Enable(self.deletable("无后缀", self.files_to_delete_noext))
+            self.delete_btn_dupes.Enable(bool(self.files_to_delete_dupes))
+            self.delete_btn_retention.Enable(bool(self.files_to_delete_retention))
     
     def on_add_whitelist(self, event):
         """添加自定义白名单"""
@@ -637,7 +2486,19 @@ class AdvancedFileCleanerApp(wx.Frame):
     
     def on_close(self, event):
         """关闭应用程序"""
+        self.cancel_scan_job(self.scan_job_ext)
+        self.cancel_scan_job(self.scan_job_noext)
+        self.cancel_scan_job(self.dupe_job)
+        self.cancel_scan_job(self.retention_job)
+        if self.deletion_job is not None:
+            self.deletion_job.cancel()
+        if self.profile_session is not None:
+            self.on_stop_profile(None)
         self.log("高级文件清理工具关闭")
+        self.status_timer.Stop()
+        self.log_timer.Stop()
+        self.on_flush_log()
+        self.log_listener.stop()
         self.Destroy()
 
 def main():
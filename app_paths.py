@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+应用路径 - 用户缓存目录等运行时文件位置
+"""
+
+import os
+import sys
+
+APP_NAME = "DeleteFilesPython"
+
+
+def user_cache_dir():
+    """返回（并创建）当前用户的缓存目录
+
+    Windows: %LOCALAPPDATA%\\DeleteFilesPython\\Cache
+    macOS:   ~/Library/Caches/DeleteFilesPython
+    其他:    $XDG_CACHE_HOME/DeleteFilesPython 或 ~/.cache/DeleteFilesPython
+    """
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+        path = os.path.join(base, APP_NAME, 'Cache')
+    elif sys.platform == 'darwin':
+        path = os.path.join(os.path.expanduser('~/Library/Caches'), APP_NAME)
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
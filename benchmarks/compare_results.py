@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准结果对比 - 比较两次 run_benchmarks.py 的 JSON 结果
+功能：按 (目录树, 阶段) 对齐两份结果，输出耗时比值；任一阶段变慢超过阈值时退出码为 1
+
+用法示例：
+    python benchmarks/compare_results.py base.json head.json --threshold 0.10
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def index_phases(report):
+    """返回 {(目录树名, 阶段名): 秒数}，跳过未测量的阶段"""
+    phases = {}
+    for run in report.get('runs', []):
+        for phase, record in run.get('phases', {}).items():
+            if 'seconds' in record:
+                phases[(run['name'], phase)] = record['seconds']
+    return phases
+
+
+def compare(base, head, threshold):
+    """返回 ([(目录树, 阶段, 基准秒数, 当前秒数, 比值)], 是否有退化)"""
+    base_phases = index_phases(base)
+    head_phases = index_phases(head)
+    rows = []
+    regressed = False
+    for key in sorted(set(base_phases) & set(head_phases)):
+        before = base_phases[key]
+        after = head_phases[key]
+        ratio = after / before if before > 0 else float('inf')
+        if ratio > 1 + threshold:
+            regressed = True
+        rows.append((key[0], key[1], before, after, ratio))
+    return rows, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比两份基准测试结果")
+    parser.add_argument("base", help="基准结果（旧提交）")
+    parser.add_argument("head", help="当前结果（新提交）")
+    parser.add_argument("--threshold", type=float, default=0.10, help="判定为退化的相对变慢比例")
+    args = parser.parse_args(argv)
+
+    base = load(args.base)
+    head = load(args.head)
+    rows, regressed = compare(base, head, args.threshold)
+
+    print(f"基准: {base.get('commit')}  当前: {head.get('commit')}")
+    print(f"{'目录树':<16}{'阶段':<20}{'基准(s)':>12}{'当前(s)':>12}{'比值':>8}")
+    for tree, phase, before, after, ratio in rows:
+        mark = ""
+        if ratio > 1 + args.threshold:
+            mark = "  ▲ 变慢"
+        elif ratio < 1 - args.threshold:
+            mark = "  ▼ 变快"
+        print(f"{tree:<16}{phase:<20}{before:>12.4f}{after:>12.4f}{ratio:>8.2f}{mark}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
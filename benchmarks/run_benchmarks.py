@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试 - 无界面地测量扫描和删除各阶段的耗时
+功能：用 tree_generator 生成可复现的目录树，依次测量遍历、名称匹配、白名单剪枝、stat、
+      按后缀扫描、无后缀扫描、并行扫描、列表填充、永久删除和移入回收站的耗时，
+      结果连同提交号、平台信息写成 JSON，供 compare_results.py 在不同提交之间对比
+
+用法示例：
+    python benchmarks/run_benchmarks.py --sizes 10k,100k --output bench.json
+    python benchmarks/run_benchmarks.py --sizes 1m --shapes wide,deep --workers 8
+
+注意：删除和回收站阶段会修改生成的目录树，因此放在最后且只执行一次；
+      回收站阶段把 XDG_DATA_HOME 指向临时目录，不会写入真实的用户回收站，
+      非 XDG 平台上默认跳过（--system-trash 可强制使用系统回收站）。
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from tree_generator import generate_tree, SHAPES
+from scan_engine import (
+    iter_matching_files, build_suffix_matcher, is_no_extension_name,
+    ScanStats, WhitelistMatcher, DEFAULT_WHITELIST_DIRS
+)
+from scan_results import ScanResults
+from file_filters import FilterRules, compile_filter
+from delete_engine import DeletionJob
+
+RESULT_SCHEMA = 1
+
+# 与 ScanJob 默认值一致：每批结果的行数，以及每批刷新后界面实际格式化的可见行数
+LIST_BATCH_SIZE = 2000
+VISIBLE_ROWS = 40
+
+# 各阶段删除的目标后缀（生成器中两者互不重叠）
+DELETE_EXT = '.tmp'
+TRASH_EXT = '.log'
+
+
+def parse_size(text):
+    """把 10k / 100k / 1m 这样的写法转为整数"""
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+
+def git_revision():
+    """返回 (提交号, 工作区是否有未提交修改)，不在 git 仓库中时返回 (None, None)"""
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR,
+                                      stderr=subprocess.DEVNULL).decode().strip()
+        status = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                         cwd=REPO_DIR, stderr=subprocess.DEVNULL).decode()
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return rev, bool(status.strip())
+
+
+def timed(func, repeat):
+    """执行 func repeat 次，返回 (耗时列表, 最后一次的返回值)"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def phase_record(timings, items):
+    best = min(timings)
+    record = {
+        'seconds': round(best, 6),
+        'median': round(statistics.median(timings), 6),
+        'runs': len(timings),
+        'items': items,
+    }
+    if items and best > 0:
+        record['items_per_second'] = round(items / best, 1)
+    return record
+
+
+def count_hits(hits):
+    count = 0
+    for _ in hits:
+        count += 1
+    return count
+
+
+def run_deletion_job(results, use_recycle):
+    """同步执行删除任务并返回最终进度"""
+    finished = threading.Event()
+    outcome = []
+
+    def on_done(progress, cancelled):
+        outcome.append(progress)
+        finished.set()
+
+    job = DeletionJob(results, use_recycle, on_progress=lambda progress: None, on_done=on_done)
+    job.start()
+    finished.wait()
+    return outcome[0]
+
+
+def collect(root, ext):
+    results = ScanResults()
+    for hit in iter_matching_files(root, build_suffix_matcher([ext]), True):
+        results.add(*hit)
+    return results
+
+
+def bench_tree(root, repeat, workers, trash_mode):
+    """对已生成的目录树测量各阶段，返回 {阶段名: 记录}"""
+    phases = {}
+    whitelist = WhitelistMatcher(DEFAULT_WHITELIST_DIRS)
+
+    # 遍历：不匹配任何文件，只测目录枚举和类型判断
+    timings, _ = timed(lambda: count_hits(iter_matching_files(root, lambda name: False, True)), repeat)
+    stats = ScanStats()
+    count_hits(iter_matching_files(root, lambda name: False, True, stats=stats))
+    phases['walk'] = phase_record(timings, stats.dirs_scanned)
+
+    # 名称匹配：只测匹配函数本身的 CPU 开销
+    names = []
+
+    def gather(name):
+        names.append(name)
+        return False
+    count_hits(iter_matching_files(root, gather, True))
+    ext_match = compile_filter(FilterRules(extensions=['.txt', '.log', '.tmp']))
+    timings, _ = timed(lambda: sum(1 for name in names if ext_match(name)), repeat)
+    phases['match_ext'] = phase_record(timings, len(names))
+    timings, _ = timed(lambda: sum(1 for name in names if is_no_extension_name(name)), repeat)
+    phases['match_noext'] = phase_record(timings, len(names))
+
+    # 白名单剪枝
+    timings, _ = timed(lambda: count_hits(
+        iter_matching_files(root, lambda name: False, True, whitelist=whitelist)), repeat)
+    stats = ScanStats()
+    count_hits(iter_matching_files(root, lambda name: False, True, whitelist=whitelist, stats=stats))
+    phases['walk_whitelist'] = phase_record(timings, stats.dirs_scanned)
+    phases['walk_whitelist']['dirs_skipped'] = stats.dirs_skipped
+
+    # stat：全部文件都匹配名称且需要 stat 数据
+    stat_all = compile_filter(FilterRules(min_size=0))
+    timings, hits = timed(lambda: count_hits(iter_matching_files(root, stat_all, True)), repeat)
+    phases['stat'] = phase_record(timings, hits)
+
+    # 与界面相同的两种扫描
+    match_ext = compile_filter(FilterRules(extensions=['.txt', '.log', '.tmp']))
+    timings, hits = timed(lambda: count_hits(iter_matching_files(root, match_ext, True)), repeat)
+    phases['scan_ext'] = phase_record(timings, hits)
+
+    match_noext = compile_filter(FilterRules(no_extension=True, include_hidden=False))
+    timings, hits = timed(lambda: count_hits(
+        iter_matching_files(root, match_noext, True, whitelist=whitelist)), repeat)
+    phases['scan_noext'] = phase_record(timings, hits)
+
+    if workers > 1:
+        timings, hits = timed(lambda: count_hits(
+            iter_matching_files(root, match_ext, True, workers=workers)), repeat)
+        phases['scan_ext_parallel'] = phase_record(timings, hits)
+        phases['scan_ext_parallel']['workers'] = workers
+
+    # 列表填充：按 ScanJob 的批大小追加结果，每批格式化一屏可见行（对应虚拟列表的 OnGetItemText）
+    hit_rows = list(iter_matching_files(root, match_ext, True))
+
+    def populate():
+        results = ScanResults()
+        for start in range(0, len(hit_rows), LIST_BATCH_SIZE):
+            results.extend(hit_rows[start:start + LIST_BATCH_SIZE])
+            for row in range(max(0, len(results) - VISIBLE_ROWS), len(results)):
+                for column in range(4):
+                    results.cell_text(row, column)
+        return results
+    timings, _ = timed(populate, repeat)
+    phases['list_population'] = phase_record(timings, len(hit_rows))
+
+    # 永久删除（破坏性，只执行一次）
+    results = collect(root, DELETE_EXT)
+    timings, progress = timed(lambda: run_deletion_job(results, False), 1)
+    phases['delete'] = phase_record(timings, progress.success)
+    phases['delete']['failed'] = progress.failed
+
+    # 移入回收站（破坏性，只执行一次）
+    if trash_mode is None:
+        phases['trash'] = {'skipped': '当前平台没有可隔离的回收站，使用 --system-trash 强制测量'}
+    else:
+        results = collect(root, TRASH_EXT)
+        timings, progress = timed(lambda: run_deletion_job(results, True), 1)
+        phases['trash'] = phase_record(timings, progress.success)
+        phases['trash']['failed'] = progress.failed
+        phases['trash']['backend'] = trash_mode
+    return phases
+
+
+def setup_trash(workdir, system_trash):
+    """把回收站隔离到 workdir 中；返回后端说明，无法隔离且未强制时返回 None"""
+    if os.name == 'posix' and sys.platform != 'darwin':
+        os.environ['XDG_DATA_HOME'] = os.path.join(workdir, 'xdg-data')
+        return 'xdg'
+    if system_trash:
+        return 'send2trash'
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扫描与删除基准测试（无界面）")
+    parser.add_argument("--sizes", default="10k", help="文件数，逗号分隔，如 10k,100k,1m")
+    parser.add_argument("--shapes", default="mixed", help=f"目录树形状，逗号分隔，可选 {','.join(SHAPES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="非破坏性阶段的重复次数（取最小值）")
+    parser.add_argument("--workers", type=int, default=4, help="并行扫描阶段的线程数，1 表示跳过")
+    parser.add_argument("--seed", type=int, default=0, help="目录树随机种子")
+    parser.add_argument("--workdir", default=None, help="生成目录树的位置（默认临时目录）")
+    parser.add_argument("--keep", action="store_true", help="结束后保留生成的目录树")
+    parser.add_argument("--system-trash", action="store_true", help="无法隔离回收站时仍测量系统回收站")
+    parser.add_argument("--output", default=None, help="JSON 结果文件（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    shapes = [s.strip() for s in args.shapes.split(',') if s.strip()]
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f"未知的目录树形状: {shape}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='dfp-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    trash_mode = setup_trash(workdir, args.system_trash)
+    commit, dirty = git_revision()
+
+    report = {
+        'schema': RESULT_SCHEMA,
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {'repeat': args.repeat, 'workers': args.workers, 'seed': args.seed},
+        'runs': [],
+    }
+
+    try:
+        for shape in shapes:
+            for size in sizes:
+                root = os.path.join(workdir, f"{shape}-{size}")
+                if os.path.exists(root):
+                    shutil.rmtree(root)
+                print(f"生成 {shape} 目录树，{size} 个文件: {root}", file=sys.stderr)
+                started = time.perf_counter()
+                manifest = generate_tree(root, size, shape, args.seed)
+                generate_seconds = time.perf_counter() - started
+
+                print(f"测量 {shape}-{size} ...", file=sys.stderr)
+                phases = bench_tree(root, args.repeat, args.workers, trash_mode)
+                report['runs'].append({
+                    'name': f"{shape}-{size}",
+                    'shape': shape,
+                    'files': size,
+                    'manifest': manifest.to_dict(),
+                    'generate_seconds': round(generate_seconds, 3),
+                    'phases': phases,
+                })
+                if not args.keep:
+                    shutil.rmtree(root, ignore_errors=True)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        print(f"结果已写入 {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成目录树生成器 - 为基准测试构造可复现的目录树
+功能：按固定随机种子生成宽树、深树或混合树，文件混合多种后缀和无后缀文件，
+      并按比例放入白名单目录的子树；同样的参数总是生成同样的目录树
+
+用法示例：
+    python benchmarks/tree_generator.py /tmp/bench_tree --files 100000 --shape mixed
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_engine import DEFAULT_WHITELIST_DIRS
+
+# 后缀分布：空字符串表示无后缀文件
+EXTENSIONS = ['.txt', '.log', '.tmp', '.py', '.o', '.json', '.tar.gz', '', '', '']
+
+# 无后缀文件名的词干（包含会被排除的系统文件名）
+NOEXT_STEMS = ['README', 'LICENSE', 'Makefile', 'core', 'data', 'Thumbs', 'desktop']
+
+SHAPES = ('wide', 'deep', 'mixed')
+
+# 各形状的 (每个目录的文件数, 每个目录的子目录数)；深树为一串单链目录，每串深度为 DEEP_CHAIN_DEPTH
+_SHAPE_PARAMS = {
+    'wide': (200, 20),
+    'deep': (8, 1),
+    'mixed': (40, 5),
+}
+
+DEEP_CHAIN_DEPTH = 64
+
+
+class TreeManifest:
+    """生成结果的计数，用于核对扫描结果"""
+
+    def __init__(self, root, shape, seed):
+        self.root = root
+        self.shape = shape
+        self.seed = seed
+        self.files = 0
+        self.dirs = 0
+        self.whitelisted_files = 0
+        self.by_extension = {}
+        self.max_depth = 0
+
+    def to_dict(self):
+        return {
+            'root': self.root,
+            'shape': self.shape,
+            'seed': self.seed,
+            'files': self.files,
+            'dirs': self.dirs,
+            'whitelisted_files': self.whitelisted_files,
+            'by_extension': self.by_extension,
+            'max_depth': self.max_depth,
+        }
+
+
+def generate_tree(root, n_files, shape='mixed', seed=0, whitelist_fraction=0.05, file_size=16):
+    """在 root 下生成约 n_files 个文件的目录树，返回 TreeManifest
+
+    - whitelist_fraction: 放在白名单目录（如 AppData）子树中的文件比例
+    - file_size: 每个文件写入的字节数，0 表示空文件
+    """
+    if shape not in _SHAPE_PARAMS:
+        raise ValueError(f"未知的目录树形状: {shape}")
+    rng = random.Random(seed)
+    files_per_dir, subdirs_per_dir = _SHAPE_PARAMS[shape]
+    manifest = TreeManifest(os.path.abspath(root), shape, seed)
+    payload = b'x' * file_size
+
+    whitelisted_target = int(n_files * whitelist_fraction)
+    normal_target = n_files - whitelisted_target
+
+    os.makedirs(root, exist_ok=True)
+    _fill(os.path.join(root, 'data'), normal_target, files_per_dir, subdirs_per_dir,
+          rng, manifest, payload, whitelisted=False, depth=1)
+    if whitelisted_target:
+        whitelist_root = os.path.join(root, 'home', DEFAULT_WHITELIST_DIRS[5])
+        _fill(whitelist_root, whitelisted_target, files_per_dir, subdirs_per_dir,
+              rng, manifest, payload, whitelisted=True, depth=2)
+    return manifest
+
+
+def _iter_dirs(top, subdirs_per_dir):
+    """按生成顺序无限产出 (目录, 相对深度)"""
+    if subdirs_per_dir == 1:
+        chain = 0
+        while True:
+            directory = os.path.join(top, f"c{chain}")
+            for level in range(DEEP_CHAIN_DEPTH):
+                yield directory, level
+                directory = os.path.join(directory, "d0")
+            chain += 1
+    queue = collections.deque([(top, 0)])
+    while queue:
+        directory, level = queue.popleft()
+        yield directory, level
+        for j in range(subdirs_per_dir):
+            queue.append((os.path.join(directory, f"d{j}"), level + 1))
+
+
+def _fill(top, target, files_per_dir, subdirs_per_dir, rng, manifest, payload, whitelisted, depth):
+    """逐个目录写入文件，直到写满 target 个文件"""
+    written = 0
+    for directory, level in _iter_dirs(top, subdirs_per_dir):
+        if written >= target:
+            break
+        os.makedirs(directory, exist_ok=True)
+        manifest.dirs += 1
+        manifest.max_depth = max(manifest.max_depth, depth + level)
+        count = min(target - written, files_per_dir)
+        for i in range(count):
+            ext = rng.choice(EXTENSIONS)
+            if ext:
+                name = f"f{written + i}{ext}"
+            else:
+                name = f"{rng.choice(NOEXT_STEMS)}{written + i}"
+            _write_file(os.path.join(directory, name), payload)
+            key = ext or '(none)'
+            manifest.by_extension[key] = manifest.by_extension.get(key, 0) + 1
+        written += count
+    manifest.files += written
+    if whitelisted:
+        manifest.whitelisted_files += written
+    return written
+
+
+def _write_file(path, payload):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if payload:
+            os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成可复现的合成目录树")
+    parser.add_argument("root", help="生成目录（不存在时创建）")
+    parser.add_argument("--files", type=int, default=10000, help="文件总数")
+    parser.add_argument("--shape", choices=SHAPES, default='mixed', help="目录树形状")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--whitelist-fraction", type=float, default=0.05, help="白名单子树中的文件比例")
+    args = parser.parse_args(argv)
+
+    manifest = generate_tree(args.root, args.files, args.shape, args.seed, args.whitelist_fraction)
+    print(json.dumps(manifest.to_dict(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
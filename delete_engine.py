@@ -0,0 +1,812 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+删除引擎 - 不依赖wx的并发删除核心
+功能：按目录分组删除文件，目录再按所在设备(st_dev)分组，每个设备使用有界数量的工作线程；
+      支持 dir_fd 的平台上每个目录只打开一次，文件按名称相对删除，不再逐个解析完整路径；
+      进度和错误汇总后按固定间隔回调，而不是每个文件通知一次界面；
+      回收站模式按目录分组整批交给 trash_backend；
+      流式模式下扫描结果经有界队列直接交给删除线程，不保存完整结果表；
+      可选地在删除结束后自底向上删除变空的目录，只检查删除过文件的目录及其上级，不重新遍历目录树；
+      扫描时确定整棵都是命中文件的子目录作为一个条目整体删除（os.fwalk 按目录句柄自底向上删除，
+      回收站模式整个目录移入一次），不再逐个文件处理和记录；
+      可选地把删除计划和每个分组的完成情况写入删除日志（delete_journal），中断后按日志继续，无需重新扫描
+"""
+
+import errno
+import heapq
+import os
+import queue
+import stat
+import threading
+import time
+
+from delete_journal import STATUS_CANCELLED, STATUS_DONE
+from scan_results import ScanResults
+
+# 支持 dir_fd 的平台（Linux/macOS）上按目录句柄相对删除
+_HAVE_DIR_FD = os.unlink in os.supports_dir_fd and hasattr(os, 'O_DIRECTORY')
+# 整棵子树删除时用 os.fwalk 的目录句柄相对 unlink/rmdir，不支持的平台退回 os.walk + 完整路径
+_HAVE_FWALK = _HAVE_DIR_FD and hasattr(os, 'fwalk') and os.rmdir in os.supports_dir_fd
+
+# 错误类别
+ERROR_PERMISSION = "权限不足"
+ERROR_NOT_FOUND = "文件不存在"
+ERROR_OTHER = "删除失败"
+
+# 最多保留的错误明细条数，其余只计数
+MAX_ERROR_DETAILS = 1000
+
+# 大目录拆分成多个任务，使进度、取消和并发粒度都不受单个目录大小影响
+CHUNK_SIZE = 1000
+
+# 流式删除：每个任务最多包含的文件数，以及队列中最多等待的任务数
+STREAM_BATCH_SIZE = 256
+STREAM_QUEUE_SIZE = 16
+
+
+def classify_error(error):
+    """把异常归类为错误类别"""
+    if isinstance(error, PermissionError):
+        return ERROR_PERMISSION
+    if isinstance(error, FileNotFoundError):
+        return ERROR_NOT_FOUND
+    return ERROR_OTHER
+
+
+class DeleteProgress:
+    """删除进度快照"""
+
+    def __init__(self, total_files=0, total_bytes=0):
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.success = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self.dirs_removed = 0
+        self.dirs_failed = 0
+        self.error_counts = {}
+        self.errors = []
+
+    @property
+    def processed(self):
+        return self.success + self.failed
+
+    def copy(self, with_errors=True):
+        snapshot = DeleteProgress(self.total_files, self.total_bytes)
+        snapshot.success = self.success
+        snapshot.failed = self.failed
+        snapshot.bytes_done = self.bytes_done
+        snapshot.dirs_removed = self.dirs_removed
+        snapshot.dirs_failed = self.dirs_failed
+        snapshot.error_counts = dict(self.error_counts)
+        if with_errors:
+            snapshot.errors = list(self.errors)
+        return snapshot
+
+
+def group_rows_by_directory(results):
+    """把扫描结果表的行按目录分组，返回 [(目录, [(文件名, 大小), ...]), ...]"""
+    groups = {}
+    names = results.names
+    sizes = results.sizes
+    for index, dir_id in enumerate(results.dir_ids):
+        group = groups.get(dir_id)
+        if group is None:
+            group = groups[dir_id] = []
+        group.append((names[index], sizes[index]))
+    return [(results.dirs[dir_id], files) for dir_id, files in groups.items()]
+
+
+def split_chunks(dir_groups, chunk_size=CHUNK_SIZE):
+    """把大目录的文件列表拆成不超过 chunk_size 的任务"""
+    chunks = []
+    for directory, files in dir_groups:
+        for start in range(0, len(files), chunk_size):
+            chunks.append((directory, files[start:start + chunk_size]))
+    return chunks
+
+
+def group_by_device(dir_groups):
+    """按目录所在设备分组，每个目录只 stat 一次；无法 stat 的目录归入 None 组"""
+    devices = {}
+    known = {}
+    for directory, files in dir_groups:
+        device = known.get(directory, -1)
+        if device == -1:
+            try:
+                device = os.stat(directory).st_dev
+            except OSError:
+                device = None
+            known[directory] = device
+        devices.setdefault(device, []).append((directory, files))
+    return devices
+
+
+def remove_files_in_directory(directory, names, on_result):
+    """删除同一目录下的一组文件，每个文件调用 on_result(名称, 异常或None)"""
+    if _HAVE_DIR_FD:
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as e:
+            for name in names:
+                on_result(name, e)
+            return
+        try:
+            for name in names:
+                try:
+                    os.unlink(name, dir_fd=dir_fd)
+                except OSError as e:
+                    on_result(name, e)
+                else:
+                    on_result(name, None)
+        finally:
+            os.close(dir_fd)
+    else:
+        for name in names:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError as e:
+                on_result(name, e)
+            else:
+                on_result(name, None)
+
+
+def split_subtrees(results, subtrees):
+    """把扫描结果拆成 (子树之外的 ScanResults, [(子树路径, 文件数, 字节数), ...])
+
+    subtrees 为 SubtreeTracker.subtrees；位于这些子树中的行从结果中移出，按子树汇总为一个条目。
+    每个目录只沿上级查找一次，与行数无关。
+    """
+    if not subtrees:
+        return results, []
+    slots = {path: slot for slot, path in enumerate(subtrees)}
+    owners = []
+    for directory in results.dirs:
+        owner = -1
+        node = directory
+        while True:
+            owner = slots.get(node, -1)
+            parent = os.path.dirname(node)
+            if owner >= 0 or parent == node:
+                break
+            node = parent
+        owners.append(owner)
+
+    counts = [[0, 0] for _ in subtrees]
+    remaining = ScanResults()
+    rows = []
+    dirs = results.dirs
+    for dir_id, name, size, mtime in zip(results.dir_ids, results.names, results.sizes, results.mtimes):
+        owner = owners[dir_id]
+        if owner < 0:
+            rows.append((dirs[dir_id], name, size, mtime))
+        else:
+            count = counts[owner]
+            count[0] += 1
+            count[1] += size
+    remaining.extend(rows)
+    return remaining, [(path, files, nbytes) for path, (files, nbytes) in zip(subtrees, counts) if files]
+
+
+def _walk_bottom_up(path, onerror):
+    """自底向上遍历子树，产出 (目录路径, 子目录名列表, 文件名列表, 目录句柄或None)；不跟随符号链接"""
+    if _HAVE_FWALK:
+        return os.fwalk(path, topdown=False, onerror=onerror)
+    return ((top, dirnames, filenames, None)
+            for top, dirnames, filenames in os.walk(path, topdown=False, onerror=onerror))
+
+
+def _stat_if_matching(top, name, dir_fd, match_name, match_stat):
+    """文件仍符合扫描规则时返回其 stat 结果，否则返回 None
+
+    与扫描一致：跟随符号链接判断是否为普通文件，match_stat 使用 stat 数据。
+    """
+    if not match_name(name):
+        return None
+    st = os.stat(name if dir_fd is not None else os.path.join(top, name), dir_fd=dir_fd)
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    if match_stat is not None and not match_stat(name, st.st_size, st.st_mtime,
+                                                 getattr(st, 'st_file_attributes', 0)):
+        return None
+    return st
+
+
+def remove_tree(path, match_name, on_error, whitelist=None):
+    """自底向上删除整棵子树（含 path 本身），返回 (删除的文件数, 字节数, 删除的目录数, 保留的条目数)
+
+    支持 os.fwalk 的平台上每个目录只打开一次，文件和子目录都按目录句柄相对删除。
+    每个文件删除前用 match_name（及其 match_stat）再核对一次：扫描之后新出现的或不再匹配的条目保留，
+    其所在目录因非空而保留；名称命中 whitelist 的目录及其内容不处理。失败调用 on_error(路径, 异常)。
+    """
+    match_stat = getattr(match_name, 'match_stat', None)
+    files = 0
+    nbytes = 0
+    dirs = 0
+    kept = 0
+
+    def walk_error(error):
+        on_error(error.filename or path, error)
+
+    for top, dirnames, filenames, dir_fd in _walk_bottom_up(path, walk_error):
+        if whitelist and whitelist.matches_path(top[len(path):]):
+            kept += len(dirnames) + len(filenames)
+            continue
+        for name in filenames:
+            try:
+                st = _stat_if_matching(top, name, dir_fd, match_name, match_stat)
+                if st is None:
+                    kept += 1
+                    continue
+                os.unlink(name if dir_fd is not None else os.path.join(top, name), dir_fd=dir_fd)
+            except OSError as e:
+                on_error(os.path.join(top, name), e)
+                continue
+            files += 1
+            nbytes += st.st_size
+        for name in dirnames:
+            if whitelist and whitelist.matches_name(name):
+                kept += 1
+                continue
+            try:
+                os.rmdir(name if dir_fd is not None else os.path.join(top, name), dir_fd=dir_fd)
+            except OSError as e:
+                # 目录因保留的条目而非空，或是指向目录的符号链接：保留，不算作错误
+                if e.errno == errno.ENOTDIR:
+                    kept += 1
+                elif e.errno not in (errno.ENOTEMPTY, errno.EEXIST, errno.ENOENT):
+                    on_error(os.path.join(top, name), e)
+                continue
+            dirs += 1
+    try:
+        os.rmdir(path)
+    except OSError as e:
+        if e.errno not in (errno.ENOTEMPTY, errno.EEXIST, errno.ENOENT):
+            on_error(path, e)
+    else:
+        dirs += 1
+    return files, nbytes, dirs, kept
+
+
+def collect_tree(path, match_name, whitelist=None, strict=True):
+    """列出子树中仍然匹配的文件，返回 [(目录, [(文件名, 大小), ...]), ...]
+
+    strict 为 True 时用于回收站模式在整体移动目录之前确认子树未变化：出现任何不匹配的文件、
+    非目录的其他条目、白名单目录或无法读取的条目都返回 None。strict 为 False 时跳过这些条目。
+    """
+    match_stat = getattr(match_name, 'match_stat', None)
+    groups = []
+    failed = []
+    for top, dirnames, filenames, dir_fd in _walk_bottom_up(path, failed.append):
+        if whitelist and whitelist.matches_path(top[len(path):]):
+            if strict:
+                return None
+            continue
+        if strict and (failed or any(whitelist and whitelist.matches_name(name) for name in dirnames)):
+            return None
+        files = []
+        try:
+            if strict:
+                for name in dirnames:
+                    st = os.lstat(name if dir_fd is not None else os.path.join(top, name), dir_fd=dir_fd)
+                    if not stat.S_ISDIR(st.st_mode):
+                        return None
+            for name in filenames:
+                try:
+                    st = _stat_if_matching(top, name, dir_fd, match_name, match_stat)
+                except OSError:
+                    if strict:
+                        return None
+                    continue
+                if st is not None:
+                    files.append((name, st.st_size))
+                elif strict:
+                    return None
+        except OSError:
+            return None
+        if files:
+            groups.append((top, files))
+    return None if strict and failed else groups
+
+
+def remove_empty_dirs(directories, root, whitelist=None):
+    """从 directories 出发自底向上删除空目录，返回 (删除的目录数, 失败数)
+
+    目录按深度从深到浅依次尝试 os.rmdir，删除成功后再尝试其上级，直到 root（root 本身保留）。
+    只访问给定目录及其祖先，不遍历目录树；非空目录的 rmdir 直接失败，不算作错误。
+    root 之外的目录和相对 root 的路径中含白名单目录名的目录都不处理。
+    """
+    fold = os.path.normcase
+    root = os.path.abspath(root)
+    prefix = fold(os.path.join(root, ''))
+    heap = []
+    queued = set()
+
+    def push(path):
+        key = fold(path)
+        if key in queued or not key.startswith(prefix) or len(key) <= len(prefix):
+            return
+        queued.add(key)
+        if whitelist and whitelist.matches_path(path[len(prefix):]):
+            return
+        heapq.heappush(heap, (-path.count(os.sep), path))
+
+    for directory in directories:
+        push(os.path.abspath(directory))
+
+    removed = 0
+    failed = 0
+    while heap:
+        _, path = heapq.heappop(heap)
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            # 目录非空或已不存在是正常情况；其余错误（如权限不足）计入失败
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST, errno.ENOENT):
+                failed += 1
+            continue
+        removed += 1
+        push(os.path.dirname(path))
+    return removed, failed
+
+
+class DeletionJob:
+    """后台删除任务
+
+    files 为 ScanResults。每个设备最多 workers_per_device 个线程并发处理目录分组；
+    on_progress(snapshot) 最多每 progress_interval 秒调用一次，on_done(snapshot, cancelled)
+    在全部完成后调用一次。两个回调都在工作线程中执行，GUI 侧应自行转回主线程。
+    on_file(路径, 异常或None) 可选，用于逐个文件记录日志，默认只汇总。
+    metrics 为 PerfMetrics 时按目录分组累计删除/回收站调用的耗时和文件数、字节数。
+    prune_root 不为 None 时记录删除过文件的目录，全部删除完成（且未取消）后调用
+    remove_empty_dirs 自底向上清理变空的目录，直到 prune_root 为止，不进入 whitelist 命中的路径
+    （多根目录扫描时 prune_root 为根目录列表，每个根目录各自清理到其本身为止）；
+    删除的目录数记入 progress.dirs_removed，失败数记入 progress.dirs_failed。
+    subtrees 为 split_subtrees 给出的 [(子树路径, 文件数, 字节数), ...] 时，每棵子树作为一个任务整体删除：
+    永久删除用 remove_tree 并按 match_name 再核对每个文件；回收站模式先用 collect_tree 确认子树未变化，
+    再把整个目录移入回收站，子树已变化时退回逐个移动其中匹配的文件。子树中删除的目录计入
+    progress.dirs_removed；on_subtree(路径, 文件数, 字节数, 失败数) 可选，每棵子树完成后调用一次。
+    journal 为 create_journal() 新建的 DeleteJournal 时，开始删除前把全部分组写入日志并等待落盘，
+    每个分组完成后追加完成记录（回收站模式附带每个文件在回收站中的位置，并等待落盘）；
+    为 open_journal() 打开的中断任务时忽略 files/subtrees，只处理日志中未完成的分组（见 resume_deletion），
+    此时不存在的文件视为中断前已删除。日志写入失败不影响删除，错误保存在 journal_error 中。
+    """
+
+    def __init__(self, files, use_recycle, on_progress, on_done,
+                 workers_per_device=4, progress_interval=0.25, on_file=None, metrics=None,
+                 prune_root=None, whitelist=None, subtrees=None, match_name=None, on_subtree=None,
+                 journal=None):
+        self.files = files
+        self.subtrees = subtrees or []
+        self.match_name = match_name
+        self.on_subtree = on_subtree
+        self.on_file = on_file
+        self.metrics = metrics
+        self.prune_root = prune_root
+        self.whitelist = whitelist
+        self.touched_dirs = set()
+        self.use_recycle = use_recycle
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.workers_per_device = workers_per_device
+        self.progress_interval = progress_interval
+        self.cancel_event = threading.Event()
+        self.journal = journal
+        self.journal_error = None
+        self.resumed = journal is not None and journal.resumed
+        if self.resumed:
+            self.progress = DeleteProgress(*journal.state.pending_totals())
+            if prune_root is not None:
+                # 中断前删除过文件的目录没有记录，计划涉及的目录都检查一遍
+                self.touched_dirs.update(journal.state.directories())
+        elif files is None:
+            self.progress = DeleteProgress()
+        else:
+            self.progress = DeleteProgress(len(files) + sum(subtree[1] for subtree in self.subtrees),
+                                           files.total_size + sum(subtree[2] for subtree in self.subtrees))
+        self._lock = threading.Lock()
+        self._last_report = 0.0
+        self.trash_backend = None
+        self.thread = None
+
+    def start(self):
+        """启动后台删除线程"""
+        self.thread = threading.Thread(target=self._run, name="DeletionJob", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """请求停止删除，正在处理的目录分组完成当前文件后退出"""
+        self.cancel_event.set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        if self.use_recycle:
+            # 回收站后端只在需要时加载
+            from trash_backend import get_trash_backend
+            self.trash_backend = get_trash_backend()
+        # 子树按其上级目录所在设备分组
+        tasks = group_by_device(
+            (os.path.dirname(entry[1]) if entry[0] == 'tree' else entry[1], (group_id, entry))
+            for group_id, entry in self._plan())
+        threads = []
+        for device, entries in tasks.items():
+            queue = [item for _, item in reversed(entries)]
+            queue_lock = threading.Lock()
+            for i in range(min(self.workers_per_device, len(entries))):
+                thread = threading.Thread(
+                    target=self._device_worker, args=(queue, queue_lock),
+                    name=f"DeleteWorker-{device}-{i}", daemon=True)
+                threads.append(thread)
+                thread.start()
+        for thread in threads:
+            thread.join()
+        self._prune_empty_dirs()
+        self._finish_journal()
+
+        with self._lock:
+            snapshot = self.progress.copy()
+        self.on_done(snapshot, self.cancel_event.is_set())
+
+    def _plan(self):
+        """返回 [(编号, 条目), ...]，条目为 ('tree', 路径, 文件数, 字节数) 或 ('files', 目录, [(文件名, 大小), ...])
+
+        整体删除的子树排在逐个文件的分组之前（它们通常占了绝大部分文件）。
+        继续中断的任务时只返回日志中未完成的条目；新任务先把计划写入日志并等待落盘。
+        """
+        if self.resumed:
+            return self.journal.state.pending()
+        entries = [('tree',) + tuple(subtree) for subtree in self.subtrees]
+        entries += [('files', directory, files)
+                    for directory, files in split_chunks(group_rows_by_directory(self.files))]
+        entries = list(enumerate(entries))
+        if self.journal is not None and not self.journal.write_plan(entries):
+            # 日志无法写入（如磁盘已满）时照常删除，只是中断后不能继续
+            self.journal_error = self.journal.error
+            self.journal.close()
+            self.journal = None
+        return entries
+
+    def _finish_journal(self):
+        journal = self.journal
+        if journal is None:
+            return
+        self.journal = None
+        if not journal.finish(STATUS_CANCELLED if self.cancel_event.is_set() else STATUS_DONE):
+            self.journal_error = journal.error
+
+    def _journal_done(self, group_id):
+        if group_id is not None and self.journal is not None:
+            self.journal.group_done(group_id)
+
+    def _journal_reserved(self, directory):
+        """返回回收站后端的 on_reserved 回调：移动之前把预留的回收站位置写入日志并等待落盘；没有日志时返回 None"""
+        journal = self.journal
+        if journal is None:
+            return None
+
+        def on_reserved(items):
+            journal.trashed([[os.path.join(directory, name), trash_path] for name, trash_path in items])
+        return on_reserved
+
+    def _prune_empty_dirs(self):
+        """删除阶段结束后清理变空的目录（只处理本次删除过文件的目录）"""
+        if self.prune_root is None or not self.touched_dirs or self.cancel_event.is_set():
+            return
+        started = time.perf_counter()
+        roots = self.prune_root if isinstance(self.prune_root, (list, tuple)) else [self.prune_root]
+        removed = 0
+        failed = 0
+        for root in roots:
+            root_removed, root_failed = remove_empty_dirs(self.touched_dirs, root, self.whitelist)
+            removed += root_removed
+            failed += root_failed
+        if self.metrics is not None:
+            self.metrics.record((('rmdir', time.perf_counter() - started),), (('dirs_removed', removed),))
+        with self._lock:
+            self.progress.dirs_removed += removed
+            self.progress.dirs_failed += failed
+
+    def _device_worker(self, queue, queue_lock):
+        while not self.cancel_event.is_set():
+            with queue_lock:
+                if not queue:
+                    return
+                group_id, entry = queue.pop()
+            if entry[0] == 'tree':
+                self._delete_subtree(entry[1:], group_id)
+            else:
+                self._delete_group(entry[1], entry[2], group_id)
+            self._maybe_report()
+
+    def _delete_subtree(self, subtree, group_id=None):
+        """整体删除一棵扫描时完全命中的子树"""
+        path, planned_files, planned_bytes = subtree
+        errors = []
+
+        def on_error(error_path, error):
+            errors.append((error_path, classify_error(error), str(error)))
+
+        started = time.perf_counter()
+        dirs = 0
+        if self.resumed and not os.path.lexists(path):
+            # 中断前已整体删除，只是完成记录没有落盘
+            files = planned_files
+            nbytes = planned_bytes
+            failed = 0
+        elif self.trash_backend is not None:
+            groups = collect_tree(path, self.match_name, self.whitelist)
+            if groups is None:
+                # 子树在扫描之后有变化：退回逐个移动其中仍然匹配的文件
+                for directory, files in collect_tree(path, self.match_name, self.whitelist, strict=False):
+                    self._delete_group(directory, files)
+                self._journal_done(group_id)
+                return
+            files = sum(len(names) for _, names in groups)
+            nbytes = sum(size for _, names in groups for _, size in names)
+            parent = os.path.dirname(path)
+            self.trash_backend.trash_files(parent, [os.path.basename(path)],
+                                           lambda name, error: on_error(path, error) if error else None,
+                                           self._journal_reserved(parent))
+            failed = files if errors else 0
+            if errors:
+                files = nbytes = 0
+        else:
+            files, nbytes, dirs, _ = remove_tree(path, self.match_name, on_error, self.whitelist)
+            failed = len(errors)
+        if self.metrics is not None:
+            self.metrics.record(
+                (('trash' if self.trash_backend is not None else 'rmtree', time.perf_counter() - started),),
+                (('files_deleted', files), ('bytes_deleted', nbytes), ('files_failed', failed)))
+        if self.on_subtree is not None:
+            self.on_subtree(path, files, nbytes, failed)
+
+        with self._lock:
+            if self.prune_root is not None:
+                self.touched_dirs.add(os.path.dirname(path))
+            progress = self.progress
+            progress.success += files
+            progress.failed += failed
+            progress.bytes_done += nbytes
+            progress.dirs_removed += dirs
+            for error in errors:
+                kind = error[1]
+                progress.error_counts[kind] = progress.error_counts.get(kind, 0) + 1
+                if len(progress.errors) < MAX_ERROR_DETAILS:
+                    progress.errors.append(error)
+        self._journal_done(group_id)
+
+    def _delete_group(self, directory, files, group_id=None):
+        """删除同一目录下的一组文件；group_id 为删除日志中的编号，为 None 时不记录完成（由所属子树记录）"""
+        sizes = dict(files)
+        success = 0
+        failed = 0
+        bytes_done = 0
+        errors = []
+        on_file = self.on_file
+        resumed = self.resumed
+
+        def on_result(name, error):
+            nonlocal success, failed, bytes_done
+            if resumed and isinstance(error, FileNotFoundError):
+                # 中断前已删除，只是完成记录没有落盘
+                error = None
+            if on_file is not None:
+                on_file(os.path.join(directory, name), error)
+            if error is None:
+                success += 1
+                bytes_done += sizes[name]
+            else:
+                failed += 1
+                errors.append((os.path.join(directory, name), classify_error(error), str(error)))
+
+        names = [name for name, _ in files]
+        started = time.perf_counter()
+        if self.trash_backend is not None:
+            self.trash_backend.trash_files(directory, names, on_result, self._journal_reserved(directory))
+        else:
+            remove_files_in_directory(directory, names, on_result)
+        if self.metrics is not None:
+            self.metrics.record(
+                (('trash' if self.trash_backend is not None else 'delete', time.perf_counter() - started),),
+                (('files_deleted', success), ('bytes_deleted', bytes_done), ('files_failed', failed)))
+
+        with self._lock:
+            if success and self.prune_root is not None:
+                self.touched_dirs.add(directory)
+            progress = self.progress
+            progress.success += success
+            progress.failed += failed
+            progress.bytes_done += bytes_done
+            for error in errors:
+                kind = error[1]
+                progress.error_counts[kind] = progress.error_counts.get(kind, 0) + 1
+                if len(progress.errors) < MAX_ERROR_DETAILS:
+                    progress.errors.append(error)
+        self._journal_done(group_id)
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.progress_interval:
+                return
+            self._last_report = now
+            snapshot = self.progress.copy(with_errors=False)
+        self.on_progress(snapshot)
+
+
+def resume_deletion(journal, on_progress, on_done, **kwargs):
+    """按 open_journal() 打开的中断任务日志继续删除，返回尚未启动的 DeletionJob
+
+    删除方式、清理空目录的根目录和整体删除子树的核对规则都取自日志；其余参数与 DeletionJob 相同。
+    """
+    state = journal.state
+    return DeletionJob(None, state.use_recycle, on_progress, on_done, prune_root=state.prune_root,
+                       match_name=state.match_name(), journal=journal, **kwargs)
+
+
+class StreamingDeletionJob(DeletionJob):
+    """流式扫描删除任务
+
+    scan_func(cancel_event) 返回 (目录, 文件名, 大小, 修改时间) 迭代器，与 ScanJob 相同。
+    扫描线程把同一目录的连续结果打包成不超过 batch_size 的任务放入容量为 queue_size 的队列，
+    队列满时扫描线程阻塞等待（背压），因此内存占用与目录树大小无关；首个任务入队后立即开始删除。
+
+    - dry_run: 只统计将要删除的文件，不做任何修改
+    - max_files / max_bytes: 确认阈值。即将超出时扫描暂停，已入队的任务照常完成；
+      若提供 on_threshold(snapshot, resume)，由调用方决定 resume(True) 继续（不再设阈值）
+      或 resume(False) 停止；未提供时直接停止。停止时 limit_reached 为 True
+    - 扫描出错（如根目录不可访问）时停止扫描，scan_error 保存该异常
+    - prune_root / whitelist: 与 DeletionJob 相同；记录的目录集合随目录数而非文件数增长，演练模式下不清理
+
+    progress.total_files / total_bytes 为已入队的文件数和字节数，随扫描增长。
+    on_done(snapshot, cancelled) 在扫描和删除都结束后调用一次。
+    """
+
+    def __init__(self, scan_func, use_recycle, on_progress, on_done, dry_run=False,
+                 max_files=None, max_bytes=None, on_threshold=None, workers=4,
+                 batch_size=STREAM_BATCH_SIZE, queue_size=STREAM_QUEUE_SIZE,
+                 progress_interval=0.25, on_file=None, index=None, metrics=None,
+                 prune_root=None, whitelist=None):
+        super().__init__(None, use_recycle, on_progress, on_done,
+                         workers_per_device=workers, progress_interval=progress_interval, on_file=on_file,
+                         metrics=metrics, prune_root=None if dry_run else prune_root, whitelist=whitelist)
+        self.scan_func = scan_func
+        self.dry_run = dry_run
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.on_threshold = on_threshold
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.index = index
+        self.limit_reached = False
+        self.scan_error = None
+
+    def start(self):
+        """启动扫描线程（同时负责启动删除线程）"""
+        self.thread = threading.Thread(target=self._run, name="StreamingDeletionJob", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        if self.use_recycle and not self.dry_run:
+            from trash_backend import get_trash_backend
+            self.trash_backend = get_trash_backend()
+
+        workers = []
+        for i in range(max(1, self.workers_per_device)):
+            thread = threading.Thread(target=self._stream_worker, name=f"StreamDeleteWorker-{i}", daemon=True)
+            workers.append(thread)
+            thread.start()
+
+        try:
+            self._produce()
+        except Exception as e:
+            # 任何扫描异常都要让删除线程收尾并调用 on_done，否则调用方会一直等待
+            self.scan_error = e
+        finally:
+            if self.index is not None:
+                self.index.close()
+            # 删除线程处理完队列中剩余任务后退出
+            for _ in workers:
+                self.queue.put(None)
+            for thread in workers:
+                thread.join()
+        self._prune_empty_dirs()
+
+        with self._lock:
+            snapshot = self.progress.copy()
+        self.on_done(snapshot, self.cancel_event.is_set())
+
+    def _produce(self):
+        cancel_event = self.cancel_event
+        progress = self.progress
+        current_dir = None
+        batch = []
+        for directory, name, size, mtime in self.scan_func(cancel_event):
+            if cancel_event.is_set():
+                return
+            if self._exceeds_limit(size):
+                if batch:
+                    self._put((current_dir, batch))
+                    batch = []
+                if not self._confirm_continue():
+                    return
+            if directory != current_dir or len(batch) >= self.batch_size:
+                if batch and not self._put((current_dir, batch)):
+                    return
+                current_dir = directory
+                batch = []
+            batch.append((name, size))
+            with self._lock:
+                progress.total_files += 1
+                progress.total_bytes += size
+        if batch and not cancel_event.is_set():
+            self._put((current_dir, batch))
+
+    def _exceeds_limit(self, size):
+        progress = self.progress
+        if self.max_files is not None and progress.total_files + 1 > self.max_files:
+            return True
+        if self.max_bytes is not None and progress.total_bytes + size > self.max_bytes:
+            return True
+        return False
+
+    def _confirm_continue(self):
+        """到达阈值：询问调用方是否继续，返回 True 表示继续且不再限制"""
+        if self.on_threshold is not None:
+            decided = threading.Event()
+            answer = []
+
+            def resume(proceed):
+                answer.append(bool(proceed))
+                decided.set()
+
+            with self._lock:
+                snapshot = self.progress.copy(with_errors=False)
+            self.on_threshold(snapshot, resume)
+            while not decided.wait(0.1):
+                if self.cancel_event.is_set():
+                    return False
+            if answer[0]:
+                self.max_files = None
+                self.max_bytes = None
+                return True
+        self.limit_reached = True
+        return False
+
+    def _put(self, item):
+        """放入队列；队列满时阻塞，取消后放弃并返回 False"""
+        while True:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self.cancel_event.is_set():
+                    return False
+
+    def _stream_worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            # 取消后仍继续取队列，避免扫描线程阻塞在 put 上
+            if self.cancel_event.is_set():
+                continue
+            directory, files = item
+            if self.dry_run:
+                self._count_group(directory, files)
+            else:
+                self._delete_group(directory, files)
+            self._maybe_report()
+
+    def _count_group(self, directory, files):
+        """演练模式：只累计将要删除的文件"""
+        on_file = self.on_file
+        if on_file is not None:
+            for name, _ in files:
+                on_file(os.path.join(directory, name), None)
+        with self._lock:
+            self.progress.success += len(files)
+            self.progress.bytes_done += sum(size for _, size in files)
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+删除日志 - 可中断恢复的删除计划与进度记录
+功能：删除开始前把整个删除计划（按目录分组的文件、整体删除的子树）追加写入用户缓存目录下的日志文件，
+      删除过程中每完成一个分组追加一条完成记录；回收站模式在移动每批文件之前先记录它们在回收站中的位置；
+      写入由后台线程合并成批，每批一次 write 加一次 fsync，需要持久化的调用方只等待所在批次落盘（组提交）；
+      程序或机器中途退出后，按日志找出未完成的分组直接继续删除，无需重新扫描；
+      回收站模式的日志还可用于整批撤销，把记录的文件从回收站移回原位置
+
+日志为 JSON 行格式，每行一条记录：
+    {"t": "job", ...}            任务信息：删除方式、清理空目录的根目录、整体删除子树时的筛选规则
+    {"t": "files", "g": 编号, "dir": 目录, "files": [[文件名, 大小], ...]}
+    {"t": "tree", "g": 编号, "path": 子树路径, "files": 文件数, "bytes": 字节数}
+    {"t": "begin"}               计划已完整写入，此后才开始删除
+    {"t": "trashed", "items": [[原路径, 回收站路径], ...]}   已预留的回收站位置，落盘后才移动这些文件
+    {"t": "done", "g": 编号}
+    {"t": "restored", "paths": [回收站路径, ...]}
+    {"t": "end", "status": "done" | "cancelled" | "abandoned"}
+崩溃时最后一行可能不完整，读取时忽略。
+"""
+
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from app_paths import user_cache_dir
+
+JOURNAL_VERSION = 1
+
+# 后台线程每批提交之间的最短间隔：高频追加时把更多记录合并到同一次 fsync
+COMMIT_DELAY = 0.02
+
+# 最多保留的已完成回收站日志数（用于撤销），更早的自动删除
+JOURNAL_KEEP = 20
+
+STATUS_DONE = "done"
+STATUS_CANCELLED = "cancelled"
+STATUS_ABANDONED = "abandoned"
+
+
+def default_journal_dir():
+    path = os.path.join(user_cache_dir(), 'journals')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _fsync_directory(directory):
+    """新建文件后同步其所在目录，确保目录项本身落盘（Windows 上不支持，跳过）"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JournalWriter:
+    """只追加的日志文件，后台线程组提交
+
+    append(record) 只把序列化后的行放入待写列表；后台线程每次取走全部待写行，一次 write 加一次 fsync，
+    fsync 期间到达的记录自然合并到下一批。append(record, wait=True) 和 commit() 等待记录落盘，
+    返回 False 表示写入失败（错误保存在 error 中），此后的追加全部忽略。
+    metrics 为 PerfMetrics 时把每批写入和 fsync 的耗时计入 journal 计时项。
+    """
+
+    def __init__(self, path, commit_delay=COMMIT_DELAY, metrics=None):
+        self.path = path
+        self.commit_delay = commit_delay
+        self.metrics = metrics
+        self.error = None
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._cond = threading.Condition()
+        self._pending = []
+        self._appended = 0
+        self._durable = 0
+        self._closed = False
+        self.thread = threading.Thread(target=self._run, name="JournalWriter", daemon=True)
+        self.thread.start()
+
+    def append(self, record, wait=False):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        with self._cond:
+            if self.error is not None or self._closed:
+                return False
+            self._pending.append(line)
+            self._appended += 1
+            self._cond.notify_all()
+            return self._wait(self._appended) if wait else True
+
+    def commit(self):
+        """等待已追加的全部记录落盘"""
+        with self._cond:
+            return self._wait(self._appended)
+
+    def _wait(self, seq):
+        while self._durable < seq and self.error is None:
+            self._cond.wait()
+        return self.error is None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            if self.commit_delay and not self._closed:
+                time.sleep(self.commit_delay)
+            with self._cond:
+                batch = self._pending
+                self._pending = []
+                seq = self._appended
+            started = time.perf_counter()
+            try:
+                data = ''.join(batch).encode('utf-8')
+                while data:
+                    data = data[os.write(self._fd, data):]
+                os.fsync(self._fd)
+            except OSError as e:
+                with self._cond:
+                    self.error = e
+                    self._cond.notify_all()
+                return
+            if self.metrics is not None:
+                self.metrics.add_time('journal', time.perf_counter() - started)
+            with self._cond:
+                self._durable = seq
+                self._cond.notify_all()
+
+    def close(self):
+        """提交剩余记录并关闭文件"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.thread.join()
+        os.close(self._fd)
+        return self.error is None
+
+
+class JournalState:
+    """从日志文件读出的任务状态
+
+    entries 为 {编号: 条目}，条目为 ('files', 目录, [(文件名, 大小), ...]) 或 ('tree', 路径, 文件数, 字节数)；
+    done 为已完成的编号集合；trashed 为预留过回收站位置的 [(原路径, 回收站路径), ...]（移动可能未发生），
+    restored 为已撤销的回收站路径集合。
+    planned 为 False 表示计划未写完（尚未开始删除）；status 为 None 表示任务中途退出。
+    valid_size 为最后一条完整记录结束处的字节偏移。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = None
+        self.use_recycle = False
+        self.created = None
+        self.prune_root = None
+        self.filter = None
+        self.entries = {}
+        self.planned = False
+        self.done = set()
+        self.trashed = []
+        self.restored = set()
+        self.status = None
+        self.valid_size = 0
+
+    @property
+    def resumable(self):
+        """计划完整且任务未正常结束、未被放弃，仍有未完成的分组"""
+        return (self.planned and self.status not in (STATUS_DONE, STATUS_ABANDONED)
+                and len(self.done) < len(self.entries))
+
+    @property
+    def restorable(self):
+        """尚未撤销的回收站记录"""
+        return [(original, trash_path) for original, trash_path in self.trashed
+                if trash_path not in self.restored]
+
+    def pending(self):
+        """未完成的 [(编号, 条目), ...]，按编号排序"""
+        done = self.done
+        return [(group_id, entry) for group_id, entry in sorted(self.entries.items()) if group_id not in done]
+
+    def pending_totals(self):
+        """未完成分组的 (文件数, 字节数)"""
+        files = 0
+        nbytes = 0
+        for _, entry in self.pending():
+            if entry[0] == 'tree':
+                files += entry[2]
+                nbytes += entry[3]
+            else:
+                files += len(entry[2])
+                nbytes += sum(size for _, size in entry[2])
+        return files, nbytes
+
+    def directories(self):
+        """计划涉及的全部目录（整体删除的子树取其上级目录），用于继续后清理空目录"""
+        return {os.path.dirname(entry[1]) if entry[0] == 'tree' else entry[1] for entry in self.entries.values()}
+
+    def match_name(self):
+        """按日志中保存的规则重建整体删除子树时核对文件用的匹配器；没有子树时为 None"""
+        if self.filter is None:
+            return None
+        from file_filters import FilterRules, compile_filter
+        return compile_filter(FilterRules(**self.filter['rules']), now=self.filter['now'])
+
+
+def read_journal(path):
+    """读取日志文件，返回 JournalState；不完整的最后一行被忽略"""
+    state = JournalState(path)
+    with open(path, 'rb') as f:
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(raw.decode('utf-8'))
+            except ValueError:
+                break
+            state.valid_size += len(raw)
+            kind = record.get('t')
+            if kind == 'files':
+                state.entries[record['g']] = ('files', record['dir'], [tuple(item) for item in record['files']])
+            elif kind == 'tree':
+                state.entries[record['g']] = ('tree', record['path'], record['files'], record['bytes'])
+            elif kind == 'done':
+                state.done.add(record['g'])
+            elif kind == 'trashed':
+                state.trashed.extend(tuple(item) for item in record['items'])
+            elif kind == 'restored':
+                state.restored.update(record['paths'])
+            elif kind == 'begin':
+                state.planned = True
+            elif kind == 'end':
+                state.status = record['status']
+            elif kind == 'job':
+                state.version = record['v']
+                state.use_recycle = record['recycle']
+                state.created = record['created']
+                state.prune_root = record.get('prune_root')
+                state.filter = record.get('filter')
+    return state
+
+
+class DeleteJournal:
+    """一次删除任务的日志：JournalWriter 加上已读出的状态
+
+    新任务用 create_journal()，继续或撤销已有任务用 open_journal()。
+    DeletionJob 调用 write_plan() 写入计划、trashed() 记录预留的回收站位置、group_done() 记录每个分组完成、
+    finish() 写入结束记录。
+    """
+
+    def __init__(self, writer, state):
+        self.writer = writer
+        self.state = state
+
+    @property
+    def path(self):
+        return self.state.path
+
+    @property
+    def resumed(self):
+        return self.state.planned
+
+    @property
+    def error(self):
+        return self.writer.error
+
+    def write_plan(self, entries):
+        """写入 [(编号, 条目), ...] 并等待落盘，返回是否成功"""
+        append = self.writer.append
+        for group_id, entry in entries:
+            if entry[0] == 'tree':
+                append({"t": "tree", "g": group_id, "path": entry[1], "files": entry[2], "bytes": entry[3]})
+            else:
+                append({"t": "files", "g": group_id, "dir": entry[1], "files": entry[2]})
+            self.state.entries[group_id] = entry
+        append({"t": "begin"})
+        self.state.planned = True
+        return self.writer.commit()
+
+    def trashed(self, items):
+        """记录 [[原路径, 回收站路径], ...] 并等待落盘；在移动文件之前调用，使撤销所需的信息不会丢失"""
+        return self.writer.append({"t": "trashed", "items": items}, wait=True)
+
+    def group_done(self, group_id):
+        self.writer.append({"t": "done", "g": group_id})
+
+    def restored(self, paths):
+        self.writer.append({"t": "restored", "paths": paths}, wait=True)
+        self.state.restored.update(paths)
+
+    def close(self):
+        """只关闭文件，不写结束记录（用于撤销）"""
+        return self.writer.close()
+
+    def finish(self, status):
+        """写入结束记录并关闭；永久删除的任务正常结束后日志不再有用，直接删除"""
+        self.writer.append({"t": "end", "status": status})
+        self.state.status = status
+        ok = self.writer.close()
+        if ok and status == STATUS_DONE and not self.state.use_recycle:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        return ok
+
+
+def create_journal(use_recycle, prune_root=None, match_name=None, directory=None, metrics=None):
+    """新建删除日志并写入任务信息
+
+    match_name 为 CompiledFilter 时保存其规则和基准时间，继续任务时据此重建整体删除子树的核对规则。
+    """
+    directory = directory or default_journal_dir()
+    created = time.time()
+    name = time.strftime("delete-%Y%m%d-%H%M%S", time.localtime(created)) + f"-{os.getpid()}.jsonl"
+    path = os.path.join(directory, name)
+    record = {"t": "job", "v": JOURNAL_VERSION, "recycle": bool(use_recycle), "created": created,
+              "prune_root": prune_root}
+    rules = getattr(match_name, 'rules', None)
+    if rules is not None:
+        record["filter"] = {"rules": vars(rules), "now": match_name.now}
+    writer = JournalWriter(path, metrics=metrics)
+    _fsync_directory(directory)
+    state = JournalState(path)
+    state.version = JOURNAL_VERSION
+    state.use_recycle = bool(use_recycle)
+    state.created = created
+    state.prune_root = prune_root
+    state.filter = record.get("filter")
+    writer.append(record)
+    return DeleteJournal(writer, state)
+
+
+def open_journal(path, metrics=None):
+    """打开已有日志以继续删除或撤销，之后的记录追加到同一文件（先截掉崩溃时写了一半的最后一行）"""
+    state = read_journal(path)
+    if state.version != JOURNAL_VERSION:
+        raise ValueError(f"不支持的删除日志版本: {state.version}")
+    if os.path.getsize(path) != state.valid_size:
+        os.truncate(path, state.valid_size)
+    return DeleteJournal(JournalWriter(path, metrics=metrics), state)
+
+
+def list_journals(directory=None):
+    """读取日志目录中的全部日志，按创建时间从新到旧排列；无法读取的文件跳过"""
+    directory = directory or default_journal_dir()
+    states = []
+    for name in os.listdir(directory):
+        if not name.endswith('.jsonl'):
+            continue
+        try:
+            state = read_journal(os.path.join(directory, name))
+        except (OSError, KeyError, TypeError):
+            continue
+        if state.version == JOURNAL_VERSION:
+            states.append(state)
+    states.sort(key=lambda state: state.created or 0, reverse=True)
+    return states
+
+
+def unfinished_journals(directory=None):
+    """可以继续的日志（中途退出或被取消的任务）"""
+    return [state for state in list_journals(directory) if state.resumable]
+
+
+def latest_restorable(directory=None):
+    """最近一个仍有可撤销回收站记录的日志，没有时返回 None"""
+    for state in list_journals(directory):
+        if state.use_recycle and state.restorable:
+            return state
+    return None
+
+
+def prune_journals(directory=None, keep=JOURNAL_KEEP):
+    """删除不再需要的日志，返回删除的文件数
+
+    可以继续的日志保留；仍有可撤销回收站记录的日志保留最近 keep 个；其余（计划未写完、
+    永久删除或已全部撤销）删除。
+    """
+    removed = 0
+    kept = 0
+    for state in list_journals(directory):
+        if state.resumable:
+            continue
+        if state.planned and state.use_recycle and state.restorable:
+            kept += 1
+            if kept <= keep:
+                continue
+        try:
+            os.remove(state.path)
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+def _trashinfo_path(trash_path):
+    trash_dir = os.path.dirname(os.path.dirname(trash_path))
+    return os.path.join(trash_dir, 'info', os.path.basename(trash_path) + '.trashinfo')
+
+
+def _reserved_for(trash_path, original):
+    """回收站中该名称的 .trashinfo 是否仍属于 original（移动失败时预留被撤回，名称可能已被其他文件使用）"""
+    try:
+        with open(_trashinfo_path(trash_path), 'rb') as f:
+            content = f.read().decode('utf-8', 'replace')
+    except OSError:
+        return False
+    return f"\nPath={quote(original)}\n" in content
+
+
+def _remove_trashinfo(trash_path):
+    try:
+        os.remove(_trashinfo_path(trash_path))
+    except OSError:
+        pass
+
+
+def restore_trashed(journal, cancel_event=None, on_result=None, batch_size=256):
+    """把日志中记录的回收站文件移回原位置，返回 (恢复数, 失败数, [(原路径, 错误信息), ...])
+
+    原位置已有同名条目时不覆盖，记为失败；原目录已被清理时重新创建。
+    日志记录的是移动前预留的位置：回收站中没有该文件而原位置仍在、或该名称的 .trashinfo 已不属于
+    这个文件时，视为移动未发生（预留后退出或移动失败），跳过且不计入恢复数或失败数。
+    每恢复 batch_size 个写入一条 restored 记录，中途退出后再次撤销会跳过已恢复的文件。
+    对应的 .trashinfo 一并删除。on_result(原路径, 异常或None) 可选，逐个文件回调。
+    """
+    restored = 0
+    failed = 0
+    errors = []
+    batch = []
+    for original, trash_path in journal.state.restorable:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        reserved = _reserved_for(trash_path, original)
+        in_trash = os.path.lexists(trash_path)
+        if in_trash and not reserved or not in_trash and os.path.lexists(original):
+            if reserved:
+                # 只留下了预留的 .trashinfo
+                _remove_trashinfo(trash_path)
+            batch.append(trash_path)
+            continue
+        try:
+            if os.path.lexists(original):
+                raise FileExistsError(f"原位置已存在同名条目: {original}")
+            os.makedirs(os.path.dirname(original), exist_ok=True)
+            os.rename(trash_path, original)
+        except OSError as e:
+            failed += 1
+            if len(errors) < 1000:
+                errors.append((original, str(e)))
+            if on_result is not None:
+                on_result(original, e)
+            continue
+        _remove_trashinfo(trash_path)
+        restored += 1
+        batch.append(trash_path)
+        if on_result is not None:
+            on_result(original, None)
+        if len(batch) >= batch_size:
+            journal.restored(batch)
+            batch = []
+    if batch:
+        journal.restored(batch)
+    return restored, failed, errors
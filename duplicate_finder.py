@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复文件查找 - 不依赖wx的分阶段重复内容检测
+功能：扫描结果先按大小分组，大小唯一的文件直接排除；同一 (st_dev, st_ino) 的硬链接只算一个文件；
+      剩余文件比较首尾各 PARTIAL_SIZE 字节的哈希，只有首尾仍然相同的文件才在线程池中
+      以大缓冲区读取全文计算哈希。大多数文件只需要 stat 或读取几 KB，不必读完整个目录树。
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_results import ScanResults
+
+# 首尾各读取的字节数；不超过两倍该值的文件在这一阶段就读完了全部内容
+PARTIAL_SIZE = 4096
+
+# 全文哈希的读缓冲区大小：哈希计算会释放 GIL，大块读取时多个线程可以真正并行
+HASH_BUFFER_SIZE = 1024 * 1024
+
+DEFAULT_WORKERS = 4
+
+# 阶段
+STAGE_SCAN = 'scan'
+STAGE_IDENTITY = 'identity'
+STAGE_PARTIAL = 'partial'
+STAGE_FULL = 'full'
+STAGE_DONE = 'done'
+
+# 每组重复文件中保留哪一个
+KEEP_NEWEST = 'newest'
+KEEP_OLDEST = 'oldest'
+KEEP_SHORTEST_PATH = 'shortest_path'
+KEEP_RULES = (KEEP_NEWEST, KEEP_OLDEST, KEEP_SHORTEST_PATH)
+
+
+def _new_hash():
+    return hashlib.blake2b(digest_size=32)
+
+
+class DuplicateProgress:
+    """查找进度：由后台线程写入，界面定时读取
+
+    stage_files / stage_bytes_read / stage_bytes_total 为当前阶段的进度，
+    bytes_read 为所有阶段累计读取的字节数。
+    """
+
+    def __init__(self):
+        self.stage = STAGE_SCAN
+        self.files_scanned = 0
+        self.candidates = 0
+        self.hardlinks = 0
+        self.stage_files = 0
+        self.stage_bytes_total = 0
+        self.stage_bytes_read = 0
+        self.bytes_read = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def begin_stage(self, stage, bytes_total=0):
+        with self._lock:
+            self.stage = stage
+            self.stage_files = 0
+            self.stage_bytes_total = bytes_total
+            self.stage_bytes_read = 0
+
+    def add_read(self, files, nbytes):
+        with self._lock:
+            self.stage_files += files
+            self.stage_bytes_read += nbytes
+            self.bytes_read += nbytes
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+
+class DuplicateGroup:
+    """一组内容相同的文件
+
+    files 为按路径排序的 (目录, 文件名, 大小, 修改时间) 列表，keep 为保留项的下标。
+    """
+
+    def __init__(self, size, digest, files):
+        self.size = size
+        self.digest = digest
+        self.files = sorted(files, key=lambda row: os.path.join(row[0], row[1]))
+        self.keep = 0
+
+    @property
+    def reclaimable(self):
+        """删除多余副本可释放的字节数"""
+        return self.size * (len(self.files) - 1)
+
+    def kept_path(self):
+        row = self.files[self.keep]
+        return os.path.join(row[0], row[1])
+
+    def choose_keep(self, rule):
+        """按保留规则选出保留项；条件相同时取路径排序靠前的一个"""
+        files = self.files
+        indices = range(len(files))
+        if rule == KEEP_NEWEST:
+            self.keep = max(indices, key=lambda i: (files[i][3], -i))
+        elif rule == KEEP_OLDEST:
+            self.keep = min(indices, key=lambda i: (files[i][3], i))
+        elif rule == KEEP_SHORTEST_PATH:
+            self.keep = min(indices, key=lambda i: (len(files[i][0]) + len(files[i][1]), i))
+        else:
+            raise ValueError(f"未知的保留规则: {rule}")
+        return self.keep
+
+
+def select_redundant(groups, rule=KEEP_NEWEST):
+    """按保留规则为每组选出保留项，返回其余副本组成的 ScanResults（可直接交给删除引擎）"""
+    results = ScanResults()
+    for group in groups:
+        keep = group.choose_keep(rule)
+        results.extend(row for i, row in enumerate(group.files) if i != keep)
+    return results
+
+
+def missing_keepers(groups):
+    """返回保留项已不存在的组（删除前检查，避免所有副本都被删掉）"""
+    return [group for group in groups if not os.path.isfile(group.kept_path())]
+
+
+def drop_changed(results):
+    """删除前重新 stat 每个多余副本，返回 (未变化的 ScanResults, 已变化或已不存在的路径列表)
+
+    哈希之后被修改过的文件（大小或修改时间与哈希时的记录不同）内容可能已经不再重复，不应删除。
+    """
+    unchanged = ScanResults()
+    changed = []
+    for row in results.iter_rows():
+        path = os.path.join(row[0], row[1])
+        try:
+            st = os.stat(path)
+        except OSError:
+            changed.append(path)
+            continue
+        if (st.st_size, st.st_mtime) != (row[2], row[3]):
+            changed.append(path)
+            continue
+        unchanged.add(*row)
+    return unchanged, changed
+
+
+def _file_identity(row):
+    """返回 (st_dev, st_ino)；文件无法访问时返回 None"""
+    try:
+        st = os.stat(os.path.join(row[0], row[1]))
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def partial_digest(path, size):
+    """读取首尾各 PARTIAL_SIZE 字节计算哈希，返回 (摘要, 是否已读完全部内容)
+
+    文件大小与扫描时不一致时抛出 OSError，由调用方当作读取失败处理。
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size != size:
+            raise OSError(f"文件大小已变化: {path}")
+        h = _new_hash()
+        if size <= 2 * PARTIAL_SIZE:
+            h.update(f.read())
+            return h.digest(), True
+        h.update(f.read(PARTIAL_SIZE))
+        f.seek(size - PARTIAL_SIZE)
+        h.update(f.read(PARTIAL_SIZE))
+    return h.digest(), False
+
+
+def full_digest(path, size, progress=None, cancel_event=None):
+    """以大缓冲区读取全文计算哈希；读取过程中可取消（返回 None）"""
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    h = _new_hash()
+    read_total = 0
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            n = f.readinto(buffer)
+            if not n:
+                break
+            h.update(view[:n])
+            read_total += n
+            if progress is not None:
+                progress.add_read(0, n)
+    if read_total != size:
+        raise OSError(f"文件大小已变化: {path}")
+    return h.digest()
+
+
+def find_duplicates(rows, workers=DEFAULT_WORKERS, min_size=1, cancel_event=None, progress=None,
+                    metrics=None):
+    """在 (目录, 文件名, 大小, 修改时间) 行中查找内容相同的文件，返回按可释放空间降序的 DuplicateGroup 列表
+
+    - min_size: 小于该大小的文件不参与比较（默认跳过空文件）
+    - workers: 读取文件内容的线程数
+    - progress 为 DuplicateProgress 时实时更新各阶段进度
+    - metrics 为 PerfMetrics 时记录各阶段耗时
+    - cancel_event 被置位后尽快返回空列表
+    """
+    if progress is None:
+        progress = DuplicateProgress()
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def timed(name, started):
+        if metrics is not None:
+            metrics.add_time(name, time.perf_counter() - started)
+
+    # 第一阶段：按大小分组，大小唯一的文件不可能有重复
+    started = time.perf_counter()
+    by_size = {}
+    for row in rows:
+        progress.files_scanned += 1
+        if row[2] >= min_size:
+            by_size.setdefault(row[2], []).append(row)
+    if cancelled():
+        return []
+    size_groups = [group for group in by_size.values() if len(group) > 1]
+    del by_size
+    timed('dupe_group_size', started)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='DupeHash') as pool:
+        # 第二阶段：同一 inode 的硬链接只保留一个，删除硬链接并不释放空间
+        started = time.perf_counter()
+        candidates = [row for group in size_groups for row in group]
+        progress.candidates = len(candidates)
+        progress.begin_stage(STAGE_IDENTITY)
+        identities = pool.map(lambda row: None if cancelled() else _file_identity(row), candidates)
+        seen = set()
+        unique = {}
+        for row, identity in zip(candidates, identities):
+            if identity is None:
+                progress.add_error()
+                continue
+            if identity in seen:
+                progress.hardlinks += 1
+                continue
+            seen.add(identity)
+            unique.setdefault(row[2], []).append(row)
+        del candidates, seen, size_groups
+        timed('dupe_identity', started)
+        if cancelled():
+            return []
+
+        # 第三阶段：比较首尾各 PARTIAL_SIZE 字节
+        started = time.perf_counter()
+        candidates = [row for group in unique.values() if len(group) > 1 for row in group]
+        del unique
+        progress.begin_stage(STAGE_PARTIAL, sum(min(row[2], 2 * PARTIAL_SIZE) for row in candidates))
+
+        def read_partial(row):
+            if cancelled():
+                return None
+            try:
+                result = partial_digest(os.path.join(row[0], row[1]), row[2])
+            except OSError:
+                progress.add_error()
+                return None
+            progress.add_read(1, min(row[2], 2 * PARTIAL_SIZE))
+            return result
+
+        buckets = {}
+        complete = set()
+        for row, result in zip(candidates, pool.map(read_partial, candidates)):
+            if result is None:
+                continue
+            digest, whole = result
+            key = (row[2], digest)
+            buckets.setdefault(key, []).append(row)
+            if whole:
+                complete.add(key)
+        del candidates
+        timed('dupe_partial_hash', started)
+        if cancelled():
+            return []
+
+        groups = [DuplicateGroup(key[0], key[1], members) for key, members in buckets.items()
+                  if len(members) > 1 and key in complete]
+
+        # 第四阶段：首尾相同的大文件才读取全文
+        started = time.perf_counter()
+        candidates = [row for key, members in buckets.items()
+                      if len(members) > 1 and key not in complete for row in members]
+        del buckets
+        progress.begin_stage(STAGE_FULL, sum(row[2] for row in candidates))
+
+        def read_full(row):
+            if cancelled():
+                return None
+            try:
+                digest = full_digest(os.path.join(row[0], row[1]), row[2], progress, cancel_event)
+            except OSError:
+                progress.add_error()
+                return None
+            if digest is not None:
+                progress.add_read(1, 0)
+            return digest
+
+        full_buckets = {}
+        for row, digest in zip(candidates, pool.map(read_full, candidates)):
+            if digest is not None:
+                full_buckets.setdefault((row[2], digest), []).append(row)
+        timed('dupe_full_hash', started)
+        if cancelled():
+            return []
+
+    groups.extend(DuplicateGroup(key[0], key[1], members) for key, members in full_buckets.items()
+                  if len(members) > 1)
+    groups.sort(key=lambda group: group.reclaimable, reverse=True)
+    progress.stage = STAGE_DONE
+    return groups
+
+
+class DuplicateJob:
+    """在后台线程中查找重复文件
+
+    scan_func(cancel_event) 返回扫描结果迭代器；on_done(groups, cancelled, error) 在工作线程中调用，
+    GUI 侧应自行通过 wx.CallAfter 转回主线程。progress 可供界面定时读取。
+    """
+
+    def __init__(self, scan_func, on_done, workers=DEFAULT_WORKERS, min_size=1, metrics=None):
+        self.scan_func = scan_func
+        self.on_done = on_done
+        self.workers = workers
+        self.min_size = min_size
+        self.metrics = metrics
+        self.progress = DuplicateProgress()
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动后台查找线程"""
+        self.thread = threading.Thread(target=self._run, name="DuplicateJob", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        groups = []
+        error = None
+        try:
+            groups = find_duplicates(self.scan_func(self.cancel_event), self.workers, self.min_size,
+                                     self.cancel_event, self.progress, self.metrics)
+        except Exception as e:
+            error = e
+        self.on_done(groups, self.cancel_event.is_set(), error)
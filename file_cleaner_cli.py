@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件清理命令行工具 - 无界面模式
+功能：与图形界面共用扫描、白名单和删除逻辑，但完全不导入 wx，适合在 cron / CI 等无显示环境运行；
+      结果以 JSON Lines 输出，每个匹配文件一行，最后一行为汇总
+
+用法示例：
+    python file_cleaner_cli.py D:\\build --ext .obj,.pdb --recursive
+    python file_cleaner_cli.py /srv/cache --no-ext --delete --trash
+    python file_cleaner_cli.py /srv/web --no-ext --recursive --delete --whole-dirs --summary-only
+    python file_cleaner_cli.py /tmp/build --ext .o --recursive --delete --stream --max-files 100000
+    python file_cleaner_cli.py /data --ext .iso,.zip --recursive --top-files 20
+    python file_cleaner_cli.py /mnt/disk1/tmp /mnt/disk2/tmp --ext .tmp --recursive --delete
+    python file_cleaner_cli.py /var/log/app --retention policies.json --recursive --delete --trash
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+
+from scan_engine import (
+    parse_extensions, iter_matching_roots, iter_largest_files, iter_largest_directories, TopSummary,
+    ScanStats, SubtreeTracker, WhitelistMatcher, DEFAULT_WHITELIST_DIRS
+)
+from file_filters import FilterRules, compile_filter
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="按后缀或无后缀规则扫描并清理文件（无界面模式，输出 JSON Lines）")
+    parser.add_argument("roots", nargs="+", metavar="root",
+                        help="扫描目录，可指定多个：按所在设备并发扫描，重叠或绑定挂载的部分只扫描一次")
+
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--ext", help="要匹配的文件后缀，逗号分隔，如 .txt,.log")
+    mode.add_argument("--no-ext", action="store_true", help="匹配无后缀文件")
+    mode.add_argument("--retention", metavar="POLICY_FILE",
+                      help="按保留策略文件（JSON 数组）生成删除计划，筛选条件由策略文件给出")
+
+    parser.add_argument("--recursive", action="store_true",
+                        help="递归扫描子目录（--no-ext 模式始终递归）")
+    parser.add_argument("--max-depth", type=int, default=None, help="最大扫描深度，0 表示只扫描根目录")
+    parser.add_argument("--workers", type=int, default=1, help="并行列目录的线程数")
+    parser.add_argument("--index", action="store_true", help="使用持久化扫描索引进行增量扫描")
+    parser.add_argument("--whitelist", action="append", default=[], metavar="NAME",
+                        help="追加白名单目录名，可重复指定")
+    parser.add_argument("--no-default-whitelist", action="store_true", help="不使用默认白名单")
+    parser.add_argument("--include-hidden", action="store_true", help="包含隐藏文件（--no-ext 模式）")
+    parser.add_argument("--exclude-system", action="store_true", help="排除带系统属性的文件（Windows）")
+
+    filters = parser.add_argument_group("附加筛选条件")
+    filters.add_argument("--glob", action="append", default=[], metavar="PATTERN",
+                         help="文件名通配符，可重复指定，满足其一即可")
+    filters.add_argument("--regex", action="append", default=[], metavar="PATTERN",
+                         help="文件名正则表达式（re.search），可重复指定，满足其一即可")
+    filters.add_argument("--min-size", type=int, default=None, metavar="BYTES", help="最小文件大小（字节）")
+    filters.add_argument("--max-size", type=int, default=None, metavar="BYTES", help="最大文件大小（字节）")
+    filters.add_argument("--older-than-days", type=float, default=None, metavar="DAYS",
+                         help="只匹配修改时间早于该天数的文件")
+    filters.add_argument("--newer-than-days", type=float, default=None, metavar="DAYS",
+                         help="只匹配修改时间在该天数以内的文件")
+
+    top = parser.add_mutually_exclusive_group()
+    top.add_argument("--top-files", type=int, default=None, metavar="K",
+                     help="只输出（或删除）最大的 K 个匹配文件，内存占用为 O(K)")
+    top.add_argument("--top-dirs", type=int, default=None, metavar="N",
+                     help="只输出匹配文件总大小（含子目录）最大的 N 个目录，不能与 --delete 同时使用")
+
+    parser.add_argument("--delete", action="store_true", help="扫描后删除匹配的文件")
+    parser.add_argument("--trash", action="store_true", help="与 --delete 一起使用：移动到回收站而非永久删除")
+    parser.add_argument("--summary-only", action="store_true", help="只输出汇总行，不逐个输出文件")
+    parser.add_argument("--stream", action="store_true",
+                        help="与 --delete 一起使用：边扫描边删除，不保存完整结果，内存占用不随文件数增长")
+    parser.add_argument("--dry-run", action="store_true", help="与 --delete 一起使用：只统计，不实际删除")
+    parser.add_argument("--prune-empty-dirs", action="store_true",
+                        help="与 --delete 一起使用：删除后自底向上清理变空的目录（只检查删除过文件的目录，保留扫描根目录）")
+    parser.add_argument("--whole-dirs", action="store_true",
+                        help="与 --delete 一起使用：扫描中发现的全部由匹配文件组成的子目录整体删除（含目录本身）")
+    parser.add_argument("--max-files", type=int, default=None, metavar="N",
+                        help="确认阈值：匹配文件数超过 N 时不再删除（流式模式删除前 N 个后停止）")
+    parser.add_argument("--max-bytes", type=int, default=None, metavar="BYTES",
+                        help="确认阈值：匹配总字节数超过该值时不再删除（流式模式到达阈值时停止）")
+    parser.add_argument("--perf-report", default=None, metavar="PATH",
+                        help="把分阶段耗时和计数写成 JSON 报告")
+    return parser
+
+
+class JsonLinesWriter:
+    """JSON Lines 输出；json 模块只在第一次输出时加载"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._dumps = None
+
+    def write(self, record):
+        if self._dumps is None:
+            import json
+            self._dumps = json.dumps
+        self.stream.write(self._dumps(record, ensure_ascii=False) + "\n")
+
+
+def build_filter(args):
+    """按命令行参数编译筛选规则"""
+    rules = FilterRules(
+        name_globs=args.glob,
+        regexes=args.regex,
+        extensions=() if args.no_ext else parse_extensions(args.ext),
+        no_extension=args.no_ext,
+        min_size=args.min_size,
+        max_size=args.max_size,
+        older_than_days=args.older_than_days,
+        newer_than_days=args.newer_than_days,
+        # 后缀模式历来不区分隐藏文件，保持原行为
+        include_hidden=args.include_hidden or not args.no_ext,
+        include_system=not args.exclude_system,
+    )
+    return compile_filter(rules)
+
+
+def load_retention_planner(path):
+    """读取保留策略文件，返回 RetentionPlanner"""
+    import json
+    from retention_policy import RetentionPolicy, RetentionPlanner
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [data]
+    return RetentionPlanner([RetentionPolicy.from_dict(item) for item in data])
+
+
+def build_whitelist(args):
+    names = [] if args.no_default_whitelist else list(DEFAULT_WHITELIST_DIRS)
+    names.extend(args.whitelist)
+    return WhitelistMatcher(names)
+
+
+def iter_hits(args, match_name, stats, index, metrics=None, subtrees=None):
+    """按命令行参数构造扫描，产出 (目录, 文件名, 大小, 修改时间)"""
+    whitelist = build_whitelist(args)
+
+    recursive = True if args.no_ext else args.recursive
+    return iter_matching_roots(args.roots, match_name, recursive, args.max_depth,
+                               whitelist=whitelist, stats=stats, workers=args.workers, index=index,
+                               metrics=metrics, subtrees=subtrees)
+
+
+def root_fields(args, stats):
+    """汇总行中的扫描目录字段：单个目录为 root，多个目录为 roots 及重复目录数"""
+    if len(args.roots) == 1:
+        return {"root": args.roots[0]}
+    return {"roots": args.roots, "dirs_duplicate": stats.dirs_duplicate}
+
+
+def write_scan_errors(args, stats, out, error=None):
+    """输出无法访问的扫描目录；单个目录无法访问时错误只在 error 中"""
+    for root, message in stats.failed_roots:
+        out.write({"type": "error", "path": root, "message": message})
+    if error is not None and not stats.failed_roots:
+        out.write({"type": "error", "path": args.roots[0], "message": str(error)})
+
+
+def run_deletion(results, use_recycle, metrics=None, prune_root=None, whitelist=None,
+                 subtrees=None, match_name=None, journal=None):
+    """同步执行删除任务，返回 (最终进度快照, 删除日志写入错误)
+
+    subtrees 为 split_subtrees 给出的整体删除的子树；journal 为 create_journal() 新建的删除日志，
+    中断后可在图形界面中继续，回收站模式还可以撤销。
+    """
+    from delete_engine import DeletionJob
+
+    finished = threading.Event()
+    outcome = []
+
+    def on_done(progress, cancelled):
+        outcome.append(progress)
+        finished.set()
+
+    job = DeletionJob(results, use_recycle, on_progress=lambda progress: None, on_done=on_done,
+                      metrics=metrics, prune_root=prune_root, whitelist=whitelist,
+                      subtrees=subtrees, match_name=match_name, journal=journal)
+    job.start()
+    finished.wait()
+    return outcome[0], job.journal_error
+
+
+def run_streaming(args, match_name, stats, index, out, metrics=None):
+    """流式扫描删除：返回 (汇总字段, 退出码)"""
+    from delete_engine import StreamingDeletionJob
+
+    finished = threading.Event()
+    outcome = []
+    write_lock = threading.Lock()
+
+    def on_done(progress, cancelled):
+        outcome.append(progress)
+        finished.set()
+
+    record_type = "would_delete" if args.dry_run else "deleted"
+
+    def write_file(path, error):
+        record = {"type": record_type if error is None else "delete_error", "path": path}
+        if error is not None:
+            record["message"] = str(error)
+        with write_lock:
+            out.write(record)
+
+    on_file = None if args.summary_only else write_file
+
+    job = StreamingDeletionJob(
+        lambda cancel_event: iter_hits(args, match_name, stats, index, metrics),
+        args.trash, on_progress=lambda progress: None, on_done=on_done,
+        dry_run=args.dry_run, max_files=args.max_files, max_bytes=args.max_bytes,
+        on_file=on_file, index=index, metrics=metrics,
+        prune_root=args.roots if args.prune_empty_dirs else None, whitelist=build_whitelist(args))
+    job.start()
+    finished.wait()
+    progress = outcome[0]
+
+    summary = {
+        "files": progress.total_files,
+        "bytes": progress.total_bytes,
+        "delete_mode": "dry_run" if args.dry_run else ("trash" if args.trash else "permanent"),
+        "deleted": progress.success,
+        "failed": progress.failed,
+        "bytes_freed": progress.bytes_done,
+        "error_counts": progress.error_counts,
+        "limit_reached": job.limit_reached,
+    }
+    if args.prune_empty_dirs:
+        summary.update({"dirs_removed": progress.dirs_removed, "dirs_failed": progress.dirs_failed})
+    write_scan_errors(args, stats, out, job.scan_error)
+    if job.scan_error is not None or stats.failed_roots:
+        return summary, 2
+    if progress.failed:
+        return summary, 1
+    if job.limit_reached:
+        return summary, 3
+    return summary, 0
+
+
+def create_cli_journal(args, match_name, metrics, out):
+    """为非流式删除新建删除日志；无法创建或回收站不能撤销时输出 warning 行"""
+    from delete_journal import create_journal, prune_journals
+    try:
+        # 命令行可能长期无人打开图形界面，和启动界面时一样先清理不再需要的日志
+        prune_journals()
+        journal = create_journal(args.trash, args.roots if args.prune_empty_dirs else None, match_name,
+                                 metrics=metrics)
+    except OSError as e:
+        out.write({"type": "warning", "message": f"无法创建删除日志，中断后需要重新扫描: {e}"})
+        return None
+    if args.trash:
+        from trash_backend import get_trash_backend
+        if not get_trash_backend().restorable:
+            out.write({"type": "warning", "message": "当前平台的回收站不记录文件位置，本次删除不能撤销"})
+    return journal
+
+
+def write_perf_report(args, metrics, summary):
+    """--perf-report：把计量数据连同汇总写入指定文件"""
+    if metrics is None:
+        return
+    import json
+    from perf_metrics import build_report
+    report = build_report("cli", metrics, {"summary": summary})
+    with open(args.perf_report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if (args.stream or args.dry_run or args.prune_empty_dirs or args.whole_dirs) and not args.delete:
+        parser.error("--stream、--dry-run、--prune-empty-dirs 和 --whole-dirs 需要与 --delete 一起使用")
+    if args.whole_dirs and (args.stream or args.top_files is not None or args.retention):
+        parser.error("--whole-dirs 需要完整的扫描结果，不能与 --stream、--top-files 或 --retention 一起使用")
+    if args.top_dirs is not None and args.delete:
+        parser.error("--top-dirs 只列出目录，不能与 --delete 一起使用")
+    if args.top_dirs is not None and len(args.roots) > 1:
+        parser.error("--top-dirs 只支持单个扫描目录")
+    if args.top_files is not None and args.stream:
+        parser.error("--top-files 需要扫描完成后才能确定结果，不能与 --stream 一起使用")
+    for value in (args.top_files, args.top_dirs):
+        if value is not None and value < 1:
+            parser.error("--top-files / --top-dirs 必须大于 0")
+    planner = None
+    if args.retention:
+        if args.stream or args.top_files is not None or args.top_dirs is not None:
+            parser.error("--retention 不能与 --stream、--top-files 或 --top-dirs 一起使用")
+        try:
+            planner = load_retention_planner(args.retention)
+        except (OSError, ValueError, TypeError) as e:
+            parser.error(f"无法读取保留策略文件: {e}")
+        except re.error as e:
+            parser.error(f"保留策略中的正则表达式无效: {e}")
+        match_name = planner.match_name
+    else:
+        try:
+            match_name = build_filter(args)
+        except re.error as e:
+            parser.error(f"正则表达式无效: {e}")
+    out = JsonLinesWriter(sys.stdout)
+    started = time.monotonic()
+
+    index = None
+    if args.index:
+        from scan_index import ScanIndex
+        index = ScanIndex()
+
+    metrics = None
+    if args.perf_report:
+        from perf_metrics import PerfMetrics
+        metrics = PerfMetrics()
+
+    stats = ScanStats()
+    if args.stream:
+        if not args.dry_run:
+            out.write({"type": "warning", "message": "流式删除不写删除日志，中断后无法继续，也不能撤销"})
+        fields, exit_code = run_streaming(args, match_name, stats, index, out, metrics)
+        summary = {"type": "summary"}
+        summary.update(root_fields(args, stats))
+        summary["stream"] = True
+        summary.update(fields)
+        summary.update({
+            "dirs_scanned": stats.dirs_scanned,
+            "dirs_skipped": stats.dirs_skipped,
+            "scan_errors": stats.errors,
+            "elapsed": round(time.monotonic() - started, 3),
+        })
+        out.write(summary)
+        write_perf_report(args, metrics, summary)
+        return exit_code
+
+    results = None
+    if args.delete:
+        from scan_results import ScanResults
+        results = ScanResults()
+    subtrees = SubtreeTracker() if args.whole_dirs else None
+
+    hits = iter_hits(args, match_name, stats, index, metrics, subtrees)
+    top_summary = None
+    if args.top_files is not None or args.top_dirs is not None:
+        top_summary = TopSummary()
+        if args.top_dirs is not None:
+            root = os.path.abspath(args.roots[0]) if index is not None else args.roots[0]
+            hits = iter_largest_directories(hits, root, args.top_dirs, top_summary)
+        else:
+            hits = iter_largest_files(hits, args.top_files, top_summary)
+    record_type = "directory" if args.top_dirs is not None else "file"
+    reasons = None
+
+    count = 0
+    total_size = 0
+    try:
+        if planner is not None:
+            from retention_policy import REASON_KEYS
+            hits = planner.run(hits).iter_rows()
+            reasons = (REASON_KEYS[reason] for reason in planner.reasons)
+        for directory, name, size, mtime in hits:
+            count += 1
+            total_size += size
+            if results is not None:
+                results.add(directory, name, size, mtime)
+            reason = next(reasons) if reasons is not None else None
+            if not args.summary_only:
+                record = {"type": record_type, "path": os.path.join(directory, name),
+                          "size": size, "mtime": mtime}
+                if reason is not None:
+                    record["reason"] = reason
+                out.write(record)
+    except OSError as e:
+        write_scan_errors(args, stats, out, e)
+        return 2
+    finally:
+        if index is not None:
+            index.close()
+
+    summary = {"type": "summary"}
+    summary.update(root_fields(args, stats))
+    summary.update({
+        "files": count,
+        "bytes": total_size,
+        "dirs_scanned": stats.dirs_scanned,
+        "dirs_skipped": stats.dirs_skipped,
+        "scan_errors": stats.errors,
+    })
+    if top_summary is not None:
+        summary.update({"matched_files": top_summary.files, "matched_bytes": top_summary.bytes})
+        if args.top_dirs is not None:
+            # 目录总大小相互包含，求和没有意义
+            del summary["bytes"]
+            summary["dirs"] = summary.pop("files")
+    if planner is not None:
+        summary.update({"matched_files": planner.matched_files, "matched_bytes": planner.matched_bytes,
+                        "policies": planner.summary()})
+
+    exit_code = 0
+    limit_reached = ((args.max_files is not None and count > args.max_files)
+                     or (args.max_bytes is not None and total_size > args.max_bytes))
+    if results is not None and limit_reached:
+        summary["limit_reached"] = True
+        exit_code = 3
+    elif results is not None and args.dry_run:
+        summary.update({"delete_mode": "dry_run", "deleted": 0, "bytes_freed": 0})
+    elif results is not None and len(results):
+        whole_dirs = []
+        if subtrees is not None:
+            from delete_engine import split_subtrees
+            results, whole_dirs = split_subtrees(results, subtrees.subtrees)
+            summary.update({"whole_dirs": len(whole_dirs),
+                            "whole_dir_files": sum(subtree[1] for subtree in whole_dirs)})
+            if not args.summary_only:
+                for path, files, nbytes in whole_dirs:
+                    out.write({"type": "whole_dir", "path": path, "files": files, "bytes": nbytes})
+        journal = create_cli_journal(args, match_name, metrics, out)
+        progress, journal_error = run_deletion(results, args.trash, metrics,
+                                               prune_root=args.roots if args.prune_empty_dirs else None,
+                                               whitelist=build_whitelist(args), subtrees=whole_dirs,
+                                               match_name=match_name, journal=journal)
+        if journal_error is not None:
+            out.write({"type": "warning", "message": f"删除日志写入失败，中断后需要重新扫描: {journal_error}"})
+        summary.update({
+            "delete_mode": "trash" if args.trash else "permanent",
+            "deleted": progress.success,
+            "failed": progress.failed,
+            "bytes_freed": progress.bytes_done,
+            "error_counts": progress.error_counts,
+        })
+        if args.prune_empty_dirs or whole_dirs:
+            summary.update({"dirs_removed": progress.dirs_removed, "dirs_failed": progress.dirs_failed})
+        for path, kind, message in progress.errors:
+            out.write({"type": "delete_error", "path": path, "kind": kind, "message": message})
+        if progress.failed:
+            exit_code = 1
+
+    # 部分扫描目录无法访问：其余目录照常处理，退出码为 2
+    write_scan_errors(args, stats, out)
+    if stats.failed_roots and exit_code == 0:
+        exit_code = 2
+    summary["elapsed"] = round(time.monotonic() - started, 3)
+    out.write(summary)
+    write_perf_report(args, metrics, summary)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,12 +7,16 @@
 
 import wx
 import wx.adv
-import os
-import glob
 import logging
 import datetime
 from pathlib import Path
 
+from scan_engine import parse_extensions, iter_matching_files
+from file_filters import FilterRules, compile_filter
+from scan_results import ScanResults, format_size, format_mtime
+from delete_engine import DeletionJob
+from log_pipeline import setup_queue_logging, LogBuffer, LEVEL_PREFIXES
+
 class FileDeleterApp(wx.Frame):
     """主应用程序窗口"""
     
@@ -24,7 +28,8 @@ class FileDeleterApp(wx.Frame):
         
         # 初始化变量
         self.selected_folder = ""
-        self.files_to_delete = []
+        self.files_to_delete = ScanResults()
+        self.deletion_job = None
         
         # 创建界面
         self.create_ui()
@@ -35,37 +40,38 @@ class FileDeleterApp(wx.Frame):
         # 绑定事件
         self.Bind(wx.EVT_CLOSE, self.on_close)
         
+        # 界面日志刷新定时器
+        self.log_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_flush_log, self.log_timer)
+        self.log_timer.Start(200)
+        
         self.log("应用程序启动")
     
     def setup_logging(self):
-        """设置日志记录"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('file_deleter.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """设置日志记录：文件输出经队列在后台线程写入，界面日志由定时器合并刷新"""
+        self.log_listener = setup_queue_logging('file_deleter.log')
         self.logger = logging.getLogger(__name__)
+        self.log_buffer = LogBuffer(max_lines=5000)
+        self.log_lines_shown = 0
     
     def log(self, message, level=logging.INFO):
-        """记录日志并更新界面"""
+        """记录日志，可在任意线程调用；界面显示由 on_flush_log 定时批量完成"""
+        self.logger.log(level, message)
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        
-        if level == logging.INFO:
-            self.logger.info(message)
-            self.log_text.AppendText(log_message + "\n")
-        elif level == logging.WARNING:
-            self.logger.warning(message)
-            self.log_text.AppendText(f"⚠️ {log_message}\\n")
-        elif level == logging.ERROR:
-            self.logger.error(message)
-            self.log_text.AppendText(f"❌ {log_message}\\n")
-        elif level == logging.CRITICAL:
-            self.logger.critical(message)
-            self.log_text.AppendText(f"💥 {log_message}\\n")
+        self.log_buffer.append(f"{LEVEL_PREFIXES.get(level, '')}[{timestamp}] {message}\n")
+    
+    def on_flush_log(self, event=None):
+        """把待显示的日志合并成一次追加；超出行数上限时用环形缓冲重建文本"""
+        lines = self.log_buffer.drain()
+        if not lines:
+            return
+        
+        if self.log_lines_shown + len(lines) > self.log_buffer.max_lines * 3 // 2:
+            self.log_text.SetValue("".join(self.log_buffer.lines))
+            self.log_lines_shown = len(self.log_buffer.lines)
+        else:
+            self.log_text.AppendText("".join(lines))
+            self.log_lines_shown += len(lines)
         
         # 滚动到最新日志
         self.log_text.ShowPosition(self.log_text.GetLastPosition())
@@ -166,7 +172,7 @@ class FileDeleterApp(wx.Frame):
                 
                 # 清空文件列表
                 self.files_list.DeleteAllItems()
-                self.files_to_delete = []
+                self.files_to_delete = ScanResults()
                 self.delete_btn.Disable()
                 self.update_stats()
     
@@ -181,28 +187,21 @@ class FileDeleterApp(wx.Frame):
             wx.MessageBox("请输入文件后缀！", "提示", wx.OK | wx.ICON_WARNING)
             return
         
-        # 解析后缀
-        ext_list = [ext.strip() for ext in extensions.split(',') if ext.strip()]
+        # 解析后缀并预编译匹配器
+        ext_list = parse_extensions(extensions)
+        match_name = compile_filter(FilterRules(extensions=ext_list))
         
         self.log(f"开始扫描文件夹: {self.selected_folder}")
         self.log(f"目标后缀: {', '.join(ext_list)}")
         
         # 清空文件列表
         self.files_list.DeleteAllItems()
-        self.files_to_delete = []
+        self.files_to_delete = ScanResults()
         
         try:
-            # 扫描文件
-            total_size = 0
-            for ext in ext_list:
-                pattern = os.path.join(self.selected_folder, f"*{ext}")
-                files = glob.glob(pattern, recursive=True)
-                
-                for file_path in files:
-                    if os.path.isfile(file_path):
-                        file_info = self.get_file_info(file_path)
-                        self.files_to_delete.append(file_info)
-                        total_size += file_info['size']
+            # 单次遍历扫描文件（基础工具只扫描所选文件夹本身）
+            self.files_to_delete.extend(iter_matching_files(
+                self.selected_folder, match_name, recursive=False))
             
             # 更新文件列表
             self.update_files_list()
@@ -219,43 +218,19 @@ class FileDeleterApp(wx.Frame):
             self.log(f"扫描文件时出错: {str(e)}", logging.ERROR)
             wx.MessageBox(f"扫描文件时出错: {str(e)}", "错误", wx.OK | wx.ICON_ERROR)
     
-    def get_file_info(self, file_path):
-        """获取文件信息"""
-        stat = os.stat(file_path)
-        return {
-            'path': file_path,
-            'name': os.path.basename(file_path),
-            'size': stat.st_size,
-            'modified': datetime.datetime.fromtimestamp(stat.st_mtime)
-        }
-    
     def update_files_list(self):
         """更新文件列表显示"""
         self.files_list.DeleteAllItems()
         
-        for i, file_info in enumerate(self.files_to_delete):
-            index = self.files_list.InsertItem(i, file_info['name'])
-            
-            # 格式化文件大小
-            size_kb = file_info['size'] / 1024
-            if size_kb < 1024:
-                size_str = f"{size_kb:.1f} KB"
-            else:
-                size_str = f"{size_kb/1024:.1f} MB"
-            
-            self.files_list.SetItem(index, 1, size_str)
-            self.files_list.SetItem(index, 2, file_info['modified'].strftime("%Y-%m-%d %H:%M:%S"))
+        files = self.files_to_delete
+        for i in range(len(files)):
+            index = self.files_list.InsertItem(i, files.name(i))
+            self.files_list.SetItem(index, 1, format_size(files.size(i)))
+            self.files_list.SetItem(index, 2, format_mtime(files.mtime(i)))
     
     def update_stats(self):
         """更新统计信息"""
-        total_size = sum(f['size'] for f in self.files_to_delete)
-        size_kb = total_size / 1024
-        
-        if size_kb < 1024:
-            size_str = f"{size_kb:.1f} KB"
-        else:
-            size_str = f"{size_kb/1024:.1f} MB"
-        
+        size_str = format_size(self.files_to_delete.total_size)
         self.stats_text.SetLabel(f"找到 {len(self.files_to_delete)} 个文件，总大小 {size_str}")
     
     def on_delete_files(self, event):
@@ -265,11 +240,10 @@ class FileDeleterApp(wx.Frame):
             return
         
         # 显示确认对话框
-        total_size = sum(f['size'] for f in self.files_to_delete)
-        size_kb = total_size / 1024
-        size_str = f"{size_kb:.1f} KB" if size_kb < 1024 else f"{size_kb/1024:.1f} MB"
+        size_str = format_size(self.files_to_delete.total_size)
         
-        file_list = "\n".join([f"• {f['name']}" for f in self.files_to_delete[:10]])  # 只显示前10个
+        files = self.files_to_delete
+        file_list = "\n".join([f"• {files.name(i)}" for i in range(min(10, len(files)))])  # 只显示前10个
         if len(self.files_to_delete) > 10:
             file_list += f"\n• ... 还有 {len(self.files_to_delete) - 10} 个文件"
         
@@ -286,61 +260,71 @@ class FileDeleterApp(wx.Frame):
         dlg.Destroy()
     
     def perform_deletion(self):
-        """执行实际的删除操作"""
+        """在后台线程中执行实际的删除操作"""
         self.log("开始删除文件...")
+        self.scan_btn.Disable()
+        self.delete_btn.Disable()
         
-        success_count = 0
-        error_count = 0
+        self.deletion_job = DeletionJob(
+            self.files_to_delete, use_recycle=False,
+            on_progress=lambda progress: wx.CallAfter(self.on_deletion_progress, progress),
+            on_done=lambda progress, cancelled: wx.CallAfter(self.on_deletion_done, progress, cancelled)
+        )
+        self.deletion_job.start()
+    
+    def on_deletion_progress(self, progress):
+        """显示删除进度（主线程）"""
+        self.stats_text.SetLabel(f"正在删除: {progress.processed}/{progress.total_files} 个文件，"
+                                 f"失败 {progress.failed}")
+    
+    def on_deletion_done(self, progress, cancelled):
+        """删除任务结束（主线程）"""
+        self.deletion_job = None
+        self.scan_btn.Enable()
         
-        for file_info in self.files_to_delete:
-            try:
-                os.remove(file_info['path'])
-                self.log(f"✓ 删除成功: {file_info['name']}")
-                success_count += 1
-                
-            except PermissionError:
-                self.log(f"❌ 权限不足，无法删除: {file_info['name']}", logging.ERROR)
-                error_count += 1
-                
-            except FileNotFoundError:
-                self.log(f"❌ 文件不存在: {file_info['name']}", logging.WARNING)
-                error_count += 1
-                
-            except Exception as e:
-                self.log(f"❌ 删除失败 {file_info['name']}: {str(e)}", logging.ERROR)
-                error_count += 1
+        for kind, count in progress.error_counts.items():
+            self.log(f"❌ {kind}: {count} 个文件", logging.ERROR)
+        for path, kind, message in progress.errors[:50]:
+            self.log(f"❌ {kind} {path}: {message}", logging.ERROR)
         
         # 显示结果
-        message = f"删除操作完成！\\n\\n"
-        message += f"成功删除: {success_count} 个文件\\n"
-        message += f"删除失败: {error_count} 个文件"
+        message = f"删除操作完成！\n\n"
+        message += f"成功删除: {progress.success} 个文件\n"
+        message += f"删除失败: {progress.failed} 个文件"
         
         wx.MessageBox(message, "删除完成", wx.OK | 
-                     (wx.ICON_INFORMATION if error_count == 0 else wx.ICON_WARNING))
+                     (wx.ICON_INFORMATION if progress.failed == 0 else wx.ICON_WARNING))
         
         # 清空文件列表
         self.files_list.DeleteAllItems()
-        self.files_to_delete = []
+        self.files_to_delete = ScanResults()
         self.delete_btn.Disable()
         self.update_stats()
         
-        self.log(f"删除操作完成 - 成功: {success_count}, 失败: {error_count}")
+        self.log(f"删除操作完成 - 成功: {progress.success}, 失败: {progress.failed}")
     
     def on_file_selected(self, event):
         """文件列表项被选中"""
         index = event.GetIndex()
         if 0 <= index < len(self.files_to_delete):
-            file_info = self.files_to_delete[index]
-            self.log(f"选中文件: {file_info['name']} ({file_info['size']} 字节)")
+            files = self.files_to_delete
+            self.log(f"选中文件: {files.name(index)} ({files.size(index)} 字节)")
     
     def on_clear_log(self, event):
         """清空日志"""
+        self.log_buffer.clear()
         self.log_text.Clear()
+        self.log_lines_shown = 0
         self.log("日志已清空")
     
     def on_close(self, event):
         """关闭应用程序"""
+        if self.deletion_job is not None:
+            self.deletion_job.cancel()
         self.log("应用程序关闭")
+        self.log_timer.Stop()
+        self.on_flush_log()
+        self.log_listener.stop()
         self.Destroy()
 
 def main():
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件筛选规则 - 预编译的匹配管道
+功能：把名称通配符、正则表达式、后缀集合、无后缀、大小范围、修改时间、隐藏/系统属性等规则
+      编译成一个谓词；只看文件名的廉价规则先执行，只有名称规则全部通过且仍有大小/时间/属性
+      规则需要检查时才使用 stat 数据，使大多数文件不产生任何额外系统调用即被排除
+"""
+
+import os
+import re
+import time
+import fnmatch
+
+from scan_engine import build_suffix_matcher, is_no_extension_name
+
+FILE_ATTRIBUTE_HIDDEN = 0x2
+FILE_ATTRIBUTE_SYSTEM = 0x4
+
+_IS_WINDOWS = os.name == 'nt'
+
+
+class FilterRules:
+    """一组筛选规则；同一类规则内任一满足即可，不同类规则之间须同时满足
+
+    - name_globs: 文件名通配符，如 ["*.tmp", "~$*"]
+    - regexes: 对文件名做 re.search 的正则表达式
+    - extensions: 后缀列表，如 [".log", ".tar.gz"]
+    - no_extension: 只匹配无后缀文件（排除常见系统文件）
+    - min_size / max_size: 字节数范围（含边界），None 表示不限
+    - older_than_days / newer_than_days: 按修改时间筛选，None 表示不限
+    - include_hidden / include_system: 是否包含隐藏 / 系统文件
+    """
+
+    def __init__(self, name_globs=(), regexes=(), extensions=(), no_extension=False,
+                 min_size=None, max_size=None, older_than_days=None, newer_than_days=None,
+                 include_hidden=True, include_system=True):
+        self.name_globs = [g for g in name_globs if g]
+        self.regexes = [r for r in regexes if r]
+        self.extensions = [e for e in extensions if e]
+        self.no_extension = no_extension
+        self.min_size = min_size
+        self.max_size = max_size
+        self.older_than_days = older_than_days
+        self.newer_than_days = newer_than_days
+        self.include_hidden = include_hidden
+        self.include_system = include_system
+
+
+class CompiledFilter:
+    """编译后的筛选谓词
+
+    本身可作为名称匹配函数调用：filter(name) 只检查名称规则；
+    match_stat(name, size, mtime, attributes) 检查依赖 stat 的规则，没有此类规则时为 None。
+    """
+
+    def __init__(self, rules, now=None):
+        self.rules = rules
+        name_checks = []
+
+        if rules.extensions:
+            name_checks.append(build_suffix_matcher(rules.extensions))
+        if rules.no_extension:
+            name_checks.append(is_no_extension_name)
+        if rules.name_globs:
+            flags = re.IGNORECASE if _IS_WINDOWS else 0
+            pattern = "|".join(f"(?:{fnmatch.translate(g)})" for g in rules.name_globs)
+            name_checks.append(re.compile(pattern, flags).match)
+        if rules.regexes:
+            compiled = [re.compile(r) for r in rules.regexes]
+            if len(compiled) == 1:
+                name_checks.append(compiled[0].search)
+            else:
+                name_checks.append(lambda name: any(r.search(name) for r in compiled))
+        if not rules.include_hidden and not _IS_WINDOWS:
+            # 非 Windows 平台上以点开头即为隐藏文件，只看名称即可判断
+            name_checks.append(lambda name: not name.startswith('.'))
+        self._name_checks = tuple(name_checks)
+
+        now = time.time() if now is None else now
+        self.now = now
+        self._mtime_max = now - rules.older_than_days * 86400 if rules.older_than_days is not None else None
+        self._mtime_min = now - rules.newer_than_days * 86400 if rules.newer_than_days is not None else None
+
+        attr_mask = 0
+        if _IS_WINDOWS and not rules.include_hidden:
+            attr_mask |= FILE_ATTRIBUTE_HIDDEN
+        if _IS_WINDOWS and not rules.include_system:
+            attr_mask |= FILE_ATTRIBUTE_SYSTEM
+        self._attr_mask = attr_mask
+
+        self.needs_stat = (rules.min_size is not None or rules.max_size is not None
+                           or self._mtime_max is not None or self._mtime_min is not None
+                           or attr_mask != 0)
+        self.match_stat = self._match_stat if self.needs_stat else None
+
+    def __call__(self, name):
+        for check in self._name_checks:
+            if not check(name):
+                return False
+        return True
+
+    def _match_stat(self, name, size, mtime, attributes=0):
+        rules = self.rules
+        if rules.min_size is not None and size < rules.min_size:
+            return False
+        if rules.max_size is not None and size > rules.max_size:
+            return False
+        if self._mtime_max is not None and mtime > self._mtime_max:
+            return False
+        if self._mtime_min is not None and mtime < self._mtime_min:
+            return False
+        if self._attr_mask and attributes & self._attr_mask:
+            return False
+        return True
+
+
+def compile_filter(rules, now=None):
+    """把 FilterRules 编译为 CompiledFilter"""
+    return CompiledFilter(rules, now)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录监视 - 不依赖wx的实时监视模式
+功能：完成一次初始扫描后持续监视目录树，使匹配结果保持最新而无需重新扫描。
+      Linux 上通过 ctypes 调用 inotify：每个目录在列出之前先加监视，不会漏掉扫描期间的变化；
+      事件在 coalesce_delay 秒内合并，只重新列出有匹配文件增删改的目录，新建的子目录单独遍历，
+      删除或移走的子目录直接从结果中去掉。
+      inotify 不可用、监视数超过系统上限（fs.inotify.max_user_watches，ENOSPC）或实例数用完时，
+      改为每 poll_interval 秒一次借助 ScanIndex 的增量重扫。
+
+注意：增量重扫按目录 mtime 判断是否需要重新列出，只能发现文件的增删和改名，
+      已有文件的大小变化要等到其所在目录本身发生变化时才会更新。
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from scan_engine import iter_matching_files, scan_directory, ScanStats
+
+# 事件合并窗口：第一个事件到达后等待这么久再统一处理
+COALESCE_DELAY = 1.0
+
+# 回退到增量重扫时的重扫间隔
+POLL_INTERVAL = 30.0
+
+MODE_INOTIFY = 'inotify'
+MODE_POLL = 'poll'
+
+# inotify 常量（<sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+# 这些错误表示监视资源已用完，只能改用增量重扫
+_LIMIT_ERRNOS = (errno.ENOSPC, errno.EMFILE, errno.ENFILE, errno.ENOMEM)
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _load_libc():
+    """加载带 inotify 函数的 libc；不可用时返回 None"""
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith('linux'):
+            try:
+                import ctypes
+                import ctypes.util
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc or None
+
+
+def inotify_available():
+    return _load_libc() is not None
+
+
+class Inotify:
+    """inotify 实例的最小封装：非阻塞读取，事件为 (wd, mask, cookie, 名称)"""
+
+    def __init__(self):
+        libc = _load_libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "当前平台不支持 inotify")
+        import ctypes
+        self._ctypes = ctypes
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+
+    def _raise(self, path=None):
+        code = self._ctypes.get_errno()
+        raise OSError(code, os.strerror(code), path)
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self._raise(path)
+        return wd
+
+    def rm_watch(self, wd):
+        # 目录已删除时内核已自动移除监视，返回的 EINVAL 无需处理
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def wait(self, timeout):
+        """等待事件可读，返回是否有事件"""
+        return bool(select.select([self.fd], [], [], timeout)[0])
+
+    def read_events(self):
+        """读出当前排队的全部事件"""
+        events = []
+        unpack = _EVENT_HEADER.unpack_from
+        header_size = _EVENT_HEADER.size
+        while True:
+            try:
+                data = os.read(self.fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = unpack(data, offset)
+                offset += header_size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class WatchJob:
+    """一次初始扫描后持续监视目录树，使匹配结果保持最新
+
+    初始扫描阶段的接口与 ScanJob 相同：on_batch(rows) 分批交出结果，结束时调用 on_done(cancelled, error)。
+    之后进入监视阶段，每批合并后的变化以 on_change({目录: 该目录当前的全部匹配行}) 交出
+    （空列表表示该目录已无匹配文件），改用增量重扫时调用 on_fallback(原因)，监视结束时调用 on_stopped(error)。
+    所有回调都在工作线程中调用，GUI 侧应自行通过 wx.CallAfter 转回主线程。
+    metrics 为本次扫描的 PerfMetrics，只随任务保存供调用方读取；scan_metrics 不为 None 时初始扫描按目录计时。
+    """
+
+    def __init__(self, root, match_name, on_batch, on_done, on_change, on_stopped=None, on_fallback=None,
+                 recursive=True, max_depth=None, whitelist=None, stats=None, metrics=None, scan_metrics=None,
+                 coalesce_delay=COALESCE_DELAY, poll_interval=POLL_INTERVAL, use_inotify=True,
+                 batch_size=2000, flush_interval=0.2):
+        self.root = os.path.abspath(root)
+        self.match_name = match_name
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.on_change = on_change
+        self.on_stopped = on_stopped
+        self.on_fallback = on_fallback
+        self.recursive = recursive
+        self.max_depth = 0 if not recursive else max_depth
+        self.whitelist = whitelist
+        self.stats = stats if stats is not None else ScanStats()
+        self.metrics = metrics
+        self.scan_metrics = scan_metrics
+        self.coalesce_delay = coalesce_delay
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # 与 ScanJob 保持一致的属性：监视模式不使用调用方的扫描索引
+        self.index = None
+        self.mode = MODE_INOTIFY if use_inotify else MODE_POLL
+        self.fallback_reason = None
+        # 初始扫描结束、进入监视阶段后为 True
+        self.ready = False
+        self.updates = 0
+        self.dirs_relisted = 0
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+        self._inotify = None
+        self._dirs = {}       # 已遍历的目录 -> 深度
+        self._rows = {}       # 有匹配文件的目录 -> 当前匹配行
+        self._wd_paths = {}   # wd -> 目录
+        self._path_wds = {}   # 目录 -> wd
+
+    def start(self):
+        """启动后台线程（初始扫描 + 监视）"""
+        self.thread = threading.Thread(target=self._run, name="WatchJob", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """停止扫描或监视"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    @property
+    def watched_dirs(self):
+        return len(self._path_wds)
+
+    def _run(self):
+        error = None
+        if self.use_inotify:
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                self._fall_back(f"无法使用 inotify（{e.strerror}）")
+        try:
+            self._initial_scan()
+        except Exception as e:
+            error = e
+        self.ready = True
+        self.on_done(self.cancel_event.is_set(), error)
+
+        if error is None and not self.cancel_event.is_set():
+            try:
+                if self.mode == MODE_INOTIFY:
+                    self._watch_loop()
+                if self.mode == MODE_POLL:
+                    self._poll_loop()
+            except Exception as e:
+                error = e
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self.on_stopped is not None:
+            self.on_stopped(error)
+
+    def _fall_back(self, reason):
+        """放弃 inotify，改为定期增量重扫"""
+        if self.mode == MODE_POLL:
+            return
+        self.mode = MODE_POLL
+        self.fallback_reason = reason
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._wd_paths.clear()
+        self._path_wds.clear()
+        if self.on_fallback is not None:
+            self.on_fallback(reason)
+
+    def _add_watch(self, directory):
+        if self._inotify is None:
+            return
+        try:
+            wd = self._inotify.add_watch(directory)
+        except OSError as e:
+            if e.errno in _LIMIT_ERRNOS:
+                self._fall_back(f"inotify 监视数已达系统上限（{e.strerror}）")
+            # 其他错误（目录已消失、无权限）：列出目录时会得到同样的错误
+            return
+        self._wd_paths[wd] = directory
+        self._path_wds[directory] = wd
+
+    def _descend(self, depth):
+        return self.recursive and (self.max_depth is None or depth < self.max_depth)
+
+    def _walk(self, top, depth):
+        """遍历子树：先加监视再列出目录，产出 (目录, 匹配行)；顺序与 iter_matching_files 相同"""
+        stats = self.stats
+        stack = [(top, depth)]
+        while stack:
+            if self.cancel_event.is_set():
+                return
+            directory, depth = stack.pop()
+            self._add_watch(directory)
+            try:
+                hits, subdirs, skipped, errors = scan_directory(
+                    directory, self.match_name, self._descend(depth), self.whitelist, self.scan_metrics)
+            except OSError:
+                self._forget_watch(directory)
+                if directory == self.root:
+                    raise
+                stats.errors += 1
+                continue
+            stats.dirs_scanned += 1
+            stats.dirs_skipped += skipped
+            stats.errors += errors
+            self._dirs[directory] = depth
+            if hits:
+                self._rows[directory] = hits
+            else:
+                self._rows.pop(directory, None)
+            yield directory, hits
+            for subdir in reversed(subdirs):
+                stack.append((subdir, depth + 1))
+
+    def _initial_scan(self):
+        if self.whitelist and self.whitelist.matches_path(self.root):
+            self.stats.dirs_skipped += 1
+            return
+        batch = []
+        last_flush = time.monotonic() - self.flush_interval
+        for directory, hits in self._walk(self.root, 0):
+            if not hits:
+                continue
+            batch.extend(hits)
+            if len(batch) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                self.on_batch(batch)
+                batch = []
+                last_flush = time.monotonic()
+        if batch:
+            self.on_batch(batch)
+
+    def _forget_watch(self, directory):
+        wd = self._path_wds.pop(directory, None)
+        if wd is not None:
+            self._wd_paths.pop(wd, None)
+            if self._inotify is not None:
+                self._inotify.rm_watch(wd)
+
+    def _forget_subtree(self, path, changes):
+        """目录被删除或移走：去掉其整棵子树的监视和结果"""
+        prefix = os.path.join(path, '')
+        for directory in [d for d in self._dirs if d == path or d.startswith(prefix)]:
+            del self._dirs[directory]
+            self._forget_watch(directory)
+            if self._rows.pop(directory, None):
+                changes[directory] = []
+
+    def _watch_loop(self):
+        inotify = self._inotify
+        dirty = set()
+        removed = set()
+        created = {}
+        deadline = None
+        while not self.cancel_event.is_set() and self.mode == MODE_INOTIFY:
+            timeout = 0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic()))
+            if inotify.wait(timeout):
+                self._collect(inotify.read_events(), dirty, removed, created)
+                if deadline is None and (dirty or removed or created):
+                    deadline = time.monotonic() + self.coalesce_delay
+            if deadline is not None and time.monotonic() >= deadline:
+                self._flush(dirty, removed, created)
+                dirty, removed, created = set(), set(), {}
+                deadline = None
+
+    def _collect(self, events, dirty, removed, created):
+        """把一批事件归并为：需重新列出的目录、已消失的子树、新出现的子树"""
+        match_name = self.match_name
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # 内核事件队列溢出，丢失的事件无法得知，重新列出全部已监视目录（不重新遍历）
+                dirty.update(self._dirs)
+                continue
+            directory = self._wd_paths.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_paths.pop(wd, None)
+                if self._path_wds.get(directory) == wd:
+                    del self._path_wds[directory]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # 子目录的消失由父目录的事件处理；只有扫描根目录本身需要在这里处理
+                if directory == self.root:
+                    removed.add(directory)
+                continue
+            if not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    removed.add(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    depth = self._dirs.get(directory)
+                    if (depth is not None and self._descend(depth)
+                            and not (self.whitelist and self.whitelist.matches_name(name))):
+                        created[path] = depth + 1
+            elif match_name(name):
+                dirty.add(directory)
+
+    def _flush(self, dirty, removed, created):
+        """处理合并后的一批变化并交出结果"""
+        changes = {}
+        for path in removed:
+            self._forget_subtree(path, changes)
+        if self.root not in self._dirs:
+            if changes:
+                self.on_change(changes)
+            raise FileNotFoundError(errno.ENOENT, "扫描目录已被删除或移走", self.root)
+        for path, depth in created.items():
+            if path in self._dirs:
+                self._forget_subtree(path, changes)
+            for directory, hits in self._walk(path, depth):
+                if hits or directory in changes:
+                    changes[directory] = hits
+        for directory in dirty:
+            if directory not in self._dirs or directory in created:
+                continue
+            try:
+                hits = scan_directory(directory, self.match_name, False, self.whitelist)[0]
+            except OSError:
+                # 目录已消失：其父目录的删除事件会处理
+                continue
+            self.dirs_relisted += 1
+            if hits != self._rows.get(directory, []):
+                if hits:
+                    self._rows[directory] = hits
+                else:
+                    del self._rows[directory]
+                changes[directory] = hits
+        if changes:
+            self.updates += 1
+            self.on_change(changes)
+
+    def _poll_loop(self):
+        """增量重扫：按目录比较结果，只交出发生变化的目录"""
+        index = None
+        try:
+            from scan_index import ScanIndex
+            index = ScanIndex()
+        except Exception:
+            index = None
+        try:
+            while not self.cancel_event.wait(self.poll_interval):
+                current = {}
+                for hit in iter_matching_files(self.root, self.match_name, self.recursive, self.max_depth,
+                                               self.cancel_event, self.whitelist, index=index):
+                    rows = current.get(hit[0])
+                    if rows is None:
+                        rows = current[hit[0]] = []
+                    rows.append(hit)
+                if self.cancel_event.is_set():
+                    break
+                changes = {d: rows for d, rows in current.items() if self._rows.get(d) != rows}
+                changes.update((d, []) for d in self._rows if d not in current)
+                self._rows = current
+                if index is not None:
+                    self.dirs_relisted += index.relisted
+                    index.relisted = 0
+                    index.flush()
+                if changes:
+                    self.updates += 1
+                    self.on_change(changes)
+        finally:
+            if index is not None:
+                index.close()
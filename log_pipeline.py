@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志管道 - 不依赖wx的异步日志
+功能：文件/控制台输出通过 QueueHandler/QueueListener 放到后台线程，调用方不再同步写磁盘；
+      界面日志先进入线程安全的待显示队列，由界面定时器合并成批写入，并用环形缓冲限制总行数
+"""
+
+import collections
+import logging
+import logging.handlers
+import queue
+import time
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 各级别在界面日志中的前缀
+LEVEL_PREFIXES = {
+    logging.WARNING: "⚠️ ",
+    logging.ERROR: "❌ ",
+    logging.CRITICAL: "💥 ",
+}
+
+
+class TimedFileHandler(logging.FileHandler):
+    """把每次写文件的耗时累计到 PerfMetrics 的 log_io 计时项"""
+
+    def __init__(self, filename, metrics, encoding=None):
+        super().__init__(filename, encoding=encoding)
+        self.metrics = metrics
+
+    def emit(self, record):
+        started = time.perf_counter()
+        super().emit(record)
+        self.metrics.add_time('log_io', time.perf_counter() - started)
+
+
+def setup_queue_logging(log_file, level=logging.INFO, metrics=None):
+    """把根日志器接到队列上，返回已启动的 QueueListener（退出前应调用其 stop() 刷新剩余记录）
+
+    metrics 为 PerfMetrics 时记录日志文件写入耗时。
+    """
+    if metrics is not None:
+        file_handler = TimedFileHandler(log_file, metrics, encoding='utf-8')
+    else:
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    stream_handler = logging.StreamHandler()
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler.setFormatter(formatter)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    return listener
+
+
+class LogBuffer:
+    """界面日志缓冲
+
+    任意线程调用 append() 只做一次 deque 追加；界面定时器调用 drain() 一次性取走
+    全部待显示行。lines 保存最近 max_lines 行，供界面在超出上限时整体重建文本。
+    """
+
+    def __init__(self, max_lines=5000):
+        self.max_lines = max_lines
+        self.pending = collections.deque()
+        self.lines = collections.deque(maxlen=max_lines)
+
+    def append(self, line):
+        self.pending.append(line)
+
+    def drain(self):
+        """取走全部待显示行（只保留最后 max_lines 行），同时写入环形缓冲"""
+        batch = []
+        pending = self.pending
+        while pending:
+            try:
+                batch.append(pending.popleft())
+            except IndexError:
+                break
+        if len(batch) > self.max_lines:
+            batch = batch[-self.max_lines:]
+        self.lines.extend(batch)
+        return batch
+
+    def clear(self):
+        self.pending.clear()
+        self.lines.clear()
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能计量 - 不依赖wx的分阶段计时、计数与运行报告
+功能：扫描和删除引擎在收到 PerfMetrics 时按目录（而不是按文件）累计各阶段耗时和计数，
+      界面据此显示实时速率，并在每次扫描/删除结束后写出 JSON 报告；
+      ProfileSession 可按需同时采集 cProfile（含后台线程）和 tracemalloc 数据
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+# 各计时项的含义，写入报告便于阅读
+TIMER_DESCRIPTIONS = {
+    'list_dir': "目录枚举（scandir 或读取索引缓存）",
+    'whitelist': "白名单检查",
+    'rules': "筛选规则求值",
+    'stat': "stat 调用",
+    'gui_population': "界面列表填充",
+    'delete': "永久删除调用",
+    'trash': "移入回收站调用",
+    'rmtree': "整棵删除完全命中的子目录",
+    'rmdir': "删除后清理空目录",
+    'log_io': "日志文件写入",
+    'journal': "删除日志写入与 fsync",
+    'dupe_group_size': "重复文件：扫描并按大小分组",
+    'dupe_identity': "重复文件：stat 并合并硬链接",
+    'dupe_partial_hash': "重复文件：首尾字节哈希",
+    'dupe_full_hash': "重复文件：全文哈希",
+    'retention_plan': "保留策略：扫描并生成删除计划",
+}
+
+
+# 扫描每个目录都要累计的计时项和计数项，放在每线程一个的 ScanAccumulator 中
+SCAN_TIMERS = ('list_dir', 'whitelist', 'rules', 'stat')
+SCAN_COUNTERS = ('dirs', 'files', 'stat_calls', 'hits', 'bytes', 'dirs_whitelisted')
+
+
+class ScanAccumulator:
+    """单个扫描线程的累加器：只由所属线程写入，不加锁；读取方容忍略微过时的值"""
+
+    __slots__ = SCAN_TIMERS + SCAN_COUNTERS
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+
+class PerfMetrics:
+    """线程安全的计时器与计数器集合
+
+    add_time(name, seconds) 累计耗时和调用次数；incr(name, n) 累计计数。
+    扫描的逐目录计量写入 scan_accumulator() 返回的每线程累加器，避免每个目录加一次锁。
+    扫描累计 files（检查过的文件数）/ bytes（命中文件的字节数），
+    删除累计 files_deleted / bytes_deleted / files_failed，界面用它们计算实时速率。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._scan_accumulators = []
+        self.timers = {}
+        self.calls = {}
+        self.counters = {}
+        self.started = time.monotonic()
+        self.finished = None
+
+    def scan_accumulator(self):
+        """返回当前线程的 ScanAccumulator（首次调用时创建并登记）"""
+        acc = getattr(self._local, 'scan', None)
+        if acc is None:
+            acc = self._local.scan = ScanAccumulator()
+            with self._lock:
+                self._scan_accumulators.append(acc)
+        return acc
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + calls
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, timings, counts):
+        """一次加锁合并一个目录的多项耗时和计数"""
+        with self._lock:
+            timers = self.timers
+            calls = self.calls
+            for name, seconds in timings:
+                timers[name] = timers.get(name, 0.0) + seconds
+                calls[name] = calls.get(name, 0) + 1
+            counters = self.counters
+            for name, n in counts:
+                counters[name] = counters.get(name, 0) + n
+
+    def timer(self, name):
+        """with metrics.timer('xxx'): ... 形式的计时"""
+        return _Timer(self, name)
+
+    def counter(self, name):
+        with self._lock:
+            value = self.counters.get(name, 0)
+            if name in SCAN_COUNTERS:
+                for acc in self._scan_accumulators:
+                    value += getattr(acc, name)
+        return value
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.monotonic()
+
+    @property
+    def elapsed(self):
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    def snapshot(self):
+        """返回 {'timers': {名称: {'seconds', 'calls'}}, 'counters': {...}} 的副本"""
+        seconds, calls, counters = self._merged()
+        timers = {name: {'seconds': round(value, 6), 'calls': calls.get(name, 0)}
+                  for name, value in seconds.items()}
+        return {'timers': timers, 'counters': counters}
+
+    def _merged(self):
+        """合并共享字典与各线程累加器，返回 (耗时, 调用次数, 计数) 三个字典"""
+        with self._lock:
+            seconds = dict(self.timers)
+            calls = dict(self.calls)
+            counters = dict(self.counters)
+            accumulators = list(self._scan_accumulators)
+        if accumulators:
+            dirs = sum(acc.dirs for acc in accumulators)
+            for name in SCAN_TIMERS:
+                seconds[name] = seconds.get(name, 0.0) + sum(getattr(acc, name) for acc in accumulators)
+                calls[name] = calls.get(name, 0) + dirs
+            for name in SCAN_COUNTERS:
+                counters[name] = counters.get(name, 0) + sum(getattr(acc, name) for acc in accumulators)
+        return seconds, calls, counters
+
+    def summary_line(self, top=4):
+        """耗时最多的几项，供写入日志"""
+        items = sorted(self._merged()[0].items(), key=lambda item: item[1], reverse=True)[:top]
+        return ", ".join(f"{name} {seconds:.3f}s" for name, seconds in items)
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.add_time(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class RateMeter:
+    """根据计数器的增量计算实时速率（每次 sample() 与上一次比较）"""
+
+    def __init__(self):
+        self._last = None
+
+    def sample(self, files, bytes_done):
+        """返回 (文件/秒, 字节/秒)；第一次调用返回 (0, 0)"""
+        now = time.monotonic()
+        last = self._last
+        self._last = (now, files, bytes_done)
+        if last is None or now <= last[0]:
+            return 0.0, 0.0
+        dt = now - last[0]
+        return (files - last[1]) / dt, (bytes_done - last[2]) / dt
+
+    def reset(self):
+        self._last = None
+
+
+def reports_dir():
+    """运行报告所在目录（用户缓存目录下的 reports）"""
+    from app_paths import user_cache_dir
+    path = os.path.join(user_cache_dir(), 'reports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def build_report(kind, metrics, extra=None):
+    """组装一次运行的报告字典"""
+    metrics.finish()
+    snapshot = metrics.snapshot()
+    elapsed = metrics.elapsed
+    counters = snapshot['counters']
+    report = {
+        'kind': kind,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'elapsed': round(elapsed, 6),
+        'timers': snapshot['timers'],
+        'counters': counters,
+        'timer_descriptions': {name: TIMER_DESCRIPTIONS[name]
+                               for name in snapshot['timers'] if name in TIMER_DESCRIPTIONS},
+    }
+    if elapsed > 0:
+        for key in ('files', 'bytes', 'files_deleted', 'bytes_deleted'):
+            if key in counters:
+                report[f'{key}_per_second'] = round(counters[key] / elapsed, 1)
+    if extra:
+        report.update(extra)
+    return report
+
+
+def write_report(kind, metrics, extra=None, directory=None):
+    """把报告写成 JSON 文件，返回文件路径"""
+    report = build_report(kind, metrics, extra)
+    directory = directory or reports_dir()
+    now = time.time()
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+    path = os.path.join(directory, f"{kind}-{stamp}-{int(now * 1000) % 1000:03d}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+class ProfileSession:
+    """按需开启的 cProfile + tracemalloc 采集
+
+    cProfile 只统计调用 enable() 的线程，因此 start() 之后新建的线程（扫描、删除工作线程）
+    通过 threading.setprofile 各自挂上一个 Profile，stop() 时合并全部数据。
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self._profiles = []
+        self._lock = threading.Lock()
+        self.active = False
+
+    def start(self):
+        import cProfile
+        import tracemalloc
+        self._cProfile = cProfile
+        main_profile = cProfile.Profile()
+        self._profiles = [main_profile]
+        self.active = True
+        threading.setprofile(self._thread_hook)
+        main_profile.enable()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+
+    def _thread_hook(self, frame, event, arg):
+        # 新线程启动时调用一次：为该线程换上自己的 Profile（enable 会替换这个钩子）
+        profile = self._cProfile.Profile()
+        with self._lock:
+            if not self.active:
+                sys.setprofile(None)
+                return
+            self._profiles.append(profile)
+        profile.enable()
+
+    def stop(self, directory=None, top=40):
+        """停止采集，写出 .prof 和文本摘要，返回 (prof 路径, 摘要路径)"""
+        import io
+        import pstats
+        import tracemalloc
+
+        with self._lock:
+            self.active = False
+            profiles = list(self._profiles)
+        threading.setprofile(None)
+        profiles[0].disable()
+
+        stats = None
+        for profile in profiles:
+            try:
+                profile.create_stats()
+            except Exception:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+
+        directory = directory or reports_dir()
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        prof_path = os.path.join(directory, f"profile-{stamp}.prof")
+        text_path = os.path.join(directory, f"profile-{stamp}.txt")
+
+        out = io.StringIO()
+        if stats is not None:
+            stats.dump_stats(prof_path)
+            stats.stream = out
+            out.write(f"== cProfile（{len(profiles)} 个线程，按累计耗时排序）==\n")
+            stats.sort_stats('cumulative').print_stats(top)
+        else:
+            prof_path = None
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            out.write(f"\n== tracemalloc：当前 {current / 1024:.1f} KB，峰值 {peak / 1024:.1f} KB ==\n")
+            for stat in snapshot.statistics('lineno')[:top]:
+                out.write(f"{stat}\n")
+
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+        return prof_path, text_path
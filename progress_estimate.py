@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进度估算 - 不依赖wx的扫描总量估计与剩余时间计算
+功能：扫描开始前用廉价来源估计目录树的目录数（上次扫描同一目录记录的总数、扫描索引中缓存的目录数），
+      扫描过程中按已扫描目录数与平均速率计算进度和剩余时间；删除的总量已知，直接按文件数计算
+
+注意：进度以目录数为单位，是因为遍历本来就为每个目录累计 ScanStats.dirs_scanned，
+      读取它不增加任何开销；按文件计数需要在逐文件的热路径上额外累加。
+      statvfs 的已用 inode 数覆盖整个文件系统且包含文件，无法换算成目录数，因此不使用。
+"""
+
+import json
+import os
+import threading
+import time
+
+# 已处理量超过估计总量时，进度停在该比例，等待扫描真正结束
+MAX_FRACTION_BEFORE_DONE = 0.99
+
+# 已完成比例低于该值时速率还不稳定，不给出剩余时间
+MIN_FRACTION_FOR_ETA = 0.02
+
+
+class ScanTotalsCache:
+    """上次完整扫描各目录得到的目录数，保存在用户缓存目录的 JSON 文件中"""
+
+    MAX_ENTRIES = 200
+
+    def __init__(self, path=None):
+        if path is None:
+            from app_paths import user_cache_dir
+            path = os.path.join(user_cache_dir(), 'scan_totals.json')
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = None
+
+    @staticmethod
+    def key(root, recursive=True, max_depth=None):
+        return f"{os.path.abspath(root)}|{int(bool(recursive))}|{max_depth if max_depth is not None else ''}"
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def get(self, key):
+        """返回 {'dirs': 目录数, 'time': 记录时间}，没有记录时返回 None"""
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key, dirs):
+        with self._lock:
+            data = self._load()
+            data[key] = {'dirs': dirs, 'time': time.time()}
+            if len(data) > self.MAX_ENTRIES:
+                # 只保留最近使用的记录
+                newest = sorted(data.items(), key=lambda item: item[1].get('time', 0), reverse=True)
+                self._data = data = dict(newest[:self.MAX_ENTRIES])
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+
+
+class ScanEstimate:
+    """扫描规模的估计：total 为估计的目录数，source 为来源；total 为 None 表示无法估计"""
+
+    def __init__(self, total=None, source=None):
+        self.total = total
+        self.source = source
+
+    def __bool__(self):
+        return bool(self.total)
+
+
+def estimate_scan_total(root, totals_cache=None, cache_key=None, index=None):
+    """按成本从低到高依次尝试各个来源，返回 ScanEstimate
+
+    1. 上次扫描同一目录（相同递归选项）记录的目录数
+    2. 扫描索引中该目录下缓存的目录数
+    """
+    if totals_cache is not None and cache_key is not None:
+        previous = totals_cache.get(cache_key)
+        if previous and previous.get('dirs'):
+            return ScanEstimate(previous['dirs'], 'previous_run')
+
+    if index is not None:
+        try:
+            count = index.count_dirs_under(os.path.abspath(root))
+        except Exception:
+            count = 0
+        if count:
+            return ScanEstimate(count, 'index')
+    return ScanEstimate()
+
+
+class ProgressTracker:
+    """根据已处理量和估计总量计算完成比例与剩余时间
+
+    update() 由界面定时器按固定频率调用，只做几次算术运算。
+    """
+
+    def __init__(self, total=None):
+        self.total = total
+        self.started = time.monotonic()
+        self.done = 0
+
+    def restart(self, total):
+        """进入总量不同的新阶段时重新计时"""
+        self.total = total
+        self.started = time.monotonic()
+        self.done = 0
+
+    def update(self, done):
+        """记录已处理量，返回 (完成比例或None, 剩余秒数或None)"""
+        self.done = done
+        if not self.total:
+            return None, None
+        fraction = min(done / self.total, MAX_FRACTION_BEFORE_DONE)
+        if fraction < MIN_FRACTION_FOR_ETA:
+            return fraction, None
+        elapsed = time.monotonic() - self.started
+        return fraction, elapsed * (1 - fraction) / fraction
+
+
+def format_eta(seconds):
+    """把剩余秒数格式化为 1:02:03 / 2:05 / 12 秒"""
+    if seconds is None:
+        return "估算中"
+    seconds = int(seconds + 0.5)
+    if seconds < 60:
+        return f"{seconds} 秒"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}:{seconds:02d}"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
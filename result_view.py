@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果视图 - 不依赖wx的排序与即时筛选
+功能：在 ScanResults 之上维护"视图行 -> 结果表行号"的映射，排序和筛选都不复制或改动结果表；
+      按列排序时对整列做一次 argsort，结果按列缓存为紧凑的行号数组，切换升降序只需反转；
+      按文件名或路径筛选时复用之前的匹配集合：新查询包含某个已缓存的查询时只在其结果中继续筛选，
+      删除字符回到较短的查询时直接取回缓存，因此逐键输入的开销随匹配行数而非总行数增长
+"""
+
+import os
+from array import array
+
+COLUMN_NAME = 0
+COLUMN_SIZE = 1
+COLUMN_MTIME = 2
+COLUMN_PATH = 3
+
+# 最多缓存的查询结果数
+MATCH_CACHE_SIZE = 16
+
+# 匹配行数不到总行数的 1/SUBSET_SORT_RATIO 时直接对匹配行排序，否则按整列的排序结果过滤
+SUBSET_SORT_RATIO = 8
+
+_SEPARATORS = tuple(sep for sep in (os.sep, os.altsep) if sep)
+
+
+def is_path_query(query):
+    """含路径分隔符的查询匹配完整路径，否则只匹配文件名"""
+    return any(sep in query for sep in _SEPARATORS)
+
+
+class ResultView:
+    """ScanResults 的排序/筛选视图
+
+    rows 为视图行对应的结果表行号；既未排序也未筛选时为 None，视图行即结果表行。
+    结果表增长后调用 sync()：新行按当前查询筛选后追加在末尾，排序状态下 unsorted_tail 置为 True，
+    结果表不再增长时调用 resort() 把它们并入排序。结果表被 replace_directories/clear 重排后，
+    sync() 按当前排序列和查询整体重建。
+    名称和路径不区分大小写；排序相同的行保持结果表中的先后顺序。
+    """
+
+    def __init__(self, files, sort_column=None, ascending=True, query=""):
+        self.files = files
+        self.sort_column = sort_column
+        self.ascending = ascending
+        self.query = self._fold(query)
+        self.rows = None
+        self.unsorted_tail = False
+        self._reset_caches()
+        self._update_rows()
+
+    def __len__(self):
+        return len(self.files) if self.rows is None else len(self.rows)
+
+    def index(self, item):
+        """视图第 item 行在结果表中的行号"""
+        return item if self.rows is None else self.rows[item]
+
+    @staticmethod
+    def _fold(text):
+        return text.strip().lower()
+
+    def _reset_caches(self):
+        self._count = len(self.files)
+        self._generation = self.files.generation
+        self._orders = {}
+        self._folded_names = None
+        self._folded_dirs = None
+        self._row_dir_ranks = None
+        self._matches = {}
+
+    # ---- 排序 ----
+
+    def sort(self, column, ascending=True):
+        """按列排序；column 为 None 时恢复结果表顺序"""
+        self.sort_column = column
+        self.ascending = ascending
+        self._update_rows()
+
+    def resort(self):
+        """把结果表增长期间追加在末尾的行并入当前排序"""
+        if self.unsorted_tail:
+            self._update_rows()
+
+    def _names(self):
+        if self._folded_names is None:
+            self._folded_names = [name.lower() for name in self.files.names]
+        return self._folded_names
+
+    def _dirs(self):
+        """各目录的小写路径（带结尾分隔符，与文件名直接拼接即为完整路径）"""
+        if self._folded_dirs is None:
+            self._folded_dirs = [os.path.join(directory, '').lower() for directory in self.files.dirs]
+        return self._folded_dirs
+
+    def _dir_ranks(self):
+        """每一行所在目录在目录排序中的名次"""
+        if self._row_dir_ranks is None:
+            folded = self._dirs()
+            ranks = [0] * len(folded)
+            for rank, dir_id in enumerate(sorted(range(len(folded)), key=folded.__getitem__)):
+                ranks[dir_id] = rank
+            self._row_dir_ranks = [ranks[dir_id] for dir_id in self.files.dir_ids]
+        return self._row_dir_ranks
+
+    def _argsort(self, rows, column):
+        """把行号列表按列升序排列（稳定排序），返回新列表"""
+        files = self.files
+        full = len(rows) == len(files)
+        if column == COLUMN_SIZE:
+            # 整列排序时先转成列表：取值不再逐次创建整数对象
+            return sorted(rows, key=(files.sizes.tolist() if full else files.sizes).__getitem__)
+        if column == COLUMN_MTIME:
+            return sorted(rows, key=(files.mtimes.tolist() if full else files.mtimes).__getitem__)
+        names = self._names()
+        rows = sorted(rows, key=names.__getitem__)
+        if column == COLUMN_PATH:
+            # 再按目录稳定排序：同一目录内保持文件名顺序
+            rows.sort(key=self._dir_ranks().__getitem__)
+        return rows
+
+    def _order(self, column):
+        """整列的升序行号（按列缓存为 array，每行 4 字节）"""
+        order = self._orders.get(column)
+        if order is None:
+            order = self._orders[column] = array('i')
+            order.fromlist(self._argsort(range(len(self.files)), column))
+        return order
+
+    # ---- 筛选 ----
+
+    def set_query(self, text):
+        """按文件名（查询含路径分隔符时按完整路径）筛选，空查询显示全部"""
+        query = self._fold(text)
+        if query == self.query:
+            return
+        self.query = query
+        self._update_rows()
+
+    def _matching(self, query, rows):
+        """rows（结果表顺序的行号，None 表示全部）中匹配查询的行号列表"""
+        names = self._names()
+        if is_path_query(query):
+            dirs = self._dirs()
+            dir_ids = self.files.dir_ids
+            if rows is None:
+                return [i for i, (dir_id, name) in enumerate(zip(dir_ids, names)) if query in dirs[dir_id] + name]
+            return [i for i in rows if query in dirs[dir_ids[i]] + names[i]]
+        if rows is None:
+            return [i for i, name in enumerate(names) if query in name]
+        return [i for i in rows if query in names[i]]
+
+    def filtered_rows(self):
+        """当前查询匹配的行号（结果表顺序）；没有查询时返回 None"""
+        if not self.query:
+            return None
+        return list(self._matches_for(self.query))
+
+    def _matches_for(self, query):
+        """查询的匹配行号（结果表顺序）；优先在包含于该查询的最长已缓存查询的结果中继续筛选"""
+        matches = self._matches.get(query)
+        if matches is not None:
+            return matches
+        base = None
+        path_query = is_path_query(query)
+        for cached in self._matches:
+            # 名称查询的结果不是路径查询结果的超集
+            if cached in query and (is_path_query(cached) or not path_query):
+                if base is None or len(cached) > len(base):
+                    base = cached
+        matches = self._matching(query, None if base is None else self._matches[base])
+        if len(self._matches) >= MATCH_CACHE_SIZE:
+            del self._matches[next(iter(self._matches))]
+        self._matches[query] = matches
+        return matches
+
+    # ---- 视图行 ----
+
+    def _update_rows(self):
+        self.unsorted_tail = False
+        matches = self._matches_for(self.query) if self.query else None
+        column = self.sort_column
+        if column is None:
+            self.rows = matches
+            return
+        if matches is None:
+            order = self._order(column)
+            self.rows = order if self.ascending else order[::-1]
+            return
+        if len(matches) * SUBSET_SORT_RATIO < len(self.files):
+            rows = self._argsort(matches, column)
+        else:
+            selected = bytearray(len(self.files))
+            for i in matches:
+                selected[i] = 1
+            rows = [i for i in self._order(column) if selected[i]]
+        if not self.ascending:
+            rows.reverse()
+        self.rows = rows
+
+    def sync(self):
+        """结果表增长或被重排后同步视图"""
+        files = self.files
+        count = len(files)
+        if files.generation != self._generation or count < self._count:
+            self._reset_caches()
+            self._update_rows()
+            return
+        if count == self._count:
+            return
+        start = self._count
+        self._count = count
+        self._orders = {}
+        self._row_dir_ranks = None
+        if self._folded_names is not None:
+            self._folded_names.extend(name.lower() for name in files.names[start:])
+        if len(self._folded_dirs or ()) != len(files.dirs):
+            self._folded_dirs = None
+        if not self.query:
+            self._matches = {}
+            if self.rows is not None:
+                self.rows.extend(range(start, count))
+                self.unsorted_tail = True
+            return
+        # 只保留当前查询的结果，把新行中匹配的部分追加上去
+        matches = self._matches.get(self.query, [])
+        tail = self._matching(self.query, range(start, count))
+        matches.extend(tail)
+        self._matches = {self.query: matches}
+        if self.rows is not matches:
+            if not isinstance(self.rows, list):
+                self.rows = list(self.rows)
+            self.rows.extend(tail)
+        if self.sort_column is not None and tail:
+            self.unsorted_tail = True
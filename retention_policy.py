@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保留策略 - 不依赖wx的日志/产物目录保留规则
+功能：按"删除早于 N 天的文件，但每个目录保留最新的 K 个"、"总大小不超过上限，超出时从最旧的开始删除"
+      这类策略，在一次流式遍历中生成删除计划（ScanResults），交给现有的确认和删除流程执行。
+      每个目录的"最新 K 个"用容量为 K 的堆维护，离开目录即释放；总大小上限用按修改时间排序的
+      堆加运行中的字节预算维护，超出预算时立即弹出最旧的文件，不需要对整棵目录树排序。
+"""
+
+import heapq
+import threading
+import time
+from array import array
+
+from file_filters import FilterRules, compile_filter
+from scan_results import ScanResults
+
+# 删除原因
+REASON_AGE = 1
+REASON_SIZE_CAP = 2
+REASON_NAMES = {REASON_AGE: "超过保留天数", REASON_SIZE_CAP: "超出总大小上限"}
+# 写入 JSON 输出时使用的键
+REASON_KEYS = {REASON_AGE: 'age', REASON_SIZE_CAP: 'size_cap'}
+
+
+class RetentionPolicy:
+    """一条保留策略
+
+    - rules: FilterRules，选出本策略管理的文件（如 name_globs=["*.log"]）
+    - older_than_days: 修改时间早于该天数的文件删除，None 表示不按时间删除
+    - keep_newest: 每个目录中最新的若干个文件始终保留（不受时间和大小规则影响）
+    - max_total_bytes: 本策略管理的文件保留下来的总大小上限，超出时从最旧的开始删除
+    - name: 显示名称
+    """
+
+    def __init__(self, rules, older_than_days=None, keep_newest=0, max_total_bytes=None, name=None):
+        self.rules = rules
+        self.older_than_days = older_than_days
+        self.keep_newest = keep_newest
+        self.max_total_bytes = max_total_bytes
+        self.name = name or ",".join(rules.name_globs + rules.extensions) or "全部文件"
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 JSON 对象创建，键与 FilterRules 和本类的参数同名"""
+        rule_keys = ('name_globs', 'regexes', 'extensions', 'no_extension', 'min_size', 'max_size')
+        rules = FilterRules(**{key: data[key] for key in rule_keys if key in data})
+        return cls(rules, data.get('older_than_days'), data.get('keep_newest', 0),
+                   data.get('max_total_bytes'), data.get('name'))
+
+    def describe(self):
+        parts = []
+        if self.older_than_days is not None:
+            parts.append(f"删除早于 {self.older_than_days:g} 天的文件")
+        if self.max_total_bytes is not None:
+            parts.append(f"总大小上限 {self.max_total_bytes} 字节（从最旧的开始删除）")
+        if self.keep_newest:
+            parts.append(f"每个目录保留最新的 {self.keep_newest} 个")
+        return f"{self.name}: " + "，".join(parts or ["全部保留"])
+
+
+class _PolicyState:
+    """单条策略在一次遍历中的状态"""
+
+    def __init__(self, policy, now):
+        self.policy = policy
+        self.filter = compile_filter(policy.rules, now)
+        self.cutoff = now - policy.older_than_days * 86400 if policy.older_than_days is not None else None
+        self.keep_newest = policy.keep_newest or 0
+        self.cap = policy.max_total_bytes
+        # 当前目录中最新的 keep_newest 个文件：(修改时间, 序号, 行) 的最小堆
+        self.dir_heap = []
+        # 受大小上限约束的保留文件：(修改时间, 序号, 行) 的最小堆及其总字节数
+        self.cap_heap = []
+        self.cap_bytes = 0
+        # 已因大小上限删除的最新修改时间：保留集合始终排在它之后，更旧的后来者直接删除；
+        # 修改时间相同的后来者在堆中排在它之后，照常进入预算
+        self.cap_watermark = None
+        self.protected_files = 0
+        self.protected_bytes = 0
+        self.matched_files = 0
+        self.matched_bytes = 0
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+
+    def matches(self, name, size, mtime):
+        match_stat = self.filter.match_stat
+        return self.filter(name) and (match_stat is None or match_stat(name, size, mtime, 0))
+
+
+class RetentionPlanner:
+    """在一次流式遍历中按保留策略生成删除计划
+
+    每个文件归第一条匹配的策略管理。遍历结果须按目录连续产出（iter_matching_files 满足这一点）。
+    plan 为待删除文件的 ScanResults，reasons 为与之逐行对应的删除原因。
+    内存：每条策略 O(keep_newest) 的目录堆，加上大小上限内保留下来的文件；与目录树总文件数无关。
+    matched_files / matched_bytes / planned_files 在遍历过程中可随时读取。
+    """
+
+    def __init__(self, policies, now=None):
+        now = time.time() if now is None else now
+        self.policies = list(policies)
+        self.states = [_PolicyState(policy, now) for policy in self.policies]
+        self.plan = ScanResults()
+        self.reasons = array('B')
+        self.matched_files = 0
+        self.matched_bytes = 0
+        self._seq = 0
+
+    @property
+    def planned_files(self):
+        return len(self.plan)
+
+    def match_name(self, name):
+        """任一策略的名称规则匹配即可；作为 iter_matching_files 的 match_name，未匹配的文件不会 stat"""
+        for state in self.states:
+            if state.filter(name):
+                return True
+        return False
+
+    def run(self, hits, cancel_event=None):
+        """消费 (目录, 文件名, 大小, 修改时间) 迭代器，返回删除计划；取消时返回已生成的部分"""
+        states = self.states
+        current_dir = None
+        for row in hits:
+            directory, name, size, mtime = row
+            if directory != current_dir:
+                if current_dir is not None:
+                    self._close_directory()
+                    if cancel_event is not None and cancel_event.is_set():
+                        return self.plan
+                current_dir = directory
+            for state in states:
+                if state.matches(name, size, mtime):
+                    break
+            else:
+                continue
+            self.matched_files += 1
+            self.matched_bytes += size
+            state.matched_files += 1
+            state.matched_bytes += size
+            self._seq += 1
+            if state.keep_newest:
+                item = (mtime, self._seq, row)
+                if len(state.dir_heap) < state.keep_newest:
+                    heapq.heappush(state.dir_heap, item)
+                    continue
+                if mtime > state.dir_heap[0][0]:
+                    item = heapq.heapreplace(state.dir_heap, item)
+                row = item[2]
+                mtime = row[3]
+            self._evaluate(state, row, mtime)
+        self._close_directory()
+        return self.plan
+
+    def _close_directory(self):
+        """离开目录：各策略目录堆中的文件确定为受保护的最新文件"""
+        for state in self.states:
+            if not state.dir_heap:
+                continue
+            state.protected_files += len(state.dir_heap)
+            state.protected_bytes += sum(item[2][2] for item in state.dir_heap)
+            state.dir_heap = []
+            if state.cap is not None:
+                self._trim(state)
+
+    def _evaluate(self, state, row, mtime):
+        """不在"最新 K 个"之内的文件：先按时间规则，再进入大小预算"""
+        if state.cutoff is not None and mtime < state.cutoff:
+            self._delete(state, row, REASON_AGE)
+            return
+        if state.cap is None:
+            return
+        if state.cap_watermark is not None and mtime < state.cap_watermark:
+            self._delete(state, row, REASON_SIZE_CAP)
+            return
+        self._seq += 1
+        heapq.heappush(state.cap_heap, (mtime, self._seq, row))
+        state.cap_bytes += row[2]
+        self._trim(state)
+
+    def _trim(self, state):
+        """保留总量超出上限时从最旧的开始删除（受保护的文件只占用预算，不会被删除）
+
+        删除线只会前移：预算只减不增，因此流式结果与整体按修改时间排序后从最旧的开始删除一致。
+        """
+        heap = state.cap_heap
+        while heap and state.cap_bytes + state.protected_bytes > state.cap:
+            mtime, _, row = heapq.heappop(heap)
+            state.cap_bytes -= row[2]
+            state.cap_watermark = mtime
+            self._delete(state, row, REASON_SIZE_CAP)
+
+    def _delete(self, state, row, reason):
+        self.plan.add(*row)
+        self.reasons.append(reason)
+        state.deleted_files += 1
+        state.deleted_bytes += row[2]
+
+    def reason_counts(self):
+        """返回 {原因名称: (文件数, 字节数)}"""
+        counts = {}
+        sizes = self.plan.sizes
+        for index, reason in enumerate(self.reasons):
+            files, nbytes = counts.get(reason, (0, 0))
+            counts[reason] = (files + 1, nbytes + sizes[index])
+        return {REASON_NAMES[reason]: value for reason, value in counts.items()}
+
+    def summary(self):
+        """每条策略的统计，供日志和报告使用"""
+        return [{
+            'policy': state.policy.describe(),
+            'matched_files': state.matched_files,
+            'matched_bytes': state.matched_bytes,
+            'protected_files': state.protected_files,
+            'deleted_files': state.deleted_files,
+            'deleted_bytes': state.deleted_bytes,
+            'kept_bytes': state.matched_bytes - state.deleted_bytes,
+        } for state in self.states]
+
+
+class RetentionJob:
+    """在后台线程中生成删除计划
+
+    scan_func(match_name, cancel_event) 返回扫描结果迭代器；on_done(planner, cancelled, error)
+    在工作线程中调用，GUI 侧应自行通过 wx.CallAfter 转回主线程。
+    """
+
+    def __init__(self, planner, scan_func, on_done, metrics=None):
+        self.planner = planner
+        self.scan_func = scan_func
+        self.on_done = on_done
+        self.metrics = metrics
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动后台线程"""
+        self.thread = threading.Thread(target=self._run, name="RetentionJob", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        error = None
+        started = time.perf_counter()
+        try:
+            self.planner.run(self.scan_func(self.planner.match_name, self.cancel_event), self.cancel_event)
+        except Exception as e:
+            error = e
+        if self.metrics is not None:
+            self.metrics.add_time('retention_plan', time.perf_counter() - started)
+        self.on_done(self.planner, self.cancel_event.is_set(), error)
@@ -0,0 +1,1019 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描引擎 - 不依赖wx的文件扫描核心
+功能：使用 os.scandir 单次遍历目录树，按预编译的后缀集合匹配文件名，
+      并复用 DirEntry 自带的 stat 缓存，避免每个后缀一次 glob、每个文件两次 stat；
+      多个根目录按所在设备并发遍历，按 (st_dev, st_ino) 去重，同一目录只遍历一次
+"""
+
+import os
+import collections
+import heapq
+import queue
+import threading
+import time
+
+# 默认白名单目录：路径中任一分量与之相同的目录整棵子树都不扫描
+DEFAULT_WHITELIST_DIRS = [
+    "Windows", "Program Files", "Program Files (x86)",
+    "System32", "SysWOW64", "AppData", "ProgramData",
+    "Users", "Documents and Settings"
+]
+
+# 常见的系统无后缀文件，不视为清理对象
+SYSTEM_NOEXT_NAMES = frozenset(['Thumbs', 'desktop', 'DS_Store', 'localized'])
+
+# 并行遍历时已列出、尚未被消费者取走的目录数上限（限制预读占用的内存）
+PARALLEL_READ_AHEAD = 256
+
+
+class ScanStats:
+    """一次扫描的汇总计数
+
+    多根目录扫描时 dirs_duplicate 为因 (st_dev, st_ino) 重复而未再遍历的目录数（含被整体去掉的根目录），
+    failed_roots 为无法访问的根目录及错误信息 [(根目录, 错误), ...]。
+    """
+
+    def __init__(self):
+        self.dirs_scanned = 0
+        self.dirs_skipped = 0
+        self.errors = 0
+        self.dirs_duplicate = 0
+        self.failed_roots = []
+
+
+class WhitelistMatcher:
+    """预编译的白名单匹配器
+
+    白名单在每次扫描开始时编译为集合，遍历时只需对每个子目录名做一次集合查找，
+    命中的子目录直接从遍历中剪除，不再进入其子树。
+    """
+
+    def __init__(self, names):
+        self._fold = os.path.normcase if os.name == 'nt' else None
+        self.names = frozenset(self._fold(n) if self._fold else n for n in names if n)
+
+    def __bool__(self):
+        return bool(self.names)
+
+    def matches_name(self, name):
+        """目录名本身是否在白名单中"""
+        if self._fold:
+            name = self._fold(name)
+        return name in self.names
+
+    def matches_path(self, path):
+        """路径的任一分量是否在白名单中（只用于扫描根目录等少量路径）"""
+        drive, rest = os.path.splitdrive(os.path.normpath(path))
+        for part in rest.replace('\\', '/').split('/'):
+            if part and self.matches_name(part):
+                return True
+        return False
+
+
+def parse_roots(text):
+    """解析用 os.pathsep 或换行分隔的多个根目录，去掉空项和完全相同的重复项"""
+    roots = []
+    for line in text.splitlines():
+        for root in line.split(os.pathsep):
+            root = root.strip()
+            if root and root not in roots:
+                roots.append(root)
+    return roots
+
+
+class DirectoryClaims:
+    """多根目录扫描中已遍历目录的 (st_dev, st_ino) 及其剩余可下降层数，可在多个线程中共用
+
+    claim(路径, 剩余层数) 返回 (是否首次到达, 是否需要继续下降)：同一目录经嵌套的根目录、不同路径或
+    绑定挂载再次到达时，其中的文件不再产出；只有这次的剩余层数更大（受 max_depth 限制时）才
+    重新列出以继续下降。剩余层数 None 表示不限。每个目录多一次 stat，只在多根目录扫描时使用。
+    """
+
+    def __init__(self):
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def claim(self, path, remaining=None):
+        st = os.stat(path)
+        key = (st.st_dev, st.st_ino)
+        with self._lock:
+            if key not in self._seen:
+                self._seen[key] = remaining
+                return True, True
+            previous = self._seen[key]
+            if previous is None or (remaining is not None and remaining <= previous):
+                return False, False
+            self._seen[key] = remaining
+            return False, True
+
+
+def dedupe_roots(roots, recursive=True, max_depth=None):
+    """按 (st_dev, st_ino) 整理根目录，返回 (保留的 [(根目录, 设备号)], 去掉的 [(根目录, 覆盖它的根目录)],
+    无法访问的 [(根目录, 异常)])
+
+    指向同一目录的根目录（不同写法、符号链接、绑定挂载）只保留第一个；不限深度递归时，
+    真实路径（解析符号链接后）的祖先目录是另一个根目录的根目录也去掉，因为遍历不跟随目录符号链接，
+    只有真实路径上的祖先才能在自己的遍历中完整覆盖它。
+    """
+    identities = {}
+    candidates = []
+    failed = []
+    duplicates = []
+    for root in roots:
+        try:
+            st = os.stat(root)
+        except OSError as e:
+            failed.append((root, e))
+            continue
+        key = (st.st_dev, st.st_ino)
+        if key in identities:
+            duplicates.append((root, identities[key]))
+            continue
+        identities[key] = root
+        candidates.append((root, key))
+
+    kept = []
+    for root, key in candidates:
+        covering = None
+        if recursive and max_depth is None:
+            path = os.path.realpath(root)
+            parent = os.path.dirname(path)
+            while parent != path and covering is None:
+                try:
+                    st = os.stat(parent)
+                except OSError:
+                    break
+                covering = identities.get((st.st_dev, st.st_ino))
+                path, parent = parent, os.path.dirname(parent)
+        if covering is not None:
+            duplicates.append((root, covering))
+        else:
+            kept.append((root, key[0]))
+    return kept, duplicates, failed
+
+
+def is_no_extension_name(name):
+    """判断文件名是否为无后缀文件（排除常见系统文件）"""
+    return '.' not in name and name not in SYSTEM_NOEXT_NAMES
+
+
+def is_hidden_file(path):
+    """检查文件是否带有 Windows 隐藏属性（其他平台上始终为 False）"""
+    try:
+        return bool(os.stat(path).st_file_attributes & 2)  # FILE_ATTRIBUTE_HIDDEN
+    except (OSError, AttributeError):
+        return False
+
+
+def parse_extensions(text):
+    """解析逗号分隔的后缀字符串，返回统一带前导点的后缀列表"""
+    ext_list = []
+    for ext in text.split(','):
+        ext = ext.strip()
+        if not ext:
+            continue
+        if not ext.startswith('.'):
+            ext = '.' + ext
+        if ext not in ext_list:
+            ext_list.append(ext)
+    return ext_list
+
+
+def build_suffix_matcher(ext_list):
+    """把后缀列表预编译为文件名匹配函数
+
+    单段后缀（如 .log）放入集合，按最后一个点切出后缀做一次哈希查找；
+    多段后缀（如 .tar.gz）退化为 str.endswith 元组匹配。
+    大小写规则与平台一致：Windows 下不区分大小写。
+    """
+    fold = os.path.normcase if os.name == 'nt' else None
+    suffixes = set(fold(ext) if fold else ext for ext in ext_list)
+    simple = frozenset(s for s in suffixes if s.count('.') == 1)
+    compound = tuple(s for s in suffixes if s.count('.') > 1)
+
+    def match(name):
+        if fold:
+            name = fold(name)
+        idx = name.rfind('.')
+        # 与 glob 的 "*.ext" 一致：后缀前至少要有一个字符
+        if idx <= 0:
+            return False
+        if name[idx:] in simple:
+            return True
+        if compound:
+            for suffix in compound:
+                if len(name) > len(suffix) and name.endswith(suffix):
+                    return True
+        return False
+
+    return match
+
+
+def _list_directory(directory, match_name, descend, whitelist, index=None, match_stat=None, metrics=None):
+    """列出一个目录：返回 (命中文件列表, 子目录路径列表, 跳过的白名单目录数, 条目错误数, 未命中条目数)
+
+    未命中条目数为既不是命中文件、也不进入遍历的条目（不匹配的文件、特殊文件、不展开的子目录）。
+    名称先经 match_name 筛选；match_stat(名称, 大小, 修改时间, 文件属性) 不为 None 时
+    再用 stat 数据筛选。index 为 ScanIndex 时优先复用未变化目录的缓存清单。
+    metrics 为 PerfMetrics 时改用分阶段计时的实现。
+    目录本身无法打开时抛出 OSError。
+    """
+    if metrics is not None:
+        return _list_directory_timed(directory, match_name, descend, whitelist, index, match_stat, metrics)
+    if index is not None:
+        return _filter_listing(directory, index.list_directory(directory), match_name, descend,
+                               whitelist, match_stat)
+
+    hits = []
+    subdirs = []
+    skipped = 0
+    errors = 0
+    misses = 0
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if whitelist and whitelist.matches_name(entry.name):
+                        skipped += 1
+                    elif descend:
+                        subdirs.append(entry.path)
+                    else:
+                        misses += 1
+                elif match_name(entry.name) and entry.is_file():
+                    # Windows 下 DirEntry.stat() 直接使用目录枚举时缓存的数据
+                    st = entry.stat()
+                    if match_stat is not None and not match_stat(
+                            entry.name, st.st_size, st.st_mtime, getattr(st, 'st_file_attributes', 0)):
+                        misses += 1
+                        continue
+                    hits.append((directory, entry.name, st.st_size, st.st_mtime))
+                else:
+                    misses += 1
+            except OSError:
+                errors += 1
+    return hits, subdirs, skipped, errors, misses
+
+
+def scan_directory(directory, match_name, descend=False, whitelist=None, metrics=None):
+    """只列出一个目录：返回 (命中文件列表, 子目录路径列表, 跳过的白名单目录数, 条目错误数)
+
+    供监视模式等只需重新列出个别目录的场合使用；match_name 为 CompiledFilter 时其 match_stat 同样生效。
+    目录本身无法打开时抛出 OSError。
+    """
+    return _list_directory(directory, match_name, descend, whitelist,
+                           match_stat=getattr(match_name, 'match_stat', None), metrics=metrics)[:4]
+
+
+def _list_directory_timed(directory, match_name, descend, whitelist, index, match_stat, metrics):
+    """_list_directory 的计时版本：枚举、白名单、规则、stat 分成几轮执行，每轮计时一次
+
+    结果与 _list_directory 相同；计时粒度是目录而不是文件，额外开销只有每个目录几次 perf_counter。
+    """
+    perf = time.perf_counter
+    join = os.path.join
+    started = perf()
+    stat_seconds = 0.0
+    stat_calls = 0
+    if index is not None:
+        files, subdir_names, errors = index.list_directory(directory)
+        listed = perf()
+        entries = len(files)
+    else:
+        subdir_names = []
+        file_entries = []
+        errors = 0
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdir_names.append(entry.name)
+                    else:
+                        file_entries.append(entry)
+                except OSError:
+                    errors += 1
+        listed = perf()
+        entries = len(file_entries)
+
+    subdirs = []
+    skipped = 0
+    for name in subdir_names:
+        if whitelist and whitelist.matches_name(name):
+            skipped += 1
+        elif descend:
+            subdirs.append(join(directory, name))
+    whitelisted = perf()
+    misses = len(subdir_names) - skipped - len(subdirs)
+
+    if index is not None:
+        hits, stat_calls, stat_errors = _match_cached(directory, files, match_name, match_stat)
+        errors += stat_errors
+        rules_seconds = perf() - whitelisted
+    else:
+        candidates = [entry for entry in file_entries if match_name(entry.name)]
+        matched = perf()
+        stated = []
+        for entry in candidates:
+            try:
+                if entry.is_file():
+                    stated.append((entry.name, entry.stat()))
+                else:
+                    misses += 1
+            except OSError:
+                errors += 1
+        misses += len(file_entries) - len(candidates)
+        stat_calls = len(stated)
+        stat_done = perf()
+        stat_seconds = stat_done - matched
+        hits = [(directory, name, st.st_size, st.st_mtime) for name, st in stated
+                if match_stat is None
+                or match_stat(name, st.st_size, st.st_mtime, getattr(st, 'st_file_attributes', 0))]
+        rules_seconds = (matched - whitelisted) + (perf() - stat_done)
+
+    acc = metrics.scan_accumulator()
+    acc.list_dir += listed - started
+    acc.whitelist += whitelisted - listed
+    acc.rules += rules_seconds
+    acc.stat += stat_seconds
+    acc.dirs += 1
+    acc.files += entries
+    acc.stat_calls += stat_calls
+    acc.dirs_whitelisted += skipped
+    if hits:
+        acc.hits += len(hits)
+        acc.bytes += sum(hit[2] for hit in hits)
+    if index is not None:
+        misses += len(files) - len(hits) - stat_errors
+    else:
+        misses += len(stated) - len(hits)
+    return hits, subdirs, skipped, errors, misses
+
+
+def _match_cached(directory, files, match_name, match_stat):
+    """对缓存清单中的文件应用匹配规则：返回 (命中文件列表, 重新 stat 的次数, stat 出错数)
+
+    目录 mtime 不随文件内容的就地修改而变化，缓存中的大小和修改时间可能已经过期；
+    有 stat 规则时对名称匹配的文件重新 stat 一次，再用最新数据执行 match_stat。
+    """
+    if match_stat is None:
+        return [(directory, name, size, mtime) for name, size, mtime, attributes in files
+                if match_name(name)], 0, 0
+    join = os.path.join
+    hits = []
+    stat_calls = 0
+    errors = 0
+    for name, size, mtime, attributes in files:
+        if not match_name(name):
+            continue
+        stat_calls += 1
+        try:
+            st = os.stat(join(directory, name))
+        except OSError:
+            errors += 1
+            continue
+        if match_stat(name, st.st_size, st.st_mtime, getattr(st, 'st_file_attributes', 0)):
+            hits.append((directory, name, st.st_size, st.st_mtime))
+    return hits, stat_calls, errors
+
+
+def _filter_listing(directory, listing, match_name, descend, whitelist, match_stat=None):
+    """对完整目录清单应用匹配、白名单与深度规则"""
+    files, subdir_names, errors = listing
+    join = os.path.join
+    hits, _, stat_errors = _match_cached(directory, files, match_name, match_stat)
+    errors += stat_errors
+    subdirs = []
+    skipped = 0
+    for name in subdir_names:
+        if whitelist and whitelist.matches_name(name):
+            skipped += 1
+        elif descend:
+            subdirs.append(join(directory, name))
+    misses = len(files) - len(hits) - stat_errors + len(subdir_names) - skipped - len(subdirs)
+    return hits, subdirs, skipped, errors, misses
+
+
+class SubtreeTracker:
+    """在遍历过程中找出"整棵子树都是命中文件"的目录
+
+    遍历对每个列出的目录调用一次 visit(目录, 是否完整, 命中文件数)；"完整"指目录中没有未命中、
+    跳过、出错或不展开的条目。目录按先序到达，因此只需保存从根到当前目录的一条路径栈，
+    离开一个目录的子树时即可自底向上确定它是否整棵完整：完整的子树向上合并，只保留最大的。
+    遍历正常结束（未取消）后 done 为 True，subtrees 为这些子树的路径列表（扫描根目录本身不算，
+    不含命中文件的子树也不列出）。内存为 O(深度 + 结果数)，与文件数无关。
+    """
+
+    def __init__(self):
+        self.subtrees = []
+        self.done = False
+        # 栈元素为 [路径, 路径前缀, 是否整棵完整, 命中文件数, 其下已确定的完整子树]
+        self._stack = []
+
+    def visit(self, directory, complete, files=0):
+        stack = self._stack
+        while stack and not directory.startswith(stack[-1][1]):
+            self._close_top()
+        stack.append([directory, os.path.join(directory, ''), complete, files, []])
+
+    def finish(self):
+        """遍历正常结束：关闭剩余的栈并给出结果"""
+        while len(self._stack) > 1:
+            self._close_top()
+        if self._stack:
+            self.subtrees = self._stack.pop()[4]
+        self.done = True
+
+    def combine(self, trackers):
+        """多根目录扫描：各根目录分别记录，全部正常结束后合并结果"""
+        if all(tracker.done for tracker in trackers):
+            self.subtrees = [path for tracker in trackers for path in tracker.subtrees]
+            self.done = True
+
+    def _close_top(self):
+        path, _, complete, files, found = self._stack.pop()
+        parent = self._stack[-1]
+        parent[2] = parent[2] and complete
+        parent[3] += files
+        if complete:
+            if files:
+                parent[4].append(path)
+        else:
+            parent[4].extend(found)
+
+
+def iter_matching_files(root, match_name, recursive=True, max_depth=None, cancel_event=None,
+                        whitelist=None, stats=None, workers=1, index=None, metrics=None, subtrees=None,
+                        claims=None):
+    """单次遍历目录树，逐个产出匹配文件的 (目录, 文件名, 大小, 修改时间)
+
+    - recursive 为 False 时只扫描 root 本身
+    - max_depth 为 None 表示不限深度，0 表示只扫描 root，1 表示再向下一层，依此类推
+    - 不跟随目录符号链接；子目录按 scandir 的顺序深度优先（先序）遍历
+    - 子目录无法访问时跳过，root 本身无法访问时抛出 OSError
+    - cancel_event 被置位后在下一个目录处停止遍历
+    - whitelist 为 WhitelistMatcher 时，名称命中的子目录连同其子树一起剪除；
+      root 本身位于白名单路径下时不扫描任何内容
+    - stats 为 ScanStats 时累计扫描/跳过的目录数和错误数
+    - workers 大于 1 时用线程池并发列目录，产出顺序与单线程遍历完全相同
+    - index 为 ScanIndex 时只重新列出 mtime 变化的目录，其余复用缓存清单
+    - match_name 为 file_filters.CompiledFilter 时，其 match_stat 规则在名称匹配之后执行
+    - metrics 为 perf_metrics.PerfMetrics 时按目录累计枚举/白名单/规则/stat 的耗时和计数
+    - subtrees 为 SubtreeTracker 时记录每个目录是否完整，遍历正常结束后给出整棵命中的子树
+    - claims 为 DirectoryClaims 时每个目录列出前先登记，已产出过的目录不再产出文件，不需更深下降时整棵跳过
+    """
+    if index is not None:
+        root = os.path.abspath(root)
+    if stats is None:
+        stats = ScanStats()
+    if whitelist and whitelist.matches_path(root):
+        stats.dirs_skipped += 1
+        return iter(())
+    match_stat = getattr(match_name, 'match_stat', None)
+    if workers > 1 and recursive and max_depth != 0:
+        return _iter_parallel(root, match_name, recursive, max_depth, cancel_event,
+                              whitelist, stats, workers, index, match_stat, metrics, subtrees, claims)
+    return _iter_sequential(root, match_name, recursive, max_depth, cancel_event,
+                            whitelist, stats, index, match_stat, metrics, subtrees, claims)
+
+
+def iter_matching_roots(roots, match_name, recursive=True, max_depth=None, cancel_event=None,
+                        whitelist=None, stats=None, workers=1, index=None, metrics=None, subtrees=None,
+                        queue_size=64):
+    """多个根目录的 iter_matching_files，所有根目录的结果汇入同一个迭代器
+
+    - 先用 dedupe_roots 去掉重复和被其他根目录覆盖的根目录（计入 stats.dirs_duplicate）
+    - 根目录按设备分组，每个设备一个线程依次遍历其上的根目录（每个根目录内部仍按 workers 并行列目录），
+      不同设备同时进行；遍历中每个目录先按 (st_dev, st_ino) 登记，绑定挂载等造成的重复目录只遍历一次
+    - 结果按目录整批经容量为 queue_size 的队列交给调用方：不同根目录的结果交错，同一目录的结果仍然连续
+    - 无法访问的根目录记入 stats.failed_roots 和 stats.errors；全部根目录都无法访问时抛出第一个 OSError
+    - stats 在调用方线程中由各设备的计数汇总，扫描过程中可随时读取
+    - subtrees 为 SubtreeTracker 时每个根目录分别记录，全部正常结束后合并
+    只有一个根目录时等同于 iter_matching_files，不启动额外线程，也不逐目录登记。
+    """
+    if stats is None:
+        stats = ScanStats()
+    if len(roots) == 1:
+        return iter_matching_files(roots[0], match_name, recursive, max_depth, cancel_event, whitelist, stats,
+                                   workers, index, metrics, subtrees)
+    return _iter_roots(roots, match_name, recursive, max_depth, cancel_event, whitelist, stats, workers,
+                       index, metrics, subtrees, queue_size)
+
+
+def _iter_roots(roots, match_name, recursive, max_depth, cancel_event, whitelist, stats, workers, index,
+                metrics, subtrees, queue_size):
+    kept, duplicates, failed = dedupe_roots(roots, recursive, max_depth)
+    devices = collections.OrderedDict()
+    for root, device in kept:
+        devices.setdefault(device, []).append(root)
+
+    claims = DirectoryClaims()
+    stop_event = threading.Event()
+    results = queue.Queue(maxsize=queue_size)
+    device_stats = [ScanStats() for _ in devices]
+    trackers = []
+    errors = [error for _, error in failed]
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(device_roots, dev_stats):
+        try:
+            for root in device_roots:
+                tracker = None
+                if subtrees is not None:
+                    tracker = SubtreeTracker()
+                    trackers.append(tracker)
+                batch = []
+                try:
+                    for hit in iter_matching_files(root, match_name, recursive, max_depth, stop_event,
+                                                   whitelist, dev_stats, workers, index, metrics, tracker,
+                                                   claims):
+                        if batch and hit[0] != batch[-1][0]:
+                            if not put(batch):
+                                return
+                            batch = []
+                        batch.append(hit)
+                except OSError as e:
+                    errors.append(e)
+                    dev_stats.failed_roots.append((root, str(e)))
+                    dev_stats.errors += 1
+                if batch and not put(batch):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    threads = [threading.Thread(target=produce, args=(device_roots, dev_stats),
+                                name=f"RootScanner-{i}", daemon=True)
+               for i, (device_roots, dev_stats) in enumerate(zip(devices.values(), device_stats))]
+
+    def merge_stats():
+        stats.dirs_scanned = sum(s.dirs_scanned for s in device_stats)
+        stats.dirs_skipped = sum(s.dirs_skipped for s in device_stats)
+        stats.errors = len(failed) + sum(s.errors for s in device_stats)
+        stats.dirs_duplicate = len(duplicates) + sum(s.dirs_duplicate for s in device_stats)
+        stats.failed_roots = ([(root, str(error)) for root, error in failed]
+                              + [item for s in device_stats for item in s.failed_roots])
+
+    def generate():
+        for thread in threads:
+            thread.start()
+        running = len(threads)
+        try:
+            while running:
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                try:
+                    item = results.get(timeout=0.1)
+                except queue.Empty:
+                    merge_stats()
+                    continue
+                if item is None:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    merge_stats()
+                    for hit in item:
+                        yield hit
+            merge_stats()
+            if errors and not any(s.dirs_scanned for s in device_stats):
+                raise errors[0]
+            if subtrees is not None:
+                subtrees.combine(trackers)
+        finally:
+            stop_event.set()
+            merge_stats()
+
+    return generate()
+
+
+def _remaining_depth(recursive, max_depth, depth):
+    """目录在本次遍历中还能向下的层数，None 表示不限"""
+    if not recursive:
+        return 0
+    return None if max_depth is None else max_depth - depth
+
+
+def _iter_sequential(root, match_name, recursive, max_depth, cancel_event, whitelist, stats, index,
+                     match_stat, metrics=None, subtrees=None, claims=None):
+    stack = [(root, 0)]
+    while stack:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        directory, depth = stack.pop()
+        descend = recursive and (max_depth is None or depth < max_depth)
+        try:
+            first = True
+            if claims is not None:
+                first, extend = claims.claim(directory, _remaining_depth(recursive, max_depth, depth))
+                if not extend:
+                    stats.dirs_duplicate += 1
+                    if subtrees is not None:
+                        subtrees.visit(directory, False)
+                    continue
+            hits, subdirs, skipped, errors, misses = _list_directory(
+                directory, match_name, descend, whitelist, index, match_stat, metrics)
+            if not first:
+                # 已经产出过这个目录的文件，这次只为更深地下降而重新列出
+                hits = []
+                misses += 1
+        except OSError:
+            if depth == 0:
+                raise
+            stats.errors += 1
+            if subtrees is not None:
+                subtrees.visit(directory, False)
+            continue
+
+        stats.dirs_scanned += 1
+        stats.dirs_skipped += skipped
+        stats.errors += errors
+        if subtrees is not None:
+            subtrees.visit(directory, not (misses or skipped or errors), len(hits))
+        for hit in hits:
+            yield hit
+
+        for subdir in reversed(subdirs):
+            stack.append((subdir, depth + 1))
+    if subtrees is not None:
+        subtrees.finish()
+
+
+class TopSummary:
+    """最大文件/目录模式中已处理的全部匹配文件数和字节数（扫描过程中可随时读取）"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+
+
+def iter_largest_files(hits, k, summary=None):
+    """流式保留最大的 k 个文件，遍历结束后按大小降序产出 (目录, 文件名, 大小, 修改时间)
+
+    使用容量为 k 的最小堆，内存为 O(k)，与匹配文件总数无关；大小相同时先遇到的文件优先。
+    """
+    if summary is None:
+        summary = TopSummary()
+    heap = []
+    seq = 0
+    files = 0
+    total = 0
+    for hit in hits:
+        size = hit[2]
+        files += 1
+        total += size
+        if files & 0x3ff == 0:
+            summary.files = files
+            summary.bytes = total
+        if len(heap) < k:
+            heapq.heappush(heap, (size, -seq, hit))
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, (size, -seq, hit))
+        seq += 1
+    summary.files = files
+    summary.bytes = total
+    for size, _, hit in sorted(heap, reverse=True):
+        yield hit
+
+
+def iter_largest_directories(hits, root, n, summary=None):
+    """流式统计各目录（含子目录）的匹配文件总大小，遍历结束后按总大小降序产出前 n 个目录
+
+    产出 (上级目录, 目录名, 总大小, 其中最新文件的修改时间)，os.path.join 前两项即目录路径。
+    root 须与传给 iter_matching_files 的相同（使用扫描索引时为其绝对路径）。
+    依赖遍历的先序顺序：离开一个目录的子树后不会再回到其中，因此只需保存从 root 到
+    当前目录的一条路径栈，离开时把子树总大小累加到上级并放入容量为 n 的最小堆；
+    内存为 O(n + 深度)，与文件数和目录数无关。
+    """
+    if summary is None:
+        summary = TopSummary()
+    heap = []
+    seq = 0
+    # 栈元素为 [路径, 路径前缀, 总大小, 最新修改时间]
+    stack = [[root, os.path.join(root, ''), 0, 0.0]]
+    current = None
+    files = 0
+    total = 0
+
+    def close_top():
+        nonlocal seq
+        path, _, size, mtime = stack.pop()
+        if stack:
+            parent = stack[-1]
+            parent[2] += size
+            if mtime > parent[3]:
+                parent[3] = mtime
+        item = (size, -seq, path, mtime)
+        seq += 1
+        if len(heap) < n:
+            heapq.heappush(heap, item)
+        elif size > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    for directory, name, size, mtime in hits:
+        files += 1
+        total += size
+        if files & 0x3ff == 0:
+            summary.files = files
+            summary.bytes = total
+        if directory != current:
+            while len(stack) > 1 and directory != stack[-1][0] and not directory.startswith(stack[-1][1]):
+                close_top()
+            top_path = stack[-1][0]
+            if directory != top_path:
+                for part in directory[len(stack[-1][1]):].split(os.sep):
+                    top_path = os.path.join(top_path, part)
+                    stack.append([top_path, os.path.join(top_path, ''), 0, 0.0])
+            current = directory
+        entry = stack[-1]
+        entry[2] += size
+        if mtime > entry[3]:
+            entry[3] = mtime
+    while stack:
+        close_top()
+    summary.files = files
+    summary.bytes = total
+    for size, _, path, mtime in sorted(heap, reverse=True):
+        path = os.path.normpath(path)
+        yield os.path.dirname(path), os.path.basename(path) or path, size, mtime
+
+
+class _DirNode:
+    """并行遍历中的一个目录：工作线程（或追上预读的消费者）填充结果，消费者按先序取出
+
+    error 为目录本身无法访问的 OSError；failure 为列目录时的其他异常，由消费者重新抛出。
+    """
+
+    __slots__ = ('path', 'depth', 'hits', 'children', 'skipped', 'errors', 'misses', 'duplicate', 'error',
+                 'failure', 'started', 'done')
+
+    def __init__(self, path, depth):
+        self.path = path
+        self.depth = depth
+        self.hits = None
+        self.children = None
+        self.skipped = 0
+        self.errors = 0
+        self.misses = 0
+        self.duplicate = False
+        self.error = None
+        self.failure = None
+        self.started = False
+        self.done = False
+
+
+class WorkStealingPool:
+    """简单的工作窃取线程池
+
+    每个工作线程有自己的双端队列：任务中提交的新任务放回本线程队列，
+    本线程从队尾取（深度优先，局部性好），空闲线程从其他线程的队头窃取
+    （通常是更靠近根的大子树）。所有已提交任务完成后线程自动退出。
+    """
+
+    def __init__(self, workers, func, stop_event):
+        self.func = func
+        self.stop_event = stop_event
+        self.deques = [collections.deque() for _ in range(workers)]
+        self.cond = threading.Condition()
+        self.pending = 0
+        self._local = threading.local()
+        self._next = 0
+        self.threads = [
+            threading.Thread(target=self._worker, args=(i,), name=f"ScanWorker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def submit_many(self, items):
+        """提交一组任务；在工作线程内调用时放入本线程队列，否则轮流分配"""
+        if not items:
+            return
+        index = getattr(self._local, 'index', None)
+        with self.cond:
+            if index is None:
+                index = self._next
+                self._next = (self._next + 1) % len(self.deques)
+            self.deques[index].extend(items)
+            self.pending += len(items)
+            self.cond.notify_all()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.cond:
+            self.cond.notify_all()
+
+    def _take(self, index):
+        own = self.deques[index]
+        if own:
+            return own.pop()
+        count = len(self.deques)
+        for offset in range(1, count):
+            other = self.deques[(index + offset) % count]
+            if other:
+                return other.popleft()
+        return None
+
+    def _worker(self, index):
+        self._local.index = index
+        while True:
+            with self.cond:
+                while True:
+                    if self.stop_event.is_set() or self.pending == 0:
+                        return
+                    item = self._take(index)
+                    if item is not None:
+                        break
+                    self.cond.wait()
+            try:
+                self.func(item)
+            finally:
+                with self.cond:
+                    self.pending -= 1
+                    if self.pending == 0:
+                        self.cond.notify_all()
+
+
+def _iter_parallel(root, match_name, recursive, max_depth, cancel_event, whitelist, stats, workers,
+                   index, match_stat, metrics=None, subtrees=None, claims=None):
+    """并行遍历：线程池并发列目录，消费者沿目录树先序等待并产出结果，顺序确定
+
+    工作线程列目录前先占用一个预读名额，消费者取走该目录的结果后归还，因此最多预读
+    PARALLEL_READ_AHEAD 个目录。名额用完时消费者需要的下一个目录可能还没有线程处理，
+    此时由消费者自己列出，不会互相等待。
+    """
+    stop_event = threading.Event()
+    done_cond = threading.Condition()
+    read_ahead = threading.Semaphore(PARALLEL_READ_AHEAD)
+
+    def fill(node):
+        try:
+            descend = recursive and (max_depth is None or node.depth < max_depth)
+            try:
+                first, extend = True, True
+                if claims is not None:
+                    first, extend = claims.claim(node.path, _remaining_depth(recursive, max_depth, node.depth))
+                if not extend:
+                    node.duplicate = True
+                    node.hits, subdirs = [], []
+                else:
+                    node.hits, subdirs, node.skipped, node.errors, node.misses = _list_directory(
+                        node.path, match_name, descend, whitelist, index, match_stat, metrics)
+                    if not first:
+                        node.hits = []
+                        node.misses += 1
+            except OSError as e:
+                node.error = e
+                subdirs = []
+            node.children = [_DirNode(path, node.depth + 1) for path in subdirs]
+            # 倒序提交，使本线程从队尾先取到第一个子目录，尽早满足消费者的先序需求
+            pool.submit_many(node.children[::-1])
+        except Exception as e:
+            node.failure = e
+        finally:
+            with done_cond:
+                node.done = True
+                done_cond.notify_all()
+
+    def list_node(node):
+        while not read_ahead.acquire(timeout=0.1):
+            if stop_event.is_set():
+                return
+        with done_cond:
+            started = node.started
+            node.started = True
+        if started:
+            # 消费者已自行列出
+            read_ahead.release()
+            return
+        fill(node)
+
+    pool = WorkStealingPool(workers, list_node, stop_event)
+    root_node = _DirNode(root, 0)
+    pool.submit_many([root_node])
+    pool.start()
+
+    try:
+        stack = [root_node]
+        while stack:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            node = stack.pop()
+            with done_cond:
+                inline = not node.started
+                node.started = True
+            if inline:
+                fill(node)
+            else:
+                with done_cond:
+                    while not node.done:
+                        if cancel_event is not None and cancel_event.is_set():
+                            return
+                        done_cond.wait(0.1)
+                read_ahead.release()
+
+            if node.failure is not None:
+                raise node.failure
+            if node.error is not None:
+                if node is root_node:
+                    raise node.error
+                stats.errors += 1
+                if subtrees is not None:
+                    subtrees.visit(node.path, False)
+                continue
+            if node.duplicate:
+                stats.dirs_duplicate += 1
+                if subtrees is not None:
+                    subtrees.visit(node.path, False)
+                continue
+
+            stats.dirs_scanned += 1
+            stats.dirs_skipped += node.skipped
+            stats.errors += node.errors
+            hits, children = node.hits, node.children
+            node.hits = node.children = None
+            if subtrees is not None:
+                subtrees.visit(node.path, not (node.misses or node.skipped or node.errors), len(hits))
+            for hit in hits:
+                yield hit
+            stack.extend(reversed(children))
+        if subtrees is not None:
+            subtrees.finish()
+    finally:
+        pool.stop()
+
+
+class ScanJob:
+    """在后台线程中运行扫描，并把结果分批交给回调
+
+    scan_func(cancel_event) 返回结果迭代器；on_batch(batch) 与 on_done(cancelled, error)
+    都在工作线程中调用，GUI 侧应自行通过 wx.CallAfter 转回主线程。
+    第一条结果立即发出，之后按 batch_size 条或 flush_interval 秒合并发送。
+    index 为本次扫描使用的 ScanIndex，扫描结束后在工作线程中提交并关闭。
+    metrics 为本次扫描的 PerfMetrics（由 scan_func 传给遍历函数），只随任务保存供调用方读取。
+    """
+
+    def __init__(self, scan_func, on_batch, on_done, batch_size=2000, flush_interval=0.2, stats=None,
+                 index=None, metrics=None):
+        self.scan_func = scan_func
+        self.stats = stats
+        self.index = index
+        self.metrics = metrics
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动后台扫描线程"""
+        self.thread = threading.Thread(target=self._run, name="ScanJob", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """请求停止扫描，遍历会在下一个目录处干净地退出"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        batch = []
+        error = None
+        last_flush = time.monotonic() - self.flush_interval
+        try:
+            for item in self.scan_func(self.cancel_event):
+                batch.append(item)
+                if len(batch) >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval:
+                    self.on_batch(batch)
+                    batch = []
+                    last_flush = time.monotonic()
+                if self.cancel_event.is_set():
+                    break
+        except Exception as e:
+            error = e
+
+        if batch:
+            self.on_batch(batch)
+        if self.index is not None:
+            try:
+                self.index.close()
+            except Exception as e:
+                error = error or e
+        self.on_done(self.cancel_event.is_set(), error)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描索引 - 持久化的目录清单缓存，支持增量重扫
+功能：在用户缓存目录的 SQLite 数据库中按目录路径保存上次的清单（子目录名、文件名/大小/修改时间/属性）
+      以及目录自身的 mtime/inode/设备号；重扫时每个目录只 stat 一次，未变化的目录直接复用缓存，
+      只有 mtime 变化的目录才重新 scandir
+
+注意：目录 mtime 只在其直接条目增删改名时变化，文件内容被就地修改不会使缓存失效，
+      此时缓存中的大小和修改时间可能过期。按大小或修改时间筛选时扫描引擎会对名称匹配的
+      文件重新 stat，不直接使用缓存中的这两项。
+"""
+
+import os
+import marshal
+import threading
+import time
+
+from app_paths import user_cache_dir
+
+# 修改时间距清单时间不足该秒数的目录视为"不稳定"，下次必定重新列出
+# （FAT 等文件系统的时间戳精度为 2 秒，同一时间窗内的后续修改无法从 mtime 看出）
+RACY_WINDOW = 2.0
+
+# 待写入的目录清单达到该数量时批量写库
+FLUSH_THRESHOLD = 500
+
+# 清单格式版本；格式变化时旧缓存整体丢弃
+SCHEMA_VERSION = 2
+
+
+def default_index_path():
+    return os.path.join(user_cache_dir(), 'scan_index.sqlite3')
+
+
+def read_directory(directory):
+    """列出目录：返回 (文件列表[(名称, 大小, 修改时间, 文件属性)], 子目录名列表, 条目错误数)"""
+    files = []
+    subdirs = []
+    errors = 0
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files.append((entry.name, st.st_size, st.st_mtime,
+                                  getattr(st, 'st_file_attributes', 0)))
+            except OSError:
+                errors += 1
+    return files, subdirs, errors
+
+
+class ScanIndex:
+    """目录清单索引
+
+    线程安全：每个线程使用自己的 SQLite 连接（WAL 模式），写入先在内存中排队，
+    达到阈值或调用 flush()/close() 时批量提交。
+    """
+
+    def __init__(self, db_path=None):
+        import sqlite3
+        self._sqlite3 = sqlite3
+        self.db_path = db_path or default_index_path()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._pending = []
+        self._pending_deletes = []
+        self.reused = 0
+        self.relisted = 0
+
+        conn = self._connection()
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS dirs")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " ino INTEGER NOT NULL,"
+            " dev INTEGER NOT NULL,"
+            " subdirs BLOB NOT NULL,"
+            " files BLOB NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def list_directory(self, directory):
+        """返回目录清单 (文件列表, 子目录名列表, 条目错误数)
+
+        目录自身的 mtime/inode/设备号与缓存一致时直接复用缓存，否则重新列出并更新缓存。
+        目录无法访问时抛出 OSError。
+        """
+        st = os.stat(directory)
+        key = (st.st_mtime_ns, st.st_ino, st.st_dev)
+        row = self._connection().execute(
+            "SELECT mtime_ns, ino, dev, subdirs, files FROM dirs WHERE path = ?", (directory,)
+        ).fetchone()
+        if row is not None and tuple(row[:3]) == key:
+            with self._lock:
+                self.reused += 1
+            return marshal.loads(row[4]), marshal.loads(row[3]), 0
+
+        files, subdirs, errors = read_directory(directory)
+        mtime_ns = st.st_mtime_ns
+        if time.time() - st.st_mtime < RACY_WINDOW:
+            mtime_ns = -1
+        if row is not None:
+            removed = set(marshal.loads(row[3])).difference(subdirs)
+        else:
+            removed = ()
+
+        with self._lock:
+            self.relisted += 1
+            self._pending.append((directory, mtime_ns, st.st_ino, st.st_dev,
+                                  marshal.dumps(subdirs), marshal.dumps(files)))
+            for name in removed:
+                self._pending_deletes.append(os.path.join(directory, name))
+            should_flush = len(self._pending) >= FLUSH_THRESHOLD
+        if should_flush:
+            self.flush()
+        return files, subdirs, errors
+
+    def count_dirs_under(self, root):
+        """缓存中 root 及其子树下的目录数（用于估计扫描规模），root 须为绝对路径"""
+        prefix = os.path.join(root, '')
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+            (root, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        ).fetchone()
+        return row[0]
+
+    def flush(self):
+        """把排队中的清单写入数据库"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            deletes, self._pending_deletes = self._pending_deletes, []
+        if not pending and not deletes:
+            return
+        conn = self._connection()
+        with conn:
+            for path in deletes:
+                # 删除已消失的子目录及其整个子树的缓存
+                prefix = os.path.join(path, '')
+                conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                             (path, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+            conn.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?)", pending)
+
+    def close(self):
+        """提交剩余写入并关闭所有连接"""
+        self.flush()
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描结果表 - 不依赖wx的紧凑列式存储
+功能：目录前缀驻留存储，文件名、大小、修改时间按列保存在 list/array 中，
+      文件数和总大小增量维护，datetime 只在显示某一行时才创建
+"""
+
+import os
+import datetime
+from array import array
+
+
+def format_size(num_bytes):
+    """把字节数格式化为 KB/MB 字符串"""
+    size_kb = num_bytes / 1024
+    if size_kb < 1024:
+        return f"{size_kb:.1f} KB"
+    return f"{size_kb/1024:.1f} MB"
+
+
+def format_mtime(timestamp):
+    """把时间戳格式化为本地时间字符串"""
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ScanResults:
+    """列式扫描结果表
+
+    每行对应一个文件：目录编号、文件名、大小、修改时间。
+    相同目录的完整路径只保存一份，其余各列为定长数组，
+    len() 与 total_size 均为 O(1)。
+    generation 在已有行被移除或重排（replace_directories、clear）时加一，
+    只追加行时不变，视图据此判断能否沿用已有的行号。
+    """
+
+    def __init__(self):
+        self.dirs = []
+        self._dir_ids = {}
+        self.dir_ids = array('i')
+        self.names = []
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.total_size = 0
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def _intern_dir(self, directory):
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self._dir_ids[directory] = dir_id
+            self.dirs.append(directory)
+        return dir_id
+
+    def add(self, directory, name, size, mtime):
+        """追加一行"""
+        self.dir_ids.append(self._intern_dir(directory))
+        self.names.append(name)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.total_size += size
+
+    def extend(self, rows):
+        """批量追加 (目录, 文件名, 大小, 修改时间) 行
+
+        扫描结果按目录连续产出，缓存上一行的目录编号可省去大部分字典查找。
+        """
+        last_dir = None
+        last_id = -1
+        dir_ids = self.dir_ids
+        names = self.names
+        sizes = self.sizes
+        mtimes = self.mtimes
+        added = 0
+        for directory, name, size, mtime in rows:
+            if directory is not last_dir and directory != last_dir:
+                last_dir = directory
+                last_id = self._intern_dir(directory)
+            dir_ids.append(last_id)
+            names.append(name)
+            sizes.append(size)
+            mtimes.append(mtime)
+            added += size
+        self.total_size += added
+
+    def select(self, rows):
+        """返回只含指定行号（按给定顺序）的新结果表"""
+        dirs = self.dirs
+        dir_ids = self.dir_ids
+        names = self.names
+        sizes = self.sizes
+        mtimes = self.mtimes
+        results = ScanResults()
+        results.extend((dirs[dir_ids[i]], names[i], sizes[i], mtimes[i]) for i in rows)
+        return results
+
+    def replace_directories(self, changes):
+        """用 {目录: 行列表} 替换这些目录的全部行（空列表表示该目录已无匹配文件）
+
+        只有确实存在旧行时才压缩一次各列，新行追加在末尾；用于监视模式按目录增量更新。
+        """
+        stale = {self._dir_ids[directory] for directory in changes if directory in self._dir_ids}
+        if stale:
+            keep = [i for i, dir_id in enumerate(self.dir_ids) if dir_id not in stale]
+            if len(keep) != len(self.names):
+                names = self.names
+                sizes = self.sizes
+                mtimes = self.mtimes
+                dir_ids = self.dir_ids
+                self.dir_ids = array('i', [dir_ids[i] for i in keep])
+                self.names = [names[i] for i in keep]
+                self.sizes = array('q', [sizes[i] for i in keep])
+                self.mtimes = array('d', [mtimes[i] for i in keep])
+                self.total_size = sum(self.sizes)
+                self.generation += 1
+        for rows in changes.values():
+            self.extend(rows)
+
+    def clear(self):
+        """清空所有行"""
+        generation = self.generation + 1
+        self.__init__()
+        self.generation = generation
+
+    def directory(self, index):
+        return self.dirs[self.dir_ids[index]]
+
+    def name(self, index):
+        return self.names[index]
+
+    def path(self, index):
+        return os.path.join(self.dirs[self.dir_ids[index]], self.names[index])
+
+    def size(self, index):
+        return self.sizes[index]
+
+    def mtime(self, index):
+        return self.mtimes[index]
+
+    def modified(self, index):
+        """按需创建该行的 datetime"""
+        return datetime.datetime.fromtimestamp(self.mtimes[index])
+
+    def iter_rows(self):
+        """依次产出 (目录, 文件名, 大小, 修改时间)"""
+        dirs = self.dirs
+        for dir_id, name, size, mtime in zip(self.dir_ids, self.names, self.sizes, self.mtimes):
+            yield dirs[dir_id], name, size, mtime
+
+    def cell_text(self, index, column):
+        """列表控件第 index 行第 column 列的显示文本：文件名、大小、修改时间、路径"""
+        if column == 0:
+            return self.names[index]
+        if column == 1:
+            return format_size(self.sizes[index])
+        if column == 2:
+            return format_mtime(self.mtimes[index])
+        return self.path(index)
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+删除引擎测试 - 并发删除、整体删除子树、流式删除、清理空目录
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import delete_engine
+from delete_engine import (
+    CHUNK_SIZE, ERROR_NOT_FOUND, DeletionJob, StreamingDeletionJob, collect_tree, group_by_device, group_rows_by_directory,
+    remove_empty_dirs, remove_files_in_directory, remove_tree, split_chunks, split_subtrees
+)
+from file_filters import FilterRules, compile_filter
+from scan_engine import SubtreeTracker, WhitelistMatcher, iter_matching_files
+from scan_results import ScanResults
+
+
+def touch(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def run_job(job, timeout=30):
+    """同步运行删除任务，返回 (最终进度, 是否取消)"""
+    finished = threading.Event()
+    outcome = []
+
+    def on_done(progress, cancelled):
+        outcome.append((progress, cancelled))
+        finished.set()
+
+    job.on_done = on_done
+    job.start()
+    if not finished.wait(timeout):
+        raise AssertionError("删除任务没有结束")
+    return outcome[0]
+
+
+class FakeTrash:
+    """记录调用的回收站后端：直接删除，不移动"""
+
+    def __init__(self):
+        self.calls = []
+
+    def trash_files(self, directory, names, on_result, on_reserved=None):
+        self.calls.append((directory, sorted(names)))
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            on_result(name, None)
+
+
+class TempTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.match = compile_filter(FilterRules(extensions=['.tmp']))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def scan(self):
+        tracker = SubtreeTracker()
+        results = ScanResults()
+        results.extend(iter_matching_files(self.root, self.match, subtrees=tracker))
+        return results, tracker.subtrees
+
+
+def results_for(paths, size=1):
+    results = ScanResults()
+    results.extend((os.path.dirname(path), os.path.basename(path), size, 0.0) for path in paths)
+    return results
+
+
+class DeletionJobTest(TempTreeTest):
+
+    def setUp(self):
+        super().setUp()
+        self.paths = [self.path(d, f"f{i}.tmp") for d in ('a', 'b') for i in range(5)]
+        for path in self.paths:
+            touch(path)
+
+    def test_group_rows_by_directory(self):
+        groups = dict(group_rows_by_directory(results_for(self.paths[::-1], size=3)))
+        self.assertEqual(sorted(groups), [self.path('a'), self.path('b')])
+        self.assertEqual(sorted(groups[self.path('a')]), [(f"f{i}.tmp", 3) for i in range(5)])
+
+    def test_group_by_device(self):
+        groups = [(self.path('a'), 1), (self.path('b'), 2), (self.path('missing'), 3)]
+        devices = group_by_device(groups)
+        device = os.stat(self.root).st_dev
+        self.assertEqual(devices[device], groups[:2])
+        self.assertEqual(devices[None], groups[2:])
+
+    def test_split_chunks(self):
+        files = [(f"f{i}", 1) for i in range(5)]
+        chunks = split_chunks([('d', files)], chunk_size=2)
+        self.assertEqual(chunks, [('d', files[0:2]), ('d', files[2:4]), ('d', files[4:5])])
+
+    def test_remove_files_reports_each_result(self):
+        seen = []
+        remove_files_in_directory(self.path('a'), ['f0.tmp', 'missing.tmp', 'f1.tmp'],
+                                  lambda name, error: seen.append((name, type(error))))
+        self.assertEqual(seen, [('f0.tmp', type(None)), ('missing.tmp', FileNotFoundError),
+                                ('f1.tmp', type(None))])
+        self.assertEqual(sorted(os.listdir(self.path('a'))), [f"f{i}.tmp" for i in range(2, 5)])
+
+    def test_remove_files_in_missing_directory(self):
+        seen = []
+        remove_files_in_directory(self.path('missing'), ['x', 'y'], lambda name, error: seen.append(name))
+        self.assertEqual(seen, ['x', 'y'])
+
+    def test_job_deletes_and_reports(self):
+        paths = self.paths + [self.path('a', 'gone.tmp')]
+        reported = []
+        job = DeletionJob(results_for(paths, size=2), False, lambda progress: None, None,
+                          on_file=lambda path, error: reported.append((path, error is None)))
+        progress, cancelled = run_job(job)
+        self.assertFalse(cancelled)
+        self.assertEqual((progress.success, progress.failed, progress.bytes_done), (10, 1, 20))
+        self.assertEqual(progress.total_files, 11)
+        self.assertEqual(progress.error_counts, {ERROR_NOT_FOUND: 1})
+        self.assertEqual(progress.errors[0][:2], (self.path('a', 'gone.tmp'), ERROR_NOT_FOUND))
+        self.assertEqual(sorted(reported), sorted((path, path in self.paths) for path in paths))
+        self.assertEqual(os.listdir(self.path('a')) + os.listdir(self.path('b')), [])
+
+    def test_large_directory_is_split_into_chunks(self):
+        big = [self.path('big', f"g{i}.tmp") for i in range(CHUNK_SIZE + 1)]
+        job = DeletionJob(results_for(big + self.paths), False, lambda progress: None, None)
+        sizes = sorted(len(entry[2]) for _, entry in job._plan())
+        self.assertEqual(sizes, [1, 5, 5, CHUNK_SIZE])
+
+    def test_cancel_stops_after_current_chunk(self):
+        job = DeletionJob(results_for(self.paths), False, lambda progress: None, None, workers_per_device=1)
+        job.on_file = lambda path, error: job.cancel()
+        with mock.patch.object(delete_engine.split_chunks, '__defaults__', (2,)):
+            progress, cancelled = run_job(job)
+        self.assertTrue(cancelled)
+        self.assertEqual(progress.success, 2)
+        left = os.listdir(self.path('a')) + os.listdir(self.path('b'))
+        self.assertEqual(len(left), 8)
+
+
+class SubtreeTest(TempTreeTest):
+
+    def setUp(self):
+        super().setUp()
+        touch(self.path('keep.txt'))
+        touch(self.path('loose.tmp'))
+        touch(self.path('cache', 'a.tmp'), b'aa')
+        touch(self.path('cache', 'deep', 'b.tmp'), b'bbb')
+        os.mkdir(self.path('cache', 'empty'))
+        touch(self.path('mixed', 'c.tmp'))
+        touch(self.path('mixed', 'keep.txt'))
+
+    def test_split_subtrees(self):
+        results, subtrees = self.scan()
+        self.assertEqual(subtrees, [self.path('cache')])
+        remaining, entries = split_subtrees(results, subtrees)
+        self.assertEqual(entries, [(self.path('cache'), 2, 5)])
+        paths = [os.path.join(remaining.dirs[d], name) for d, name in zip(remaining.dir_ids, remaining.names)]
+        self.assertEqual(sorted(paths), [self.path('loose.tmp'), self.path('mixed', 'c.tmp')])
+        self.assertEqual(remaining.total_size, 2)
+
+    def test_remove_tree_deletes_empty_subdirectories(self):
+        errors = []
+        files, nbytes, dirs, kept = remove_tree(self.path('cache'), self.match,
+                                                lambda path, e: errors.append(path))
+        self.assertEqual((files, nbytes, dirs, kept, errors), (2, 5, 3, 0, []))
+        self.assertFalse(os.path.lexists(self.path('cache')))
+
+    def test_remove_tree_keeps_file_created_after_scan(self):
+        _, subtrees = self.scan()
+        touch(self.path('cache', 'deep', 'new.txt'))
+        files, _, dirs, kept = remove_tree(subtrees[0], self.match, lambda path, e: None)
+        self.assertEqual((files, kept), (2, 1))
+        # 只有空目录被删除，新文件及其上级目录保留
+        self.assertEqual(dirs, 1)
+        self.assertTrue(os.path.exists(self.path('cache', 'deep', 'new.txt')))
+        self.assertFalse(os.path.exists(self.path('cache', 'a.tmp')))
+        self.assertFalse(os.path.exists(self.path('cache', 'deep', 'b.tmp')))
+
+    def test_remove_tree_ignores_whitelisted_child(self):
+        touch(self.path('cache', '.git', 'c.tmp'))
+        files, _, _, kept = remove_tree(self.path('cache'), self.match, lambda path, e: None,
+                                        whitelist=WhitelistMatcher(['.git']))
+        self.assertEqual(files, 2)
+        self.assertGreaterEqual(kept, 1)
+        self.assertTrue(os.path.exists(self.path('cache', '.git', 'c.tmp')))
+
+    def test_collect_tree(self):
+        groups = collect_tree(self.path('cache'), self.match)
+        self.assertEqual(sorted((os.path.relpath(top, self.root), files) for top, files in groups),
+                         [('cache', [('a.tmp', 2)]), (os.path.join('cache', 'deep'), [('b.tmp', 3)])])
+        touch(self.path('cache', 'deep', 'new.txt'))
+        self.assertIsNone(collect_tree(self.path('cache'), self.match))
+        self.assertEqual(len(collect_tree(self.path('cache'), self.match, strict=False)), 2)
+
+    def test_collect_tree_strict_rejects_whitelisted_child(self):
+        os.mkdir(self.path('cache', '.git'))
+        whitelist = WhitelistMatcher(['.git'])
+        self.assertIsNone(collect_tree(self.path('cache'), self.match, whitelist))
+        self.assertEqual(len(collect_tree(self.path('cache'), self.match, whitelist, strict=False)), 2)
+
+    def trash_subtrees(self):
+        results, subtrees = self.scan()
+        remaining, entries = split_subtrees(results, subtrees)
+        backend = FakeTrash()
+        job = DeletionJob(remaining, True, lambda progress: None, None, subtrees=entries, match_name=self.match)
+        with mock.patch('trash_backend.get_trash_backend', return_value=backend):
+            progress, cancelled = run_job(job)
+        self.assertFalse(cancelled)
+        return backend, progress
+
+    def test_trash_moves_unchanged_subtree_in_one_call(self):
+        backend, progress = self.trash_subtrees()
+        self.assertIn((self.root, ['cache']), backend.calls)
+        self.assertEqual((progress.success, progress.failed), (4, 0))
+
+    def test_trash_falls_back_to_files_when_subtree_changed(self):
+        results, subtrees = self.scan()
+        remaining, entries = split_subtrees(results, subtrees)
+        touch(self.path('cache', 'deep', 'new.txt'))
+        backend = FakeTrash()
+        job = DeletionJob(remaining, True, lambda progress: None, None, subtrees=entries, match_name=self.match)
+        with mock.patch('trash_backend.get_trash_backend', return_value=backend):
+            progress, _ = run_job(job)
+        self.assertNotIn((self.root, ['cache']), backend.calls)
+        self.assertIn((self.path('cache'), ['a.tmp']), backend.calls)
+        self.assertIn((self.path('cache', 'deep'), ['b.tmp']), backend.calls)
+        self.assertTrue(os.path.exists(self.path('cache', 'deep', 'new.txt')))
+        self.assertEqual(progress.failed, 0)
+
+
+class StreamingDeletionTest(TempTreeTest):
+
+    def setUp(self):
+        super().setUp()
+        self.paths = [self.path(d, f"f{i}.tmp") for d in ('a', 'b') for i in range(10)]
+        for path in self.paths:
+            touch(path)
+        self.produced = 0
+
+    def scan_func(self, cancel_event):
+        for path in self.paths:
+            self.produced += 1
+            yield os.path.dirname(path), os.path.basename(path), 1, 0.0
+
+    def remaining(self):
+        return [path for path in self.paths if os.path.exists(path)]
+
+    def test_deletes_everything_scanned(self):
+        job = StreamingDeletionJob(self.scan_func, False, lambda progress: None, None, batch_size=3)
+        progress, cancelled = run_job(job)
+        self.assertFalse(cancelled)
+        self.assertEqual((progress.success, progress.total_files, progress.total_bytes), (20, 20, 20))
+        self.assertEqual(self.remaining(), [])
+
+    def test_dry_run_deletes_nothing(self):
+        reported = []
+        job = StreamingDeletionJob(self.scan_func, False, lambda progress: None, None, dry_run=True,
+                                   on_file=lambda path, error: reported.append(path))
+        progress, _ = run_job(job)
+        self.assertEqual((progress.success, progress.bytes_done), (20, 20))
+        self.assertEqual(sorted(reported), sorted(self.paths))
+        self.assertEqual(self.remaining(), self.paths)
+
+    def threshold_job(self, proceed, **limits):
+        asked = []
+
+        def on_threshold(snapshot, resume):
+            asked.append(snapshot.total_files)
+            resume(proceed)
+
+        job = StreamingDeletionJob(self.scan_func, False, lambda progress: None, None,
+                                   on_threshold=on_threshold, **limits)
+        progress, cancelled = run_job(job)
+        self.assertFalse(cancelled)
+        return job, progress, asked
+
+    def test_threshold_stop(self):
+        job, progress, asked = self.threshold_job(False, max_files=7)
+        self.assertEqual(asked, [7])
+        self.assertTrue(job.limit_reached)
+        self.assertEqual((progress.success, progress.total_files), (7, 7))
+        self.assertEqual(len(self.remaining()), 13)
+
+    def test_threshold_resume(self):
+        job, progress, asked = self.threshold_job(True, max_bytes=5)
+        # 继续后不再设阈值，只询问一次
+        self.assertEqual(asked, [5])
+        self.assertFalse(job.limit_reached)
+        self.assertEqual(progress.success, 20)
+        self.assertEqual(self.remaining(), [])
+
+    def test_threshold_without_callback_stops(self):
+        job = StreamingDeletionJob(self.scan_func, False, lambda progress: None, None, max_files=3)
+        progress, _ = run_job(job)
+        self.assertTrue(job.limit_reached)
+        self.assertEqual(progress.success, 3)
+
+    def test_full_queue_blocks_scan(self):
+        release = threading.Event()
+        job = StreamingDeletionJob(self.scan_func, False, lambda progress: None, None, workers=1,
+                                   batch_size=1, queue_size=1,
+                                   on_file=lambda path, error: release.wait(10))
+        finished = threading.Event()
+        job.on_done = lambda progress, cancelled: finished.set()
+        job.start()
+        time.sleep(0.3)
+        # 删除线程手里一批、队列中一批、阻塞在 put 上一批、正在组装一批
+        self.assertLessEqual(self.produced, 4)
+        self.assertFalse(finished.is_set())
+        release.set()
+        self.assertTrue(finished.wait(30))
+        self.assertEqual(self.produced, 20)
+        self.assertEqual(self.remaining(), [])
+
+    def test_scan_error_ends_job(self):
+        def scan_func(cancel_event):
+            yield self.path('a'), 'f0.tmp', 1, 0.0
+            raise FileNotFoundError(self.path('gone'))
+
+        job = StreamingDeletionJob(scan_func, False, lambda progress: None, None)
+        _, cancelled = run_job(job)
+        self.assertFalse(cancelled)
+        self.assertIsInstance(job.scan_error, FileNotFoundError)
+
+
+class PruneEmptyDirsTest(TempTreeTest):
+
+    def setUp(self):
+        super().setUp()
+        self.prune_root = self.path('root')
+        for parts in (('a', 'b', 'c'), ('full', 'empty'), ('.git', 'objects')):
+            os.makedirs(os.path.join(self.prune_root, *parts))
+        touch(os.path.join(self.prune_root, 'full', 'keep.txt'))
+
+    def prune_path(self, *parts):
+        return os.path.join(self.prune_root, *parts)
+
+    def test_stops_at_prune_root(self):
+        removed, failed = remove_empty_dirs([self.prune_path('a', 'b', 'c')], self.prune_root)
+        self.assertEqual((removed, failed), (3, 0))
+        self.assertEqual(sorted(os.listdir(self.prune_root)), ['.git', 'full'])
+        # 根目录本身和根目录之外的目录都保留
+        self.assertEqual(remove_empty_dirs([self.prune_root, self.root], self.prune_root), (0, 0))
+        self.assertTrue(os.path.isdir(self.prune_root))
+
+    def test_outside_root_untouched(self):
+        os.makedirs(self.path('other', 'empty'))
+        self.assertEqual(remove_empty_dirs([self.path('other', 'empty'), self.prune_root], self.prune_root), (0, 0))
+        self.assertTrue(os.path.isdir(self.path('other', 'empty')))
+
+    def test_leaves_non_empty_and_whitelisted(self):
+        removed, failed = remove_empty_dirs(
+            [self.prune_path('full', 'empty'), self.prune_path('.git', 'objects')], self.prune_root,
+            WhitelistMatcher(['.git']))
+        self.assertEqual((removed, failed), (1, 0))
+        self.assertTrue(os.path.isdir(self.prune_path('.git', 'objects')))
+        self.assertEqual(os.listdir(self.prune_path('full')), ['keep.txt'])
+
+    def test_directory_refilled_during_prune(self):
+        rmdir = os.rmdir
+
+        def refill_then_rmdir(path, *args, **kwargs):
+            # 另一个进程在清理途中往上级目录写入了文件
+            if path == self.prune_path('a', 'b', 'c'):
+                touch(self.prune_path('a', 'b', 'new.txt'))
+            return rmdir(path, *args, **kwargs)
+
+        with mock.patch('os.rmdir', side_effect=refill_then_rmdir):
+            removed, failed = remove_empty_dirs([self.prune_path('a', 'b', 'c')], self.prune_root)
+        self.assertEqual((removed, failed), (1, 0))
+        self.assertTrue(os.path.exists(self.prune_path('a', 'b', 'new.txt')))
+
+    def test_job_prunes_after_deletion(self):
+        paths = [self.prune_path('a', 'b', 'c', 'f.tmp'), self.prune_path('full', 'g.tmp'),
+                 self.prune_path('.git', 'objects', 'h.tmp')]
+        for path in paths:
+            touch(path)
+        job = DeletionJob(results_for(paths), False, lambda progress: None, None, prune_root=[self.prune_root],
+                          whitelist=WhitelistMatcher(['.git']))
+        progress, _ = run_job(job)
+        self.assertEqual((progress.success, progress.dirs_removed, progress.dirs_failed), (3, 3, 0))
+        self.assertEqual(sorted(os.listdir(self.prune_root)), ['.git', 'full'])
+        self.assertTrue(os.path.isdir(self.prune_path('.git', 'objects')))
+
+    def test_cancelled_job_does_not_prune(self):
+        path = self.prune_path('a', 'b', 'c', 'f.tmp')
+        touch(path)
+        job = DeletionJob(results_for([path]), False, lambda progress: None, None, prune_root=self.prune_root)
+        job.on_file = lambda path, error: job.cancel()
+        progress, cancelled = run_job(job)
+        self.assertTrue(cancelled)
+        self.assertEqual(progress.dirs_removed, 0)
+        self.assertTrue(os.path.isdir(self.prune_path('a', 'b', 'c')))
+
+
+if __name__ == '__main__':
+    unittest.main()
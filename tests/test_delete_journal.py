@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+删除日志测试 - 回收站位置在移动之前落盘，分组中途退出后仍可撤销
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delete_journal import create_journal, open_journal, read_journal, restore_trashed
+
+
+class Crash(BaseException):
+    """模拟进程在移动途中退出"""
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "需要 XDG 回收站")
+class TrashJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmp, 'source')
+        os.mkdir(self.source)
+        self.names = [f"f{i}.tmp" for i in range(10)]
+        for name in self.names:
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write('x')
+        with mock.patch.dict(os.environ, {'XDG_DATA_HOME': os.path.join(self.tmp, 'data')}):
+            from trash_backend import XdgTrashBackend
+            self.backend = XdgTrashBackend()
+        self.journal_dir = os.path.join(self.tmp, 'journals')
+        os.mkdir(self.journal_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_undo_after_crash_mid_group(self):
+        journal = create_journal(True, directory=self.journal_dir)
+        journal.write_plan([(0, ('files', self.source, [(name, 1) for name in self.names]))])
+        rename = os.rename
+        calls = []
+
+        def crashing_rename(*args, **kwargs):
+            calls.append(args)
+            if len(calls) > 4:
+                raise Crash()
+            return rename(*args, **kwargs)
+
+        def on_reserved(items):
+            journal.trashed([[os.path.join(self.source, name), trash_path] for name, trash_path in items])
+
+        with mock.patch('os.rename', crashing_rename):
+            with self.assertRaises(Crash):
+                self.backend.trash_files(self.source, self.names, lambda name, error: None, on_reserved)
+        journal.close()
+
+        self.assertEqual(len(os.listdir(self.source)), 6)
+        state = read_journal(journal.path)
+        self.assertTrue(state.resumable)
+        self.assertEqual(len(state.restorable), 10)
+
+        journal = open_journal(journal.path)
+        restored, failed, _ = restore_trashed(journal)
+        journal.close()
+        self.assertEqual((restored, failed), (4, 0))
+        self.assertEqual(sorted(os.listdir(self.source)), sorted(self.names))
+        trash_dir = os.path.join(self.tmp, 'data', 'Trash')
+        self.assertEqual(os.listdir(os.path.join(trash_dir, 'files')), [])
+        self.assertEqual(os.listdir(os.path.join(trash_dir, 'info')), [])
+        self.assertEqual(read_journal(journal.path).restorable, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
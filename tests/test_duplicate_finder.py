@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重复文件查找测试 - 分阶段比较、硬链接、保留规则、删除前复查
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duplicate_finder
+from duplicate_finder import (
+    KEEP_NEWEST, KEEP_OLDEST, KEEP_SHORTEST_PATH, PARTIAL_SIZE, DuplicateGroup, DuplicateProgress,
+    drop_changed, find_duplicates, select_redundant
+)
+from scan_results import ScanResults
+
+
+class FindDuplicatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def rows(self, *names):
+        rows = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            st = os.stat(path)
+            rows.append((os.path.dirname(path), os.path.basename(path), st.st_size, st.st_mtime))
+        return rows
+
+    @staticmethod
+    def group_names(groups):
+        return [sorted(row[1] for row in group.files) for group in groups]
+
+    def test_small_and_large_duplicates(self):
+        big = os.urandom(3 * PARTIAL_SIZE)
+        self.write('a.txt', b'same')
+        self.write('b.txt', b'same')
+        self.write('c.txt', b'diff')
+        self.write('big1', big)
+        self.write('big2', big)
+        # 首尾相同、中间不同：只有全文哈希能区分
+        self.write('big3', big[:PARTIAL_SIZE] + b'\0' * PARTIAL_SIZE + big[-PARTIAL_SIZE:])
+        groups = find_duplicates(self.rows('a.txt', 'b.txt', 'c.txt', 'big1', 'big2', 'big3'), workers=2)
+        self.assertEqual(self.group_names(groups), [['big1', 'big2'], ['a.txt', 'b.txt']])
+        self.assertEqual(groups[0].reclaimable, len(big))
+
+    @unittest.skipUnless(hasattr(os, 'link'), "需要硬链接")
+    def test_hardlinks_count_once(self):
+        self.write('a.txt', b'data')
+        os.link(os.path.join(self.root, 'a.txt'), os.path.join(self.root, 'link.txt'))
+        progress = DuplicateProgress()
+        self.assertEqual(find_duplicates(self.rows('a.txt', 'link.txt'), progress=progress), [])
+        self.assertEqual(progress.hardlinks, 1)
+
+        self.write('copy.txt', b'data')
+        groups = find_duplicates(self.rows('a.txt', 'link.txt', 'copy.txt'))
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(len(groups[0].files), 2)
+        self.assertIn('copy.txt', self.group_names(groups)[0])
+
+    def test_size_changed_after_scan(self):
+        self.write('a.txt', b'same')
+        self.write('b.txt', b'same')
+        self.write('c.txt', b'same')
+        rows = self.rows('a.txt', 'b.txt', 'c.txt')
+        self.write('c.txt', b'same!')
+        progress = DuplicateProgress()
+        groups = find_duplicates(rows, progress=progress)
+        self.assertEqual(self.group_names(groups), [['a.txt', 'b.txt']])
+        self.assertEqual(progress.errors, 1)
+
+    def test_size_changed_between_partial_and_full_hash(self):
+        big = os.urandom(3 * PARTIAL_SIZE)
+        for name in ('big1', 'big2', 'big3'):
+            self.write(name, big)
+        rows = self.rows('big1', 'big2', 'big3')
+        original = duplicate_finder.partial_digest
+
+        def partial_then_grow(path, size):
+            result = original(path, size)
+            if path.endswith('big3'):
+                with open(path, 'ab') as f:
+                    f.write(b'more')
+            return result
+
+        progress = DuplicateProgress()
+        with mock.patch('duplicate_finder.partial_digest', partial_then_grow):
+            groups = find_duplicates(rows, workers=1, progress=progress)
+        self.assertEqual(self.group_names(groups), [['big1', 'big2']])
+        self.assertEqual(progress.errors, 1)
+
+    def test_cancel_returns_empty(self):
+        self.write('a.txt', b'same')
+        self.write('b.txt', b'same')
+        rows = self.rows('a.txt', 'b.txt')
+        cancel = threading.Event()
+        cancel.set()
+        self.assertEqual(find_duplicates(rows, cancel_event=cancel), [])
+
+        cancel.clear()
+        original = duplicate_finder.partial_digest
+
+        def cancel_during_partial(path, size):
+            cancel.set()
+            return original(path, size)
+
+        with mock.patch('duplicate_finder.partial_digest', cancel_during_partial):
+            self.assertEqual(find_duplicates(rows, workers=1, cancel_event=cancel), [])
+
+    def test_drop_changed(self):
+        self.write('a.txt', b'same')
+        self.write('b.txt', b'same')
+        self.write('c.txt', b'same')
+        results = ScanResults()
+        results.extend(self.rows('a.txt', 'b.txt', 'c.txt'))
+        self.write('b.txt', b'other')
+        os.remove(os.path.join(self.root, 'c.txt'))
+        unchanged, changed = drop_changed(results)
+        self.assertEqual(list(unchanged.iter_rows()), self.rows('a.txt'))
+        self.assertEqual(changed, [os.path.join(self.root, 'b.txt'), os.path.join(self.root, 'c.txt')])
+
+
+class ChooseKeepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.group = DuplicateGroup(4, b'digest', [
+            ('/data/b', 'x', 4, 200.0),
+            ('/data/a/deeper', 'x', 4, 100.0),
+            ('/data/a', 'x', 4, 300.0),
+            ('/data/c', 'x', 4, 300.0),
+        ])
+
+    def test_files_sorted_by_full_path(self):
+        self.assertEqual([row[0] for row in self.group.files],
+                         ['/data/a/deeper', '/data/a', '/data/b', '/data/c'])
+
+    def test_rules(self):
+        self.group.choose_keep(KEEP_NEWEST)
+        # 修改时间相同时取路径靠前的一个
+        self.assertEqual(self.group.kept_path(), os.path.join('/data/a', 'x'))
+        self.group.choose_keep(KEEP_OLDEST)
+        self.assertEqual(self.group.kept_path(), os.path.join('/data/a/deeper', 'x'))
+        self.group.choose_keep(KEEP_SHORTEST_PATH)
+        self.assertEqual(self.group.kept_path(), os.path.join('/data/a', 'x'))
+        with self.assertRaises(ValueError):
+            self.group.choose_keep('largest')
+
+    def test_select_redundant(self):
+        redundant = select_redundant([self.group], KEEP_OLDEST)
+        self.assertEqual(sorted(redundant.path(i) for i in range(len(redundant))),
+                         [os.path.join(d, 'x') for d in ('/data/a', '/data/b', '/data/c')])
+        self.assertEqual(redundant.total_size, 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录监视测试 - inotify 增量更新、事件队列溢出、根目录消失、增量重扫回退
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_filters import FilterRules, compile_filter
+from fs_watch import IN_Q_OVERFLOW, MODE_POLL, WatchJob, inotify_available
+
+
+def touch(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class WatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.base = os.path.realpath(tempfile.mkdtemp())
+        self.root = os.path.join(self.base, 'root')
+        self.outside = os.path.join(self.base, 'outside')
+        os.mkdir(self.root)
+        os.mkdir(self.outside)
+        touch(self.path('a.tmp'))
+        touch(self.path('keep.txt'))
+        touch(self.path('sub', 'b.tmp'))
+        self.match = compile_filter(FilterRules(extensions=['.tmp']))
+        # 增量重扫使用的扫描索引放在临时目录中
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.base, 'cache')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lock = threading.Lock()
+        self.state = {}
+        self.scanned = threading.Event()
+        self.stopped = threading.Event()
+        self.stop_error = None
+        self.job = None
+
+    def tearDown(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.stopped.wait(10)
+        shutil.rmtree(self.base)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def on_batch(self, rows):
+        with self.lock:
+            for row in rows:
+                self.state.setdefault(row[0], []).append(row)
+
+    def on_change(self, changes):
+        with self.lock:
+            for directory, rows in changes.items():
+                if rows:
+                    self.state[directory] = list(rows)
+                else:
+                    self.state.pop(directory, None)
+
+    def on_stopped(self, error):
+        self.stop_error = error
+        self.stopped.set()
+
+    def paths(self):
+        with self.lock:
+            return sorted(os.path.join(row[0], row[1]) for rows in self.state.values() for row in rows)
+
+    def start(self, **kwargs):
+        self.job = WatchJob(self.root, self.match, self.on_batch, lambda cancelled, error: self.scanned.set(),
+                            self.on_change, on_stopped=self.on_stopped, coalesce_delay=0.05, **kwargs)
+        self.job.start()
+        self.assertTrue(self.scanned.wait(10))
+        self.assertEqual(self.paths(), [self.path('a.tmp'), self.path('sub', 'b.tmp')])
+
+    def wait_for(self, expected, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.paths() == sorted(expected):
+                return
+            time.sleep(0.02)
+        self.assertEqual(self.paths(), sorted(expected))
+
+    @unittest.skipUnless(inotify_available(), "需要 inotify")
+    def test_subtree_moved_in_and_out(self):
+        self.start()
+        touch(os.path.join(self.outside, 'moved', 'deep', 'c.tmp'))
+        touch(os.path.join(self.outside, 'moved', 'd.txt'))
+        os.rename(os.path.join(self.outside, 'moved'), self.path('moved'))
+        self.wait_for([self.path('a.tmp'), self.path('sub', 'b.tmp'), self.path('moved', 'deep', 'c.tmp')])
+
+        # 移入的子树同样被监视
+        touch(self.path('moved', 'deep', 'e.tmp'))
+        self.wait_for([self.path('a.tmp'), self.path('sub', 'b.tmp'), self.path('moved', 'deep', 'c.tmp'),
+                       self.path('moved', 'deep', 'e.tmp')])
+
+        os.rename(self.path('moved'), os.path.join(self.outside, 'moved'))
+        os.rename(self.path('sub'), os.path.join(self.outside, 'sub'))
+        self.wait_for([self.path('a.tmp')])
+        self.assertEqual(self.job.watched_dirs, 1)
+        self.assertFalse(self.stopped.is_set())
+
+    @unittest.skipUnless(inotify_available(), "需要 inotify")
+    def test_root_deleted_stops_with_error(self):
+        self.start()
+        shutil.rmtree(self.root)
+        self.assertTrue(self.stopped.wait(10))
+        self.assertIsInstance(self.stop_error, FileNotFoundError)
+        self.assertEqual(self.paths(), [])
+
+    def test_queue_overflow_relists_every_directory(self):
+        job = WatchJob(self.root, self.match, self.on_batch, None, self.on_change, use_inotify=False)
+        job._initial_scan()
+        # 没有收到任何事件的变化
+        touch(self.path('new.tmp'))
+        os.remove(self.path('sub', 'b.tmp'))
+        dirty, removed, created = set(), set(), {}
+        job._collect([(-1, IN_Q_OVERFLOW, 0, '')], dirty, removed, created)
+        self.assertEqual(dirty, {self.root, self.path('sub')})
+        job._flush(dirty, removed, created)
+        self.assertEqual(self.paths(), [self.path('a.tmp'), self.path('new.tmp')])
+        self.assertEqual(job.dirs_relisted, 2)
+
+    def test_poll_fallback(self):
+        fallbacks = []
+        self.start(use_inotify=False, poll_interval=0.1, on_fallback=fallbacks.append)
+        self.assertEqual(self.job.mode, MODE_POLL)
+        touch(self.path('sub', 'deeper', 'c.tmp'))
+        os.remove(self.path('a.tmp'))
+        self.wait_for([self.path('sub', 'b.tmp'), self.path('sub', 'deeper', 'c.tmp')])
+        self.assertEqual(fallbacks, [])
+        self.assertIsNone(self.job.fallback_reason)
+
+
+if __name__ == '__main__':
+    unittest.main()
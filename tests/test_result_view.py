@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结果视图测试 - 排序、即时筛选、结果表增长和重排后的同步
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_view import COLUMN_NAME, COLUMN_PATH, COLUMN_SIZE, ResultView
+from scan_results import ScanResults
+
+ROOT = os.path.join(os.sep, 'data')
+
+
+def make_results(rows):
+    results = ScanResults()
+    results.extend((os.path.join(ROOT, d), name, size, float(size)) for d, name, size in rows)
+    return results
+
+
+class ResultViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.files = make_results([
+            ('b', 'Alpha.log', 30),
+            ('a', 'beta.txt', 10),
+            ('a', 'alphabet.log', 20),
+            ('c', 'gamma.txt', 40),
+        ])
+
+    def names(self, view):
+        return [self.files.name(view.index(i)) for i in range(len(view))]
+
+    def test_sort_and_reverse(self):
+        view = ResultView(self.files)
+        self.assertIsNone(view.rows)
+        view.sort(COLUMN_SIZE, ascending=False)
+        self.assertEqual(self.names(view), ['gamma.txt', 'Alpha.log', 'alphabet.log', 'beta.txt'])
+        view.sort(COLUMN_PATH)
+        self.assertEqual(self.names(view), ['alphabet.log', 'beta.txt', 'Alpha.log', 'gamma.txt'])
+        view.sort(None)
+        self.assertIsNone(view.rows)
+
+    def test_query_name_and_path(self):
+        view = ResultView(self.files, COLUMN_NAME)
+        view.set_query(" ALPHA ")
+        self.assertEqual(self.names(view), ['Alpha.log', 'alphabet.log'])
+        view.set_query(os.path.join(os.sep + 'a', 'al'))
+        self.assertEqual(self.names(view), ['alphabet.log'])
+        self.assertEqual(view.filtered_rows(), [2])
+        view.set_query("")
+        self.assertIsNone(view.filtered_rows())
+        self.assertEqual(len(view), 4)
+
+    def test_longer_query_filters_cached_superset(self):
+        view = ResultView(self.files)
+        view.set_query("al")
+        with mock.patch.object(view, '_matching', wraps=view._matching) as matching:
+            view.set_query("alpha")
+            # 只在 "al" 的结果中继续筛选
+            matching.assert_called_once_with("alpha", [0, 2])
+            matching.reset_mock()
+            view.set_query("al")
+            matching.assert_not_called()
+            # 名称查询的结果不是路径查询的超集
+            view.set_query(os.sep + "al")
+            matching.assert_called_once_with(os.sep + "al", None)
+        self.assertEqual(view.filtered_rows(), [0, 2])
+
+    def test_sync_appends_unsorted_tail(self):
+        view = ResultView(self.files, COLUMN_SIZE)
+        self.files.extend([(os.path.join(ROOT, 'd'), 'delta.log', 5, 5.0),
+                           (os.path.join(ROOT, 'd'), 'epsilon.txt', 50, 50.0)])
+        view.sync()
+        self.assertTrue(view.unsorted_tail)
+        self.assertEqual(self.names(view)[4:], ['delta.log', 'epsilon.txt'])
+        view.resort()
+        self.assertFalse(view.unsorted_tail)
+        self.assertEqual(self.names(view), ['delta.log', 'beta.txt', 'alphabet.log', 'Alpha.log',
+                                            'gamma.txt', 'epsilon.txt'])
+
+    def test_sync_filters_appended_rows(self):
+        view = ResultView(self.files, COLUMN_SIZE)
+        view.set_query(".log")
+        self.files.extend([(os.path.join(ROOT, 'd'), 'delta.log', 5, 5.0),
+                           (os.path.join(ROOT, 'd'), 'epsilon.txt', 1, 1.0)])
+        view.sync()
+        self.assertTrue(view.unsorted_tail)
+        self.assertEqual(self.names(view), ['alphabet.log', 'Alpha.log', 'delta.log'])
+        self.assertEqual(view.filtered_rows(), [0, 2, 4])
+        view.resort()
+        self.assertEqual(self.names(view), ['delta.log', 'alphabet.log', 'Alpha.log'])
+
+    def test_sync_after_rows_removed_rebuilds(self):
+        view = ResultView(self.files, COLUMN_SIZE)
+        view.set_query("a")
+        generation = self.files.generation
+        self.files.replace_directories({os.path.join(ROOT, 'a'): [
+            (os.path.join(ROOT, 'a'), 'zeta.dat', 1, 1.0)]})
+        self.assertNotEqual(self.files.generation, generation)
+        view.sync()
+        self.assertFalse(view.unsorted_tail)
+        self.assertEqual(self.names(view), ['zeta.dat', 'Alpha.log', 'gamma.txt'])
+        # 旧查询缓存中的行号已失效，不再复用
+        view.set_query("al")
+        self.assertEqual(self.names(view), ['Alpha.log'])
+
+    def test_select(self):
+        selected = self.files.select([3, 1])
+        self.assertEqual([selected.name(i) for i in range(len(selected))], ['gamma.txt', 'beta.txt'])
+        self.assertEqual(selected.total_size, 50)
+        self.assertEqual(selected.path(1), os.path.join(ROOT, 'a', 'beta.txt'))
+
+
+if __name__ == '__main__':
+    unittest.main()
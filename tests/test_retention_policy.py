@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保留策略测试 - 流式删除计划与"整体按修改时间排序、从最旧的开始删除"的直接实现对照
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_filters import FilterRules
+from retention_policy import REASON_AGE, REASON_SIZE_CAP, RetentionPlanner, RetentionPolicy
+
+NOW = 1000000.0
+DAY = 86400
+
+
+def reference_plan(rows, older_than_days=None, keep_newest=0, max_total_bytes=None):
+    """直接实现：每个目录最新的 keep_newest 个受保护；其余文件先按时间规则删除，
+    再把剩下的整体按修改时间排序（相同时按出现顺序），从最旧的开始删除直到总大小不超过上限。
+    返回 {(目录, 文件名): 原因}。
+    """
+    by_dir = {}
+    for index, row in enumerate(rows):
+        by_dir.setdefault(row[0], []).append((index, row))
+    protected = set()
+    for items in by_dir.values():
+        items.sort(key=lambda item: (-item[1][3], item[0]))
+        protected.update(index for index, _ in items[:keep_newest])
+
+    plan = {}
+    cutoff = NOW - older_than_days * DAY if older_than_days is not None else None
+    rest = []
+    for index, row in enumerate(rows):
+        if index in protected:
+            continue
+        if cutoff is not None and row[3] < cutoff:
+            plan[row[:2]] = REASON_AGE
+        else:
+            rest.append((row[3], index, row))
+    if max_total_bytes is not None:
+        kept = sum(rows[index][2] for index in protected) + sum(item[2][2] for item in rest)
+        for _, _, row in sorted(rest):
+            if kept <= max_total_bytes:
+                break
+            plan[row[:2]] = REASON_SIZE_CAP
+            kept -= row[2]
+    return plan
+
+
+def streaming_plan(rows, **kwargs):
+    policy = RetentionPolicy(FilterRules(name_globs=['*.log']), **kwargs)
+    planner = RetentionPlanner([policy], now=NOW)
+    plan = planner.run(iter(rows))
+    return {(plan.directory(i), plan.name(i)): reason for i, reason in enumerate(planner.reasons)}, planner
+
+
+def random_rows(rng, dirs, files_per_dir, unique_mtimes=True):
+    count = dirs * files_per_dir
+    if unique_mtimes:
+        mtimes = rng.sample(range(int(NOW) - 30 * DAY, int(NOW)), count)
+    else:
+        mtimes = [int(NOW) - rng.randrange(5) * DAY for _ in range(count)]
+    return [(f"/logs/d{i // files_per_dir}", f"f{i}.log", rng.randrange(1, 100), float(mtimes[i]))
+            for i in range(count)]
+
+
+class RetentionPlannerTest(unittest.TestCase):
+
+    def check(self, rows, **kwargs):
+        plan, _ = streaming_plan(rows, **kwargs)
+        self.assertEqual(plan, reference_plan(rows, **kwargs), kwargs)
+        return plan
+
+    def test_matches_reference_on_random_trees(self):
+        rng = random.Random(20)
+        for _ in range(200):
+            rows = random_rows(rng, rng.randrange(1, 6), rng.randrange(1, 12))
+            total = sum(row[2] for row in rows)
+            kwargs = {
+                'older_than_days': rng.choice([None, 3, 10, 20]),
+                'keep_newest': rng.choice([0, 1, 2, 5]),
+                'max_total_bytes': rng.choice([None, 0, total // 4, total // 2, total]),
+            }
+            self.check(rows, **kwargs)
+
+    def test_keep_newest_across_directories(self):
+        rows = []
+        for d in range(3):
+            for i in range(4):
+                rows.append((f"/logs/d{d}", f"f{i}.log", 10, NOW - (10 + i + d) * DAY))
+        plan, planner = streaming_plan(rows, older_than_days=1, keep_newest=2)
+        self.assertEqual(plan, reference_plan(rows, older_than_days=1, keep_newest=2))
+        # 每个目录各保留最新的两个
+        self.assertEqual(sorted(plan), [(f"/logs/d{d}", f"f{i}.log") for d in range(3) for i in (2, 3)])
+        self.assertEqual(planner.summary()[0]['protected_files'], 6)
+
+    def test_equal_mtime_arriving_after_eviction(self):
+        # 大文件超出上限被删除后，修改时间相同的小文件仍然放得下，不应一并删除
+        rows = [('/logs', 'big.log', 10, NOW - 5), ('/logs', 'new.log', 1, NOW - 1),
+                ('/logs', 'same.log', 1, NOW - 5)]
+        plan = self.check(rows, max_total_bytes=5)
+        self.assertEqual(plan, {('/logs', 'big.log'): REASON_SIZE_CAP})
+
+    def test_equal_mtimes_match_reference(self):
+        rng = random.Random(21)
+        for _ in range(200):
+            rows = random_rows(rng, rng.randrange(1, 4), rng.randrange(1, 10), unique_mtimes=False)
+            total = sum(row[2] for row in rows)
+            self.check(rows, max_total_bytes=rng.choice([0, total // 3, total // 2]))
+
+    def test_protected_after_size_cap_eviction(self):
+        # d0 的文件先进入预算；d1 的受保护文件随后占用预算，继续挤掉 d0 中最旧的文件
+        rows = [('/logs/d0', 'a.log', 10, NOW - 40), ('/logs/d0', 'b.log', 10, NOW - 30),
+                ('/logs/d0', 'c.log', 10, NOW - 20),
+                ('/logs/d1', 'p.log', 15, NOW - 50)]
+        plan = self.check(rows, keep_newest=1, max_total_bytes=30)
+        # c、p 受保护，共占用 25；d1 关闭前留下的 b 随后也超出预算
+        self.assertEqual(plan, {('/logs/d0', 'a.log'): REASON_SIZE_CAP,
+                                ('/logs/d0', 'b.log'): REASON_SIZE_CAP})
+
+    def test_protected_files_alone_exceed_cap(self):
+        rows = [('/logs/d0', 'a.log', 50, NOW - 40), ('/logs/d1', 'b.log', 50, NOW - 30),
+                ('/logs/d1', 'c.log', 5, NOW - 60)]
+        plan = self.check(rows, keep_newest=1, max_total_bytes=10)
+        self.assertEqual(plan, {('/logs/d1', 'c.log'): REASON_SIZE_CAP})
+
+    def test_first_matching_policy_owns_file(self):
+        policies = [RetentionPolicy(FilterRules(name_globs=['keep*']), keep_newest=10),
+                    RetentionPolicy(FilterRules(name_globs=['*.log']), older_than_days=1)]
+        planner = RetentionPlanner(policies, now=NOW)
+        rows = [('/logs', 'keep.log', 1, NOW - 10 * DAY), ('/logs', 'old.log', 1, NOW - 10 * DAY),
+                ('/logs', 'other.txt', 1, NOW - 10 * DAY)]
+        plan = planner.run(iter(rows))
+        self.assertEqual([plan.name(i) for i in range(len(plan))], ['old.log'])
+        self.assertEqual(planner.matched_files, 2)
+        self.assertFalse(planner.match_name('other.txt'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描引擎测试 - 多根目录去重、并行遍历
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scan_engine
+from scan_engine import ScanStats, build_suffix_matcher, dedupe_roots, iter_matching_files
+
+
+@unittest.skipUnless(hasattr(os, 'symlink') and os.name != 'nt', "需要符号链接")
+class DedupeRootsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = os.path.realpath(tempfile.mkdtemp())
+        self.a = os.path.join(self.tmp, 'a')
+        self.other = os.path.join(self.tmp, 'other')
+        os.mkdir(self.a)
+        os.mkdir(self.other)
+        self.link = os.path.join(self.a, 'link')
+        os.symlink(self.other, self.link)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_symlinked_root_under_another_root_is_kept(self):
+        # 遍历 a 时不跟随 link，link 指向的目录必须作为独立根目录扫描
+        kept, duplicates, failed = dedupe_roots([self.a, self.link])
+        self.assertEqual([root for root, _ in kept], [self.a, self.link])
+        self.assertEqual(duplicates, [])
+        self.assertEqual(failed, [])
+
+    def test_root_under_real_ancestor_is_dropped(self):
+        kept, duplicates, _ = dedupe_roots([self.tmp, self.link])
+        self.assertEqual([root for root, _ in kept], [self.tmp])
+        self.assertEqual(duplicates, [(self.link, self.tmp)])
+
+    def test_depth_limit_keeps_nested_roots(self):
+        kept, duplicates, _ = dedupe_roots([self.tmp, self.other], max_depth=1)
+        self.assertEqual([root for root, _ in kept], [self.tmp, self.other])
+        self.assertEqual(duplicates, [])
+
+
+class ParallelWalkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for a in range(6):
+            for b in range(5):
+                directory = os.path.join(self.root, f"a{a}", f"b{b}")
+                os.makedirs(directory)
+                for i in range(4):
+                    open(os.path.join(directory, f"f{i}.tmp"), 'w').close()
+        self.match = build_suffix_matcher(['.tmp'])
+        self.read_ahead = scan_engine.PARALLEL_READ_AHEAD
+
+    def tearDown(self):
+        scan_engine.PARALLEL_READ_AHEAD = self.read_ahead
+        shutil.rmtree(self.root)
+
+    def test_bounded_read_ahead_keeps_preorder(self):
+        expected = list(iter_matching_files(self.root, self.match))
+        for read_ahead in (1, 4):
+            scan_engine.PARALLEL_READ_AHEAD = read_ahead
+            stats = ScanStats()
+            self.assertEqual(list(iter_matching_files(self.root, self.match, workers=4, stats=stats)), expected)
+            self.assertEqual(stats.dirs_scanned, 37)
+
+    def test_worker_exception_is_raised(self):
+        def match(name):
+            if name == 'f3.tmp':
+                raise RuntimeError(name)
+            return name.endswith('.tmp')
+
+        with self.assertRaises(RuntimeError):
+            list(iter_matching_files(self.root, match, workers=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
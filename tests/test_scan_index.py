@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描索引测试 - 文件被就地修改后（目录 mtime 不变）带索引的重扫仍按最新的大小和修改时间筛选
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_filters import FilterRules, compile_filter
+from perf_metrics import PerfMetrics
+from scan_engine import iter_matching_files
+from scan_index import ScanIndex
+
+DAY = 86400
+
+
+class StaleIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, 'tree')
+        os.mkdir(self.root)
+        self.path = os.path.join(self.root, 'a.log')
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 10)
+        old = time.time() - 30 * DAY
+        os.utime(self.path, (old, old))
+        # 目录 mtime 早于不稳定时间窗，第二次扫描才会复用缓存
+        os.utime(self.root, (old, old))
+        self.index_path = os.path.join(self.tmp, 'index.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def scan(self, rules, metrics=None):
+        index = ScanIndex(self.index_path)
+        try:
+            names = [hit[1] for hit in iter_matching_files(
+                self.root, compile_filter(rules), index=index, metrics=metrics)]
+            return names, index.reused
+        finally:
+            index.close()
+
+    def modify_in_place(self):
+        """就地改写文件内容：文件的大小和 mtime 变化，目录 mtime 不变"""
+        dir_mtime = os.stat(self.root).st_mtime_ns
+        with open(self.path, 'r+b') as f:
+            f.write(b'y' * 100)
+        self.assertEqual(os.stat(self.root).st_mtime_ns, dir_mtime)
+
+    def check_rescan(self, rules, metrics=None):
+        self.assertEqual(self.scan(rules, metrics)[0], ['a.log'])
+        self.modify_in_place()
+        names, reused = self.scan(rules, metrics)
+        self.assertEqual(reused, 1)
+        self.assertEqual(names, [])
+
+    def test_older_than_uses_fresh_mtime(self):
+        self.check_rescan(FilterRules(extensions=['.log'], older_than_days=7))
+
+    def test_max_size_uses_fresh_size(self):
+        self.check_rescan(FilterRules(extensions=['.log'], max_size=50))
+
+    def test_timed_listing_uses_fresh_stat(self):
+        self.check_rescan(FilterRules(extensions=['.log'], older_than_days=7), metrics=PerfMetrics())
+
+    def test_removed_file_is_not_reported(self):
+        rules = FilterRules(extensions=['.log'], older_than_days=7)
+        self.assertEqual(self.scan(rules)[0], ['a.log'])
+        st = os.stat(self.root)
+        os.remove(self.path)
+        os.utime(self.root, ns=(st.st_atime_ns, st.st_mtime_ns))
+        # 目录 mtime 被还原时缓存仍然命中，重新 stat 失败的文件不应产出
+        names, reused = self.scan(rules)
+        self.assertEqual(reused, 1)
+        self.assertEqual(names, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回收站后端测试 - XDG 回收站的 .trashinfo 预留、重名和跨挂载点回退，send2trash 批量失败处理
+"""
+
+import errno
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trash_backend import Send2TrashBackend, XdgTrashBackend
+
+
+def touch(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class TempDirTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.src = os.path.join(self.root, 'src')
+        os.mkdir(self.src)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def trash(self, backend, directory, names, on_reserved=None):
+        results = []
+        backend.trash_files(directory, names, lambda name, error: results.append((name, error)), on_reserved)
+        return results
+
+
+@unittest.skipUnless(os.name == 'posix', "XDG 回收站只用于 POSIX 系统")
+class XdgTrashBackendTest(TempDirTest):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(os.environ, {'XDG_DATA_HOME': os.path.join(self.root, 'data')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = XdgTrashBackend()
+        self.files = os.path.join(self.root, 'data', 'Trash', 'files')
+        self.info = os.path.join(self.root, 'data', 'Trash', 'info')
+
+    def read_info(self, trash_name):
+        with open(os.path.join(self.info, trash_name + '.trashinfo'), encoding='utf-8') as f:
+            return f.read()
+
+    def test_info_reserved_before_move(self):
+        touch(os.path.join(self.src, 'a.txt'), b'aa')
+        touch(os.path.join(self.src, 'b c.txt'))
+        seen = []
+
+        def on_reserved(items):
+            # 回调时 .trashinfo 已写入，文件还没有移动
+            for name, trash_path in items:
+                info = os.path.join(self.info, os.path.basename(trash_path) + '.trashinfo')
+                seen.append((name, trash_path, os.path.exists(info), os.path.exists(os.path.join(self.src, name))))
+
+        results = self.trash(self.backend, self.src, ['a.txt', 'b c.txt'], on_reserved)
+        self.assertEqual(results, [('a.txt', None), ('b c.txt', None)])
+        self.assertEqual([item[:2] for item in seen],
+                         [('a.txt', os.path.join(self.files, 'a.txt')),
+                          ('b c.txt', os.path.join(self.files, 'b c.txt'))])
+        self.assertTrue(all(item[2] and item[3] for item in seen))
+        self.assertEqual(sorted(os.listdir(self.files)), ['a.txt', 'b c.txt'])
+        self.assertEqual(os.listdir(self.src), [])
+        info = self.read_info('b c.txt')
+        self.assertTrue(info.startswith("[Trash Info]\n"))
+        self.assertIn(f"Path={quote(os.path.join(self.src, 'b c.txt'))}\n", info)
+        self.assertIn("DeletionDate=", info)
+
+    def test_name_collisions(self):
+        for sub in ('one', 'two', 'three'):
+            touch(os.path.join(self.src, sub, 'a.txt'), sub.encode())
+            self.assertEqual(self.trash(self.backend, os.path.join(self.src, sub), ['a.txt']), [('a.txt', None)])
+        self.assertEqual(sorted(os.listdir(self.files)), ['a.txt', 'a.txt.2', 'a.txt.3'])
+        with open(os.path.join(self.files, 'a.txt.3'), 'rb') as f:
+            self.assertEqual(f.read(), b'three')
+        self.assertIn(quote(os.path.join(self.src, 'two', 'a.txt')), self.read_info('a.txt.2'))
+
+        # 只有 .trashinfo 没有文件的名称（另一个进程正在预留）同样不能使用
+        touch(os.path.join(self.info, 'b.txt.trashinfo'))
+        touch(os.path.join(self.src, 'b.txt'))
+        self.trash(self.backend, self.src, ['b.txt'])
+        self.assertTrue(os.path.exists(os.path.join(self.files, 'b.txt.2')))
+
+    def test_missing_file_releases_reservation(self):
+        touch(os.path.join(self.src, 'a.txt'))
+        results = self.trash(self.backend, self.src, ['gone.txt', 'a.txt'])
+        self.assertIsInstance(dict(results)['gone.txt'], FileNotFoundError)
+        self.assertIsNone(dict(results)['a.txt'])
+        self.assertEqual(os.listdir(self.info), ['a.txt.trashinfo'])
+
+    def test_exdev_falls_back_to_send2trash(self):
+        touch(os.path.join(self.src, 'a.txt'))
+        fallback = []
+
+        def send_one(directory, name, on_result):
+            fallback.append((directory, name))
+            on_result(name, None)
+
+        with mock.patch('os.rename', side_effect=OSError(errno.EXDEV, "cross-device link")), \
+                mock.patch('trash_backend._send2trash_one', side_effect=send_one):
+            results = self.trash(self.backend, self.src, ['a.txt'])
+        self.assertEqual(results, [('a.txt', None)])
+        self.assertEqual(fallback, [(self.src, 'a.txt')])
+        # 预留的 .trashinfo 已撤销
+        self.assertEqual(os.listdir(self.info), [])
+
+
+class Send2TrashBackendTest(TempDirTest):
+
+    def setUp(self):
+        super().setUp()
+        self.send2trash = mock.Mock()
+        patcher = mock.patch.dict(sys.modules, {'send2trash': self.send2trash})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ('a', 'b', 'c'):
+            touch(os.path.join(self.src, name))
+
+    def test_missing_before_batch_is_not_success(self):
+        results = self.trash(Send2TrashBackend(), self.src, ['a', 'gone', 'b'])
+        self.send2trash.send2trash.assert_called_once_with([os.path.join(self.src, 'a'),
+                                                            os.path.join(self.src, 'b')])
+        self.assertIsInstance(dict(results)['gone'], FileNotFoundError)
+        self.assertIsNone(dict(results)['a'])
+        self.assertIsNone(dict(results)['b'])
+
+    def test_batch_failure_retries_remaining_files(self):
+        def send(paths):
+            if isinstance(paths, list):
+                # 整批中途失败：第一个文件已移走
+                os.remove(paths[0])
+                raise OSError("batch failed")
+            if paths.endswith('c'):
+                raise OSError("c failed")
+            os.remove(paths)
+
+        self.send2trash.send2trash.side_effect = send
+        results = dict(self.trash(Send2TrashBackend(), self.src, ['a', 'b', 'c']))
+        self.assertIsNone(results['a'])
+        self.assertIsNone(results['b'])
+        self.assertIsInstance(results['c'], OSError)
+        self.assertEqual(os.listdir(self.src), ['c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回收站后端 - 批量移动文件到回收站
+功能：Linux 上直接实现 freedesktop.org (XDG) 回收站规范：每个设备只解析一次同一文件系统上的
+      回收站目录，先批量写入 .trashinfo，再用 dir_fd 相对的 rename 把整批文件移入回收站；
+      其他平台使用 send2trash 的列表形式一次提交整批文件
+"""
+
+import os
+import sys
+import errno
+import threading
+import time
+from urllib.parse import quote
+
+
+def _send2trash_one(directory, name, on_result):
+    import send2trash
+    try:
+        send2trash.send2trash(os.path.join(directory, name))
+    except Exception as e:
+        on_result(name, e)
+    else:
+        on_result(name, None)
+
+
+class Send2TrashBackend:
+    """send2trash 批量后端：整批提交一次，失败时逐个重试以定位出错的文件
+
+    send2trash 不返回文件在回收站中的位置，on_reserved 不会被调用，删除日志无法据此撤销。
+    """
+
+    # 删除日志能否记录回收站位置，从而撤销
+    restorable = False
+
+    def trash_files(self, directory, names, on_result, on_reserved=None):
+        import send2trash
+        # 提交前已不存在的文件直接报告，只有提交前存在、失败后消失的文件才算移入了回收站
+        present = []
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.lexists(path):
+                present.append(name)
+            else:
+                on_result(name, FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path))
+        if not present:
+            return
+        try:
+            send2trash.send2trash([os.path.join(directory, name) for name in present])
+        except Exception:
+            for name in present:
+                if os.path.lexists(os.path.join(directory, name)):
+                    _send2trash_one(directory, name, on_result)
+                else:
+                    on_result(name, None)
+        else:
+            for name in present:
+                on_result(name, None)
+
+
+class XdgTrashBackend:
+    """freedesktop.org 回收站规范的直接实现
+
+    - 与家目录回收站同一设备的文件进入 $XDG_DATA_HOME/Trash
+    - 其他设备的文件进入该文件系统顶层的 .Trash/$uid 或 .Trash-$uid
+    - 找不到可用的同设备回收站时退回 send2trash 逐个处理
+    - on_reserved([(名称, 回收站中的路径), ...]) 可选，每批在预留回收站名称之后、移动文件之前调用一次，
+      供删除日志先把回收站位置落盘，移动途中退出也能撤销
+    """
+
+    restorable = True
+
+    def __init__(self):
+        self.uid = os.getuid()
+        data_home = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+        self.home_trash = os.path.join(data_home, 'Trash')
+        self._lock = threading.Lock()
+        self._trash_dirs = {}
+
+    def trash_files(self, directory, names, on_result, on_reserved=None):
+        try:
+            device = os.stat(directory).st_dev
+        except OSError as e:
+            for name in names:
+                on_result(name, e)
+            return
+
+        trash_dir = self.trash_dir_for(directory, device)
+        if trash_dir is None:
+            for name in names:
+                _send2trash_one(directory, name, on_result)
+            return
+
+        dir_fd = files_fd = info_fd = None
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            files_fd = os.open(os.path.join(trash_dir, 'files'), os.O_RDONLY | os.O_DIRECTORY)
+            info_fd = os.open(os.path.join(trash_dir, 'info'), os.O_RDONLY | os.O_DIRECTORY)
+            self._trash_batch(directory, names, dir_fd, files_fd, info_fd, on_result,
+                              on_reserved, os.path.join(trash_dir, 'files'))
+        except OSError as e:
+            for name in names:
+                on_result(name, e)
+        finally:
+            for fd in (dir_fd, files_fd, info_fd):
+                if fd is not None:
+                    os.close(fd)
+
+    def _trash_batch(self, directory, names, dir_fd, files_fd, info_fd, on_result,
+                     on_reserved=None, files_dir=None):
+        # 第一步：为整批文件预留回收站名称并写入 .trashinfo（规范要求 info 先于文件落地）
+        deletion_date = time.strftime("%Y-%m-%dT%H:%M:%S")
+        reserved = []
+        for name in names:
+            content = (
+                "[Trash Info]\n"
+                f"Path={quote(os.path.join(directory, name))}\n"
+                f"DeletionDate={deletion_date}\n"
+            ).encode('utf-8')
+            try:
+                trash_name = self._reserve_info(name, files_fd, info_fd, content)
+            except OSError as e:
+                on_result(name, e)
+            else:
+                reserved.append((name, trash_name))
+        if on_reserved is not None and reserved:
+            on_reserved([(name, os.path.join(files_dir, trash_name)) for name, trash_name in reserved])
+
+        # 第二步：同一文件系统内 rename，不复制数据
+        for name, trash_name in reserved:
+            try:
+                os.rename(name, trash_name, src_dir_fd=dir_fd, dst_dir_fd=files_fd)
+            except OSError as e:
+                self._unlink_info(trash_name, info_fd)
+                if e.errno == errno.EXDEV:
+                    # 同一 st_dev 但不同挂载点（如 bind mount），交给 send2trash
+                    _send2trash_one(directory, name, on_result)
+                else:
+                    on_result(name, e)
+            else:
+                on_result(name, None)
+
+    def _reserve_info(self, name, files_fd, info_fd, content):
+        """以 O_EXCL 创建 info 文件预留名称，返回回收站中的文件名"""
+        counter = 1
+        while True:
+            trash_name = name if counter == 1 else f"{name}.{counter}"
+            counter += 1
+            try:
+                os.stat(trash_name, dir_fd=files_fd, follow_symlinks=False)
+                continue
+            except FileNotFoundError:
+                pass
+            try:
+                fd = os.open(trash_name + '.trashinfo', os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600,
+                             dir_fd=info_fd)
+            except FileExistsError:
+                continue
+            try:
+                os.write(fd, content)
+            finally:
+                os.close(fd)
+            return trash_name
+
+    def _unlink_info(self, trash_name, info_fd):
+        try:
+            os.unlink(trash_name + '.trashinfo', dir_fd=info_fd)
+        except OSError:
+            pass
+
+    def trash_dir_for(self, directory, device):
+        """返回与 directory 同一设备的回收站目录（每个设备只解析一次），找不到时返回 None"""
+        with self._lock:
+            if device in self._trash_dirs:
+                return self._trash_dirs[device]
+            trash_dir = self._find_trash_dir(directory, device)
+            self._trash_dirs[device] = trash_dir
+            return trash_dir
+
+    def _find_trash_dir(self, directory, device):
+        if self._same_device(os.path.dirname(self.home_trash), device):
+            return self._ensure_trash(self.home_trash)
+
+        topdir = self._mount_point(directory, device)
+        # 管理员预建的 $topdir/.Trash：必须是目录、非符号链接、设置了粘滞位
+        shared = os.path.join(topdir, '.Trash')
+        try:
+            st = os.lstat(shared)
+            if not os.path.islink(shared) and os.path.isdir(shared) and st.st_mode & 0o1000:
+                trash_dir = self._ensure_trash(os.path.join(shared, str(self.uid)))
+                if trash_dir is not None:
+                    return trash_dir
+        except OSError:
+            pass
+        return self._ensure_trash(os.path.join(topdir, f'.Trash-{self.uid}'))
+
+    def _ensure_trash(self, trash_dir):
+        try:
+            os.makedirs(os.path.join(trash_dir, 'files'), mode=0o700, exist_ok=True)
+            os.makedirs(os.path.join(trash_dir, 'info'), mode=0o700, exist_ok=True)
+        except OSError:
+            return None
+        return trash_dir
+
+    @staticmethod
+    def _same_device(path, device):
+        """path 可能尚未创建，取其最近的已存在上级目录比较设备号"""
+        while True:
+            try:
+                return os.stat(path).st_dev == device
+            except FileNotFoundError:
+                parent = os.path.dirname(path)
+                if parent == path:
+                    return False
+                path = parent
+            except OSError:
+                return False
+
+    @staticmethod
+    def _mount_point(directory, device):
+        path = os.path.abspath(directory)
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return path
+            try:
+                if os.stat(parent).st_dev != device:
+                    return path
+            except OSError:
+                return path
+            path = parent
+
+
+def get_trash_backend():
+    """返回当前平台的批量回收站后端"""
+    if sys.platform.startswith('linux') or (os.name == 'posix' and sys.platform != 'darwin'):
+        return XdgTrashBackend()
+    return Send2TrashBackend()